@@ -2,7 +2,8 @@ import bcrypt
 import streamlit as st
 from commons.navigation import add_sidebar_navigation
 from commons.style_utils import add_logo
-from db.commons.db_connection import connect_db
+
+from web.db.commons.db_connection import connect_db
 
 # --- Initialize session state variables ---
 if "logged_in" not in st.session_state:
@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from web.commons.logging import logger
+
+# Puntos por traza: del orden del ancho en píxeles de una gráfica, más no se ve
+MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1500"))
+# Por encima de MINMAX_RATIO * n puntos se preselecciona con min-max antes de LTTB
+MINMAX_RATIO = 4
+
+
+def minmax_indices(y: np.ndarray, n_bins: int) -> np.ndarray:
+    """Índices del mínimo y el máximo de cada uno de `n_bins` tramos iguales."""
+    size = int(np.ceil(len(y) / n_bins))
+    padded = np.full(n_bins * size, np.nan)
+    padded[: len(y)] = y
+    rows = padded.reshape(n_bins, size)
+    valid = ~np.all(np.isnan(rows), axis=1)
+    offsets = np.arange(n_bins)[valid] * size
+    rows = rows[valid]
+    indices = np.concatenate(
+        [offsets + np.nanargmin(rows, axis=1), offsets + np.nanargmax(rows, axis=1)]
+    )
+    return np.unique(np.concatenate([[0, len(y) - 1], indices]))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: en cada tramo se queda el punto que forma el
+    triángulo de mayor área con el elegido en el tramo anterior y la media del
+    siguiente. Conserva la forma visual (picos incluidos) con `n_out` puntos.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def downsample(series: pd.Series, max_points: int = MAX_POINTS) -> pd.Series:
+    """Reduce la serie a `max_points` puntos como mucho (MinMax + LTTB)."""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+
+    x = series.index.values.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    y = series.to_numpy(dtype=np.float64)
+    candidates = np.arange(len(series))
+    if len(series) > MINMAX_RATIO * max_points:
+        candidates = minmax_indices(y, MINMAX_RATIO * max_points // 2)
+    selected = candidates[lttb_indices(x[candidates], y[candidates], max_points)]
+    return series.iloc[selected]
+
+
+def downsample_ohlc(ohlc: pd.DataFrame, max_points: int = MAX_POINTS) -> pd.DataFrame:
+    """Agrupa velas consecutivas (apertura, máximo, mínimo y cierre del grupo)."""
+    ohlc = ohlc.dropna()
+    if len(ohlc) <= max_points:
+        return ohlc
+    groups = np.arange(len(ohlc)) // int(np.ceil(len(ohlc) / max_points))
+    grouped = ohlc.groupby(groups)
+    return pd.DataFrame(
+        {
+            "Open": grouped["Open"].first().to_numpy(),
+            "High": grouped["High"].max().to_numpy(),
+            "Low": grouped["Low"].min().to_numpy(),
+            "Close": grouped["Close"].last().to_numpy(),
+        },
+        # Cada vela agrupada se sitúa en la fecha de su primera sesión
+        index=ohlc.index[np.unique(groups, return_index=True)[1]],
+    )
+
+
+def line_trace(series: pd.Series, name: str, max_points: int = MAX_POINTS, **kwargs):
+    """Traza WebGL (Scattergl) con la serie ya reducida."""
+    sampled = downsample(series, max_points)
+    return go.Scattergl(
+        x=sampled.index, y=sampled.to_numpy(), mode="lines", name=name, **kwargs
+    )
+
+
+def candlestick_trace(
+    ohlc: pd.DataFrame, name: str, max_points: int = MAX_POINTS, **kwargs
+):
+    # Las velas no tienen versión WebGL: se limita el número de velas
+    candles = downsample_ohlc(ohlc, max_points)
+    return go.Candlestick(
+        x=candles.index,
+        open=candles["Open"],
+        high=candles["High"],
+        low=candles["Low"],
+        close=candles["Close"],
+        name=name,
+        **kwargs,
+    )
+
+
+def figure_payload_bytes(fig: go.Figure) -> int:
+    """Tamaño del JSON de la figura, que es lo que se envía al navegador."""
+    return len(fig.to_json().encode())
+
+
+def plotly_chart_with_payload(fig: go.Figure, container=None, label="", **kwargs):
+    """st.plotly_chart que además indica el tamaño enviado y los puntos dibujados."""
+    container = container or st
+    payload = figure_payload_bytes(fig)
+    points = sum(len(trace.x) for trace in fig.data if trace.x is not None)
+    container.plotly_chart(fig, **kwargs)
+    container.caption(f"{points:,} puntos · {payload / 1024:,.0f} KB")
+    logger.debug(f"Gráfica {label}: {points} puntos, {payload / 1024:.0f} KB")
+
+
+def clip_window(frame, window: slice):
+    """Filas dentro de la ventana; con máscara porque el índice puede no estar ordenado."""
+    if window.start is None and window.stop is None:
+        return frame
+    return frame[(frame.index >= window.start) & (frame.index <= window.stop)]
+
+
+def select_window(index: pd.DatetimeIndex, key: str, container=None) -> slice:
+    """
+    Ventana de fechas a dibujar. Cuanto más estrecha, menos se reduce la serie:
+    al acercarse se ve a resolución completa sin enviar todo el histórico.
+    """
+    container = container or st
+    first, last = index.min().to_pydatetime(), index.max().to_pydatetime()
+    if first == last:
+        return slice(first, last)
+    start, end = container.slider(
+        "Ventana",
+        min_value=first,
+        max_value=last,
+        value=(first, last),
+        format="YYYY-MM-DD",
+        key=key,
+    )
+    return slice(start, end)
@@ -0,0 +1,36 @@
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+from web.commons.logging import logger
+
+# Últimos tiempos medidos en la sesión: {etiqueta: milisegundos}
+TIMINGS_KEY = "timings"
+
+
+@contextmanager
+def timed(label: str):
+    """Mide el bloque, lo registra en el log y lo guarda en la sesión para show_timings()."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        st.session_state.setdefault(TIMINGS_KEY, {})[label] = elapsed_ms
+        logger.debug(f"{label}: {elapsed_ms:.1f} ms")
+
+
+def show_timings(container=None):
+    """Tabla con el último tiempo de cada sección (qué se ha recalculado en esta interacción)."""
+    timings = st.session_state.get(TIMINGS_KEY, {})
+    container = container or st.sidebar
+    with container.expander("Tiempos de ejecución", expanded=False):
+        if not timings:
+            st.caption("Sin mediciones todavía.")
+            return
+        st.dataframe(
+            {"Sección": list(timings), "ms": [round(ms, 1) for ms in timings.values()]},
+            hide_index=True,
+            use_container_width=True,
+        )
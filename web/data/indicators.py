@@ -0,0 +1,342 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from web.commons.logging import logger
+from web.data.price_store import PriceStore, get_price_store
+
+# Mismos parámetros que los indicadores de `ta` que usa StockData
+SMA_WINDOW = 20
+EMA_WINDOW = 20
+RSI_WINDOW = 14
+MACD_FAST, MACD_SLOW = 12, 26
+BOLLINGER_WINDOW, BOLLINGER_DEV = 20, 2
+ATR_WINDOW = 14
+
+INDICATORS = ["SMA", "EMA", "RSI", "MACD", "Bollinger_High", "Bollinger_Low", "ATR"]
+
+# Cierres que se guardan para las ventanas móviles (SMA y Bollinger)
+TAIL_LENGTH = max(SMA_WINDOW, BOLLINGER_WINDOW) - 1
+# Con menos historia se recalcula todo: los valores iniciales dependen del arranque
+MIN_INCREMENTAL_ROWS = 2 * MACD_SLOW
+
+
+def _ewm(values: pd.Series, alpha: float, window: int) -> pd.Series:
+    return values.ewm(alpha=alpha, min_periods=window, adjust=False).mean()
+
+
+def _continue_ewm(previous: float, values, alpha: float) -> np.ndarray:
+    """Sigue una media exponencial (adjust=False) desde su último valor."""
+    seeded = pd.Series(np.concatenate([[previous], np.asarray(values, dtype=float)]))
+    return seeded.ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def _true_range(high, low, previous_close) -> np.ndarray:
+    return np.nanmax(
+        np.vstack(
+            [high - low, np.abs(high - previous_close), np.abs(low - previous_close)]
+        ),
+        axis=0,
+    )
+
+
+def _rsi(avg_gain, avg_loss) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, rsi)
+
+
+def compute_indicators(prices: pd.DataFrame):
+    """
+    Indicadores de todo el histórico de un ticker, vectorizados.
+
+    Returns:
+        tuple: (DataFrame con una columna por indicador, estado para extend_indicators).
+    """
+    close, high, low = prices["Close"], prices["High"], prices["Low"]
+
+    ema = {
+        span: close.ewm(span=span, min_periods=span, adjust=False).mean()
+        for span in (EMA_WINDOW, MACD_FAST, MACD_SLOW)
+    }
+
+    diff = close.diff()
+    avg_gain = _ewm(diff.where(diff > 0, 0.0), 1 / RSI_WINDOW, RSI_WINDOW)
+    avg_loss = _ewm(-diff.where(diff < 0, 0.0), 1 / RSI_WINDOW, RSI_WINDOW)
+
+    bollinger_mean = close.rolling(
+        BOLLINGER_WINDOW, min_periods=BOLLINGER_WINDOW
+    ).mean()
+    bollinger_std = close.rolling(BOLLINGER_WINDOW, min_periods=BOLLINGER_WINDOW).std(
+        ddof=0
+    )
+
+    # ATR de Wilder: media simple de los primeros ATR_WINDOW rangos y después
+    # media exponencial; 0 hasta tener ATR_WINDOW días (como ta)
+    true_range = _true_range(high.to_numpy(), low.to_numpy(), close.shift(1).to_numpy())
+    atr = np.zeros(len(close))
+    if len(close) >= ATR_WINDOW:
+        atr[ATR_WINDOW - 1 :] = np.concatenate(
+            [
+                [true_range[:ATR_WINDOW].mean()],
+                _continue_ewm(
+                    true_range[:ATR_WINDOW].mean(),
+                    true_range[ATR_WINDOW:],
+                    1 / ATR_WINDOW,
+                ),
+            ]
+        )
+
+    values = pd.DataFrame(
+        {
+            "SMA": close.rolling(SMA_WINDOW, min_periods=SMA_WINDOW).mean(),
+            "EMA": ema[EMA_WINDOW],
+            "RSI": _rsi(avg_gain.to_numpy(), avg_loss.to_numpy()),
+            "MACD": ema[MACD_FAST] - ema[MACD_SLOW],
+            "Bollinger_High": bollinger_mean + BOLLINGER_DEV * bollinger_std,
+            "Bollinger_Low": bollinger_mean - BOLLINGER_DEV * bollinger_std,
+            "ATR": atr,
+        },
+        index=prices.index,
+    )
+
+    state = {
+        "last_date": prices.index[-1].isoformat(),
+        "rows": len(prices),
+        "close_tail": close.to_numpy()[-TAIL_LENGTH:].tolist(),
+        "ema": {str(span): float(series.iloc[-1]) for span, series in ema.items()},
+        "avg_gain": float(avg_gain.iloc[-1]),
+        "avg_loss": float(avg_loss.iloc[-1]),
+        "atr": float(atr[-1]),
+    }
+    return values, state
+
+
+def extend_indicators(new_prices: pd.DataFrame, state: dict):
+    """
+    Indicadores solo de los días nuevos, en O(días nuevos), a partir del estado
+    guardado (últimos cierres, medias exponenciales, medias de Wilder y ATR).
+    """
+    close = new_prices["Close"].to_numpy(dtype=float)
+    high = new_prices["High"].to_numpy(dtype=float)
+    low = new_prices["Low"].to_numpy(dtype=float)
+    closes = np.concatenate([state["close_tail"], close])
+    previous_close = closes[len(state["close_tail"]) - 1 : -1]
+    window = pd.Series(closes)
+    k = len(close)
+
+    ema = {
+        span: _continue_ewm(state["ema"][str(span)], close, 2 / (span + 1))
+        for span in (EMA_WINDOW, MACD_FAST, MACD_SLOW)
+    }
+
+    diff = close - previous_close
+    avg_gain = _continue_ewm(
+        state["avg_gain"], np.where(diff > 0, diff, 0.0), 1 / RSI_WINDOW
+    )
+    avg_loss = _continue_ewm(
+        state["avg_loss"], np.where(diff < 0, -diff, 0.0), 1 / RSI_WINDOW
+    )
+
+    bollinger_mean = window.rolling(BOLLINGER_WINDOW).mean().to_numpy()[-k:]
+    bollinger_std = window.rolling(BOLLINGER_WINDOW).std(ddof=0).to_numpy()[-k:]
+
+    atr = _continue_ewm(
+        state["atr"], _true_range(high, low, previous_close), 1 / ATR_WINDOW
+    )
+
+    values = pd.DataFrame(
+        {
+            "SMA": window.rolling(SMA_WINDOW).mean().to_numpy()[-k:],
+            "EMA": ema[EMA_WINDOW],
+            "RSI": _rsi(avg_gain, avg_loss),
+            "MACD": ema[MACD_FAST] - ema[MACD_SLOW],
+            "Bollinger_High": bollinger_mean + BOLLINGER_DEV * bollinger_std,
+            "Bollinger_Low": bollinger_mean - BOLLINGER_DEV * bollinger_std,
+            "ATR": atr,
+        },
+        index=new_prices.index,
+    )
+
+    state = {
+        "last_date": new_prices.index[-1].isoformat(),
+        "rows": state["rows"] + k,
+        "close_tail": closes[-TAIL_LENGTH:].tolist(),
+        "ema": {str(span): float(series[-1]) for span, series in ema.items()},
+        "avg_gain": float(avg_gain[-1]),
+        "avg_loss": float(avg_loss[-1]),
+        "atr": float(atr[-1]),
+    }
+    return values, state
+
+
+class IndicatorStore:
+    """
+    Indicadores técnicos por ticker, guardados junto a sus precios.
+
+    Por cada ticker hay un Parquet con los valores y un JSON con el estado
+    necesario para continuar el cálculo. Cuando el almacén de precios tiene días
+    nuevos solo se calculan esos días.
+
+    Solo update() escribe (lo llama la CLI al arrancar y cada noche); load() lee
+    y, si faltan días, los calcula en memoria sin tocar los ficheros.
+    """
+
+    def __init__(self, prices: PriceStore = None):
+        self.prices = prices or get_price_store()
+        self._frames = {}  # ticker -> (mtime, DataFrame)
+        self._lock = threading.Lock()
+
+    def path(self, ticker: str):
+        return self.prices.path(ticker).with_suffix(".indicators.parquet")
+
+    def state_path(self, ticker: str):
+        return self.prices.path(ticker).with_suffix(".indicators.json")
+
+    def read(self, ticker: str) -> pd.DataFrame:
+        path = self.path(ticker)
+        if not path.exists():
+            return pd.DataFrame(columns=INDICATORS)
+
+        mtime = path.stat().st_mtime
+        with self._lock:
+            cached = self._frames.get(ticker)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+        df = pd.read_parquet(path, memory_map=True)
+        with self._lock:
+            self._frames[ticker] = (mtime, df)
+        return df
+
+    def read_state(self, ticker: str):
+        path = self.state_path(ticker)
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _catch_up(self, ticker: str, rebuild=False):
+        """
+        Indicadores guardados más los de los días nuevos del almacén de precios.
+
+        Returns:
+            tuple | None: (DataFrame completo, estado, filas calculadas), o None si
+            ya están al día.
+        """
+        prices = self.prices.read(ticker)
+        if prices.empty:
+            return None
+
+        state = None if rebuild else self.read_state(ticker)
+        current = self.read(ticker) if state else None
+        if state and pd.Timestamp(state["last_date"]) >= prices.index[-1]:
+            return None
+
+        if state is None or current.empty or state["rows"] < MIN_INCREMENTAL_ROWS:
+            values, state = compute_indicators(prices)
+            merged = values
+        else:
+            new_prices = prices[prices.index > pd.Timestamp(state["last_date"])]
+            values, state = extend_indicators(new_prices, state)
+            merged = pd.concat([current, values])
+            merged = merged[~merged.index.duplicated(keep="last")]
+        return merged, state, len(values)
+
+    def update(self, ticker: str, rebuild=False) -> int:
+        """Calcula y guarda los días del almacén de precios que aún no tienen indicadores."""
+        caught_up = self._catch_up(ticker, rebuild=rebuild)
+        if caught_up is None:
+            return 0
+        merged, state, added = caught_up
+        self._write(ticker, merged, state)
+        return added
+
+    def _write(self, ticker: str, df: pd.DataFrame, state: dict):
+        # Temporales con nombre único: dos escritores nunca comparten fichero
+        path, state_path = self.path(ticker), self.state_path(ticker)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            df.to_parquet(f)
+        os.replace(tmp_path, path)
+        fd, tmp_state = tempfile.mkstemp(dir=state_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_state, state_path)
+        with self._lock:
+            self._frames.pop(ticker, None)
+
+    def load(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        """
+        Indicadores en [start, end). No escribe: si el almacén de precios tiene
+        días nuevos que la CLI aún no ha procesado, se calculan solo en memoria.
+        """
+        caught_up = self._catch_up(ticker)
+        df = caught_up[0] if caught_up else self.read(ticker)
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index < pd.Timestamp(end)]
+        return df
+
+    def update_all(self, tickers, rebuild=False) -> dict:
+        added = {}
+        for ticker in tickers:
+            try:
+                added[ticker] = self.update(ticker, rebuild=rebuild)
+                logger.info(f"{ticker}: {added[ticker]} días de indicadores")
+            except Exception as e:
+                logger.warning(
+                    f"No se pudieron calcular los indicadores de {ticker}: {e}"
+                )
+        return added
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_indicator_store() -> IndicatorStore:
+    """Instancia del almacén de indicadores compartida por todo el proceso."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IndicatorStore()
+    return _store
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compute the technical indicators of the days missing from the store"
+    )
+    parser.add_argument(
+        "--tickers",
+        nargs="*",
+        help="Tickers to update (defaults to every company in the catalog)",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Recompute the whole history instead of only the new days",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from web.db.commons.configurations import sectors
+
+    args = parse_args()
+    tickers = args.tickers or sorted(
+        {ticker for companies in sectors.values() for ticker, _ in companies}
+    )
+    added = get_indicator_store().update_all(tickers, rebuild=args.rebuild)
+    logger.success(
+        f"Indicadores actualizados: {sum(added.values())} filas nuevas "
+        f"en {len(added)} tickers."
+    )
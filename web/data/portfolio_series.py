@@ -0,0 +1,188 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from web.commons.logging import logger
+from web.data.valuation import load_closes
+from web.db.commons.db_connection import db_connection
+
+SNAPSHOTS_QUERY = """
+    SELECT p.portfolio_id, p.portfolio_value, pw.recorded_at, c.ticker, pw.weight
+    FROM portfolios p
+    JOIN portfolio_weights pw ON pw.portfolio_id = p.portfolio_id
+    JOIN companies c ON pw.company_id = c.company_id
+    WHERE %(portfolio_ids)s::int[] IS NULL OR p.portfolio_id = ANY(%(portfolio_ids)s)
+    ORDER BY p.portfolio_id, pw.recorded_at;
+"""
+
+# Último día guardado de cada cartera, leído por la clave primaria
+LAST_VALUES_QUERY = """
+    SELECT p.portfolio_id, last.date, last.value
+    FROM portfolios p
+    JOIN LATERAL (
+        SELECT date, value FROM portfolio_values
+        WHERE portfolio_id = p.portfolio_id
+        ORDER BY date DESC
+        LIMIT 1
+    ) AS last ON TRUE
+    WHERE %(portfolio_ids)s::int[] IS NULL OR p.portfolio_id = ANY(%(portfolio_ids)s);
+"""
+
+DELETE_VALUES_QUERY = """
+    DELETE FROM portfolio_values
+    WHERE %(portfolio_ids)s::int[] IS NULL OR portfolio_id = ANY(%(portfolio_ids)s);
+"""
+
+UPSERT_VALUES_QUERY = """
+    INSERT INTO portfolio_values (portfolio_id, date, value) VALUES %s
+    ON CONFLICT (portfolio_id, date) DO UPDATE SET value = EXCLUDED.value;
+"""
+
+
+def _growth(weights, base, prices):
+    """Crecimiento con unidades fijas: sum(w * P_t / P_base); sin precio, el activo no varía."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = prices / base
+    return np.where(np.isfinite(ratio), ratio, 1.0) @ weights
+
+
+def extend_series(
+    snapshots: pd.DataFrame,
+    closes: pd.DataFrame,
+    start_value: float,
+    last_date=None,
+    last_value=None,
+) -> pd.Series:
+    """
+    Valores diarios de una cartera posteriores a `last_date` (desde su creación si es None).
+
+    Cada fotografía de pesos abre un tramo con unidades fijas hasta la siguiente,
+    en la que se rebalancea sin aportar ni retirar dinero. Para continuar una
+    serie basta el último valor guardado: el valor al inicio del tramo vigente es
+    last_value / crecimiento(last_date).
+
+    Args:
+        snapshots: filas recorded_at, ticker, weight de la cartera.
+        closes: cierres rellenados con una columna por ticker (ver valuation.load_closes).
+        start_value: valor de la cartera en su primera fotografía.
+    """
+    index = closes.index.values.astype("datetime64[D]")
+    prices = closes.to_numpy(dtype=np.float64)
+
+    def prices_at(day):
+        i = np.searchsorted(index, np.datetime64(day, "D"), side="right") - 1
+        return prices[i] if i >= 0 else np.full(prices.shape[1], np.nan)
+
+    segments = list(snapshots.groupby("recorded_at", sort=True))
+    points, value = {}, None
+    for k, (day, snapshot) in enumerate(segments):
+        end = segments[k + 1][0] if k + 1 < len(segments) else None
+        if last_date is not None and end is not None and end <= last_date:
+            continue  # tramo ya guardado
+
+        weights = (
+            snapshot.groupby("ticker")["weight"]
+            .sum()
+            .reindex(closes.columns, fill_value=0.0)
+            .to_numpy(dtype=np.float64)
+        )
+        base = prices_at(day)
+
+        if value is None and last_date is None:
+            value = float(start_value)
+            points[day] = value
+        elif value is None:
+            value = float(last_value)
+            if day <= last_date:
+                value /= _growth(weights, base, prices_at(last_date))
+
+        mask = index > np.datetime64(max(day, last_date or day), "D")
+        if end is not None:
+            mask &= index <= np.datetime64(end, "D")
+        values = value * _growth(weights, base, prices[mask])
+        points.update(zip(closes.index[mask].date, values))
+
+        if end is not None:
+            value *= _growth(weights, base, prices_at(end))
+
+    return pd.Series(points, dtype=np.float64)
+
+
+def update_portfolio_values(portfolio_ids=None, rebuild=False) -> dict:
+    """
+    Añade a portfolio_values los días que faltan de cada cartera.
+
+    Los precios de todas las carteras se cargan una sola vez. Con `rebuild` se
+    borran las series y se recalculan desde la primera fotografía de pesos.
+
+    Returns:
+        dict: {portfolio_id: días añadidos}.
+    """
+    params = {"portfolio_ids": list(portfolio_ids) if portfolio_ids else None}
+    added = {}
+    with db_connection() as conn, conn.cursor() as cursor:
+        if rebuild:
+            cursor.execute(DELETE_VALUES_QUERY, params)
+
+        cursor.execute(SNAPSHOTS_QUERY, params)
+        snapshots = pd.DataFrame(
+            cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
+        )
+        if snapshots.empty:
+            return added
+
+        cursor.execute(LAST_VALUES_QUERY, params)
+        last = {pid: (day, value) for pid, day, value in cursor.fetchall()}
+
+        tickers = sorted(snapshots["ticker"].unique())
+        closes = load_closes(tickers, snapshots["recorded_at"].min()).reindex(
+            columns=tickers
+        )
+
+        rows = []
+        for portfolio_id, group in snapshots.groupby("portfolio_id", sort=False):
+            last_date, last_value = last.get(portfolio_id, (None, None))
+            series = extend_series(
+                group,
+                closes,
+                start_value=group["portfolio_value"].iloc[0],
+                last_date=last_date,
+                last_value=last_value,
+            )
+            added[portfolio_id] = len(series)
+            rows.extend(
+                (int(portfolio_id), day, float(value)) for day, value in series.items()
+            )
+
+        if rows:
+            execute_values(cursor, UPSERT_VALUES_QUERY, rows, page_size=1000)
+    return added
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Append the missing days to every portfolio's daily value series"
+    )
+    parser.add_argument(
+        "--portfolio-ids",
+        nargs="*",
+        type=int,
+        help="Portfolios to update (defaults to all of them)",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Drop the stored series and recompute them from the first weights snapshot",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    added = update_portfolio_values(args.portfolio_ids, rebuild=args.rebuild)
+    logger.success(
+        f"Series de valor actualizadas: {sum(added.values())} días nuevos "
+        f"en {len(added)} carteras."
+    )
@@ -0,0 +1,204 @@
+import argparse
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from web.commons.logging import logger
+
+# Directorio del almacén local de precios (un fichero Parquet por ticker)
+PRICE_STORE_DIR = Path(os.getenv("PRICE_STORE_DIR", "data/prices"))
+# Primera fecha descargada cuando un ticker no está aún en el almacén
+HISTORY_START = pd.Timestamp(os.getenv("PRICE_STORE_START", "2000-01-01"))
+
+PRICE_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+# Activos sin cotización propia (el efectivo vale siempre 1)
+SYNTHETIC_TICKERS = {"CASH"}
+
+
+def _file_name(ticker: str) -> str:
+    """Nombre de fichero seguro para un ticker (p. ej. 'LON:CRH')."""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", ticker) + ".parquet"
+
+
+def _to_timestamp(value) -> pd.Timestamp:
+    return pd.Timestamp(value).tz_localize(None).normalize()
+
+
+class PriceStore:
+    """
+    Almacén columnar de precios OHLCV en disco.
+
+    Cada ticker se guarda en su propio fichero Parquet, se rellena una vez desde
+    yfinance y después solo se añaden los días que faltan. Las lecturas se sirven
+    desde memoria mientras el fichero no cambie en disco.
+    """
+
+    def __init__(self, root: Path = PRICE_STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._frames = {}  # ticker -> (mtime, DataFrame)
+        self._lock = threading.Lock()
+
+    def path(self, ticker: str) -> Path:
+        return self.root / _file_name(ticker)
+
+    def has(self, ticker: str) -> bool:
+        return self.path(ticker).exists()
+
+    def read(self, ticker: str) -> pd.DataFrame:
+        """Histórico completo de un ticker (vacío si no está en el almacén)."""
+        path = self.path(ticker)
+        if not path.exists():
+            return pd.DataFrame(columns=PRICE_FIELDS)
+
+        mtime = path.stat().st_mtime
+        with self._lock:
+            cached = self._frames.get(ticker)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+        df = pd.read_parquet(path, memory_map=True)
+        with self._lock:
+            self._frames[ticker] = (mtime, df)
+        return df
+
+    def last_date(self, ticker: str):
+        df = self.read(ticker)
+        return df.index.max() if not df.empty else None
+
+    def update(self, ticker: str, end=None) -> int:
+        """Descarga solo los días posteriores al último guardado. Devuelve filas añadidas."""
+        import yfinance as yf
+
+        end = _to_timestamp(end or datetime.now()) + timedelta(days=1)
+        current = self.read(ticker)
+        start = (
+            current.index.max() + timedelta(days=1)
+            if not current.empty
+            else HISTORY_START
+        )
+        if start >= end:
+            return 0
+
+        data = yf.download(ticker, start, end, timeout=20, progress=False)
+        if data is None or data.empty:
+            return 0
+
+        if isinstance(data.columns, pd.MultiIndex):
+            data = data.xs(ticker, axis=1, level=-1)
+        data = data[[f for f in PRICE_FIELDS if f in data.columns]]
+        data.index = pd.DatetimeIndex(data.index).tz_localize(None)
+        data.index.name = "Date"
+
+        new_rows = data[data.index >= start]
+        if new_rows.empty:
+            return 0
+
+        merged = pd.concat([current, new_rows]) if not current.empty else new_rows
+        merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+        self._write(ticker, merged)
+        return len(new_rows)
+
+    def _write(self, ticker: str, df: pd.DataFrame):
+        path = self.path(ticker)
+        tmp_path = path.with_suffix(".parquet.tmp")
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._frames.pop(ticker, None)
+
+    def load(self, ticker: str, start=None, end=None, fetch_missing=True):
+        """
+        Precios de un ticker en [start, end), igual que yf.download(start, end).
+
+        Si el ticker no está en el almacén y `fetch_missing` es True se descarga
+        una única vez; el resto de lecturas no hacen peticiones de red.
+        """
+        if fetch_missing and not self.has(ticker):
+            logger.info(f"{ticker} no está en el almacén de precios; descargando...")
+            self.update(ticker)
+
+        df = self.read(ticker)
+        if start is not None:
+            df = df[df.index >= _to_timestamp(start)]
+        if end is not None:
+            df = df[df.index < _to_timestamp(end)]
+        return df
+
+    def load_yf_frame(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        """Como load(), pero con columnas (campo, ticker) como las de yf.download."""
+        df = self.load(ticker, start, end).copy()
+        df.columns = pd.MultiIndex.from_product(
+            [df.columns, [ticker]], names=["Price", "Ticker"]
+        )
+        return df
+
+    def load_close(self, tickers, start=None, end=None) -> pd.DataFrame:
+        """Precios de cierre de varios tickers alineados por fecha (una columna por ticker)."""
+        closes = {
+            ticker: self.load(ticker, start, end)["Close"]
+            for ticker in tickers
+            if ticker not in SYNTHETIC_TICKERS
+        }
+        return pd.DataFrame(closes).sort_index()
+
+    def update_all(self, tickers, end=None) -> dict:
+        """Actualiza varios tickers; los errores de un ticker no detienen al resto."""
+        added = {}
+        for ticker in tickers:
+            try:
+                added[ticker] = self.update(ticker, end)
+                logger.info(f"{ticker}: {added[ticker]} días nuevos")
+            except Exception as e:
+                logger.warning(f"No se pudo actualizar {ticker}: {e}")
+        return added
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store() -> PriceStore:
+    """Instancia del almacén compartida por todo el proceso."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PriceStore()
+    return _store
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Fill or incrementally update the local OHLCV price store"
+    )
+    parser.add_argument(
+        "--tickers",
+        nargs="*",
+        help="Tickers to update (defaults to every company in the catalog)",
+    )
+    parser.add_argument(
+        "--end-date",
+        type=date.fromisoformat,
+        default=None,
+        help="Last date to download (defaults to today)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from web.db.commons.configurations import sectors
+
+    args = parse_args()
+    tickers = args.tickers or sorted(
+        {ticker for companies in sectors.values() for ticker, _ in companies}
+    )
+    added = get_price_store().update_all(tickers, args.end_date)
+    logger.success(
+        f"Almacén de precios actualizado: {sum(added.values())} filas nuevas "
+        f"en {len(added)} tickers."
+    )
@@ -0,0 +1,229 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from quant_drl.data.stock_data import StockData
+from quant_drl.tester.tester import Tester
+
+from web.data.indicators import INDICATORS, get_indicator_store
+from web.data.price_store import get_price_store
+
+# Atributo de StockData con el array (fechas, activos, características) de cada
+# combinación (return_type, normalized) de extract_return_data_as_df
+RETURN_ARRAYS = {
+    ("simple", None): "simple_return_data_numpy",
+    ("log", None): "log_return_data_numpy",
+    ("gross", None): "gross_return_data_numpy",
+    ("simple", "min_max"): "simple_return_data_normalized_min_max",
+    ("log", "min_max"): "log_return_data_normalized_min_max",
+    ("gross", "min_max"): "gross_return_data_normalized_min_max",
+    ("simple", "standard"): "simple_return_data_normalized_standard",
+    ("log", "standard"): "log_return_data_normalized_standard",
+    ("gross", "standard"): "gross_return_data_normalized_standard",
+    ("simple", "winsorized"): "simple_return_data_winsorized",
+    ("log", "winsorized"): "log_return_data_winsorized",
+    ("gross", "winsorized"): "gross_return_data_winsorized",
+    (None, None): "stock_data_numpy",
+    (None, "min_max"): "original_data_min_max",
+    (None, "standard"): "original_data_standard",
+}
+
+
+# Variantes normalizadas que StockData calcula todas en su constructor:
+# {atributo: (método de normalización, atributo de origen)}
+NORMALIZED_ARRAYS = {
+    "original_data_min_max": ("_min_max_normalization", "stock_data_numpy"),
+    "original_data_standard": ("_standard_scaler", "stock_data_numpy"),
+    **{
+        f"{kind}_return_data_normalized_min_max": (
+            "_min_max_normalization",
+            f"{kind}_return_data_numpy",
+        )
+        for kind in ("simple", "log", "gross")
+    },
+    **{
+        f"{kind}_return_data_normalized_standard": (
+            "_standard_scaler",
+            f"{kind}_return_data_numpy",
+        )
+        for kind in ("simple", "log", "gross")
+    },
+    **{
+        f"{kind}_return_data_winsorized": (
+            "_winsorize_transform",
+            f"{kind}_return_data_numpy",
+        )
+        for kind in ("simple", "log", "gross")
+    },
+}
+
+
+class StoredStockData(StockData):
+    """
+    StockData que lee los precios del almacén local en lugar de descargarlos
+    de yfinance en cada construcción.
+
+    Las variantes normalizadas (NORMALIZED_ARRAYS) no se calculan al construir:
+    cada una se calcula la primera vez que se lee y se guarda en la instancia.
+    """
+
+    def _get_relative_return_normalized(self):
+        """Nada que hacer aquí: las variantes se calculan bajo demanda en __getattr__."""
+
+    def __getattr__(self, name):
+        # Solo se llama si el atributo no existe todavía
+        spec = NORMALIZED_ARRAYS.get(name)
+        if spec is None:
+            raise AttributeError(name)
+        method, source = spec
+        value = getattr(self, method)(getattr(self, source))
+        setattr(self, name, value)
+        return value
+
+    def extract_return_data_as_df(
+        self, return_type="simple", normalized=None
+    ) -> pd.DataFrame:
+        """
+        Igual que StockData.extract_return_data_as_df, pero sin calcular las
+        variantes que no se piden (la original las referencia todas).
+        """
+        frames = self.extract_return_data_by_ticker(return_type, normalized)
+        full_df = pd.concat([df.assign(Stock=stock) for stock, df in frames.items()])
+        full_df.index.name = "Date"
+        return full_df
+
+    def extract_return_data_by_ticker(
+        self, return_type="simple", normalized=None
+    ) -> dict:
+        """
+        Igual que extract_return_data_as_df, pero separado por activo: {ticker: DataFrame}.
+
+        Cada DataFrame se construye una vez sobre una copia contigua de su corte
+        del array, así el acceso a una empresa es directo en lugar de filtrar el
+        DataFrame largo con todas las empresas.
+        """
+        attribute = RETURN_ARRAYS.get((return_type, normalized))
+        if attribute is None:
+            raise ValueError("Invalid return_type or normalization")
+        data_np = getattr(self, attribute)
+
+        companies = ["Cash"] + self.comp_abv if self.include_cash else self.comp_abv
+        columns = self.features + self.technical_indicators
+        dates = self.multi_index_df.index.get_level_values("Date")
+        return {
+            stock: pd.DataFrame(
+                np.ascontiguousarray(data_np[:, i, :]), columns=columns, index=dates
+            )
+            for i, stock in enumerate(companies)
+        }
+
+    def _include_stored_indicators(self, data, stock) -> pd.DataFrame:
+        """
+        Igual que _include_tech_indicators, pero con los indicadores ya calculados
+        del almacén (solo se calculan los días nuevos, no todo el histórico).
+        """
+        if not set(self.technical_indicators) <= set(INDICATORS):
+            return self._include_tech_indicators(data, stock)
+
+        indicators = (
+            get_indicator_store()
+            .load(stock)[self.technical_indicators]
+            .reindex(data.index)
+        )
+        indicators.columns = pd.MultiIndex.from_product(
+            [self.technical_indicators, [stock]]
+        )
+        return pd.concat([data, indicators], axis=1)
+
+    def _get_stock_data(self):
+        """Igual que StockData._get_stock_data, pero leyendo del almacén de precios."""
+        store = get_price_store()
+        dict_np = {}
+        df_list = []
+        extra_days = int(100 * 1.5)
+        days_to_remove = 50
+
+        smallest_size = float("inf")
+
+        for stock in self.comp_abv:
+            data = store.load_yf_frame(
+                stock,
+                self.start_date - pd.DateOffset(days=extra_days),
+                self.end_date,
+            )
+            data = self._include_stored_indicators(data, stock)
+            data = data[days_to_remove:]
+
+            if data.isnull().values.any():
+                print(f"Missing values in {stock}")
+
+            df_list.append(data.assign(Stock=stock))
+            data_numpy = data[self.features + self.technical_indicators].to_numpy()
+            if data_numpy.shape[0] < smallest_size:
+                smallest_size = data_numpy.shape[0]
+
+            dict_np[stock] = data_numpy
+
+        N = smallest_size
+        stock_data = np.stack(
+            [dict_np[stock][:N, :] for stock in self.comp_abv], axis=1
+        )
+
+        self.stock_data_numpy = stock_data
+        self.stock_data_df = pd.concat(df_list)
+
+        multi_index = pd.MultiIndex.from_product(
+            [self.comp_abv, self.features + self.technical_indicators],
+            names=["Stock", "Feature"],
+        )
+        idx = self.stock_data_df.index[:N]
+
+        reshaped = stock_data.reshape(N, -1)
+        self.multi_index_df = pd.DataFrame(reshaped, index=idx, columns=multi_index)
+
+
+class StoredTester(Tester):
+    """Tester cuyos datos de entrenamiento y evaluación salen del almacén de precios."""
+
+    def setup_data(
+        self, start_eval_date=None, end_eval_date=None, start_train_date=None
+    ):
+        """Carga los datos de mercado para entrenamiento y evaluación."""
+        if start_eval_date is None:
+            end_eval_date = self.configuration["end_eval_date"]
+            start_eval_date = datetime(
+                end_eval_date.year - self.configuration["length_eval_data"],
+                end_eval_date.month,
+                end_eval_date.day,
+            )
+            start_train_date = datetime(
+                start_eval_date.year - self.configuration["length_train_data"],
+                start_eval_date.month,
+                start_eval_date.day,
+            )
+
+        companies = self.configuration["companies"]
+        self.selected_abv = [c["abv"] for c in companies]
+        self.selected_names = [c["name"] for c in companies]
+
+        self.training_stock_data = StoredStockData(
+            comp_abv=self.selected_abv,
+            comp_names=self.selected_names,
+            features=self.configuration["features"],
+            end_date=start_eval_date,
+            start_date=start_train_date,
+            include_cash=False,
+            technical_indicators=self.configuration["indicators"],
+        )
+
+        self.eval_stock_data = StoredStockData(
+            comp_abv=self.selected_abv,
+            comp_names=self.selected_names,
+            features=self.configuration["features"],
+            end_date=end_eval_date,
+            start_date=start_eval_date,
+            include_cash=False,
+            technical_indicators=self.configuration["indicators"],
+        )
+
+        self.normalize_data()
@@ -0,0 +1,178 @@
+import argparse
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from web.commons.logging import logger
+
+# Sesiones precalculadas por mercado (un .npy por calendario)
+CALENDAR_DIR = Path(os.getenv("CALENDAR_DIR", "data/calendars"))
+CALENDAR_START = os.getenv("CALENDAR_START", "2000-01-01")
+# Años posteriores a hoy que se precalculan
+CALENDAR_YEARS_AHEAD = 2
+
+DEFAULT_EXCHANGE = "NYSE"
+
+# Sufijo de Yahoo Finance -> calendario de pandas_market_calendars
+SUFFIX_EXCHANGES = {
+    ".DE": "XETR",
+    ".L": "LSE",
+    ".PA": "XPAR",
+    ".AS": "XAMS",
+    ".SW": "SIX",
+    ".MI": "XMIL",
+    ".MC": "XMAD",
+}
+PREFIX_EXCHANGES = {
+    "LON:": "LSE",
+}
+
+
+def exchange_for_ticker(ticker: str) -> str:
+    """Mercado en el que cotiza un ticker de Yahoo Finance."""
+    for prefix, exchange in PREFIX_EXCHANGES.items():
+        if ticker.startswith(prefix):
+            return exchange
+    for suffix, exchange in SUFFIX_EXCHANGES.items():
+        if ticker.endswith(suffix):
+            return exchange
+    return DEFAULT_EXCHANGE
+
+
+def _to_day(value) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(value).date(), "D")
+
+
+class TradingCalendar:
+    """
+    Sesiones de un mercado como array ordenado de datetime64[D].
+
+    Todas las consultas son búsquedas binarias sobre el array (O(log n)).
+    """
+
+    def __init__(self, exchange: str, sessions: np.ndarray):
+        self.exchange = exchange
+        self.sessions = sessions
+
+    def count(self, start, end) -> int:
+        """Número de sesiones en [start, end)."""
+        lo = np.searchsorted(self.sessions, _to_day(start), side="left")
+        hi = np.searchsorted(self.sessions, _to_day(end), side="left")
+        return int(max(hi - lo, 0))
+
+    def session_range(self, start, end):
+        """(número de sesiones, primera sesión, última sesión) en [start, end)."""
+        lo = np.searchsorted(self.sessions, _to_day(start), side="left")
+        hi = np.searchsorted(self.sessions, _to_day(end), side="left")
+        if hi <= lo:
+            return 0, None, None
+        return (
+            int(hi - lo),
+            self.sessions[lo].astype(object),
+            self.sessions[hi - 1].astype(object),
+        )
+
+    def next_session(self, day):
+        """Primera sesión en o después de `day`."""
+        i = np.searchsorted(self.sessions, _to_day(day), side="left")
+        return self.sessions[i].astype(object) if i < len(self.sessions) else None
+
+    def previous_session(self, day):
+        """Última sesión en o antes de `day`."""
+        i = np.searchsorted(self.sessions, _to_day(day), side="right") - 1
+        return self.sessions[i].astype(object) if i >= 0 else None
+
+    def nearest_session(self, day):
+        """Sesión más próxima a `day` (la anterior en caso de empate)."""
+        previous, following = self.previous_session(day), self.next_session(day)
+        if previous is None or following is None:
+            return previous or following
+        target = pd.Timestamp(day).date()
+        return previous if target - previous <= following - target else following
+
+    def is_session(self, day) -> bool:
+        d = _to_day(day)
+        i = np.searchsorted(self.sessions, d, side="left")
+        return bool(i < len(self.sessions) and self.sessions[i] == d)
+
+
+def _build_sessions(exchange: str) -> np.ndarray:
+    end = pd.Timestamp.today() + pd.DateOffset(years=CALENDAR_YEARS_AHEAD)
+    try:
+        import pandas_market_calendars as mcal
+
+        days = mcal.get_calendar(exchange).valid_days(
+            start_date=CALENDAR_START, end_date=end
+        )
+        days = days.tz_localize(None) if days.tz is not None else days
+    except Exception as e:
+        logger.warning(
+            f"Calendario {exchange} no disponible ({e}); se usan días laborables."
+        )
+        days = pd.bdate_range(CALENDAR_START, end)
+    return np.asarray(days.values.astype("datetime64[D]"))
+
+
+def build_calendar(exchange: str) -> TradingCalendar:
+    """Precalcula las sesiones de un mercado y las guarda en CALENDAR_DIR."""
+    CALENDAR_DIR.mkdir(parents=True, exist_ok=True)
+    sessions = _build_sessions(exchange)
+    np.save(CALENDAR_DIR / f"{exchange}.npy", sessions)
+    return TradingCalendar(exchange, sessions)
+
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+
+def get_calendar(exchange: str = DEFAULT_EXCHANGE) -> TradingCalendar:
+    """Calendario de un mercado, leído del disco o calculado la primera vez."""
+    calendar = _calendars.get(exchange)
+    if calendar is not None:
+        return calendar
+
+    with _calendars_lock:
+        if exchange not in _calendars:
+            path = CALENDAR_DIR / f"{exchange}.npy"
+            if path.exists():
+                _calendars[exchange] = TradingCalendar(exchange, np.load(path))
+            else:
+                _calendars[exchange] = build_calendar(exchange)
+        return _calendars[exchange]
+
+
+def calendar_for_ticker(ticker: str) -> TradingCalendar:
+    return get_calendar(exchange_for_ticker(ticker))
+
+
+def portfolio_session_range(tickers, start, end):
+    """
+    (sesiones, primera, última) en [start, end) para una cartera multi-mercado.
+
+    StockData recorta todos los activos a la serie más corta, así que se usa
+    el mercado con menos sesiones en el rango.
+    """
+    exchanges = {exchange_for_ticker(t) for t in tickers} or {DEFAULT_EXCHANGE}
+    ranges = [get_calendar(e).session_range(start, end) for e in sorted(exchanges)]
+    return min(ranges, key=lambda r: r[0])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Precompute exchange trading calendars")
+    parser.add_argument(
+        "--exchanges",
+        nargs="*",
+        default=[DEFAULT_EXCHANGE, *sorted(set(SUFFIX_EXCHANGES.values()))],
+        help="Calendars to build",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    for exchange in args.exchanges:
+        calendar = build_calendar(exchange)
+        logger.info(f"{exchange}: {len(calendar.sessions)} sesiones")
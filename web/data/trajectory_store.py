@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from web.commons.logging import logger
+from web.data.price_store import SYNTHETIC_TICKERS, PriceStore, get_price_store
+
+# Directorio de las trayectorias guardadas (un fichero NPZ por evaluación)
+TRAJECTORY_STORE_DIR = Path(os.getenv("TRAJECTORY_STORE_DIR", "data/trajectories"))
+# Cambiarlo invalida todas las trayectorias guardadas con el formato anterior
+TRAJECTORY_FORMAT = 2
+
+# Métricas por episodio (un valor) y secuencias por episodio (un valor por paso)
+EPISODE_METRICS = [
+    "final_rewards",
+    "final_pvs",
+    "final_drawdowns",
+    "mean_rewards",
+    "mean_sharpes",
+    "mean_pvs",
+    "std_rewards",
+    "std_sharpes",
+    "std_pvs",
+]
+EPISODE_SEQUENCES = [
+    "all_rewards",
+    "all_sharpes",
+    "all_pvs",
+    "all_actions",
+    "all_episode_rewards",
+]
+
+
+def run_id(params: dict) -> str:
+    """Identificador estable de una evaluación a partir de sus parámetros."""
+    payload = json.dumps(
+        {"format": TRAJECTORY_FORMAT, **params}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:20]
+
+
+def data_version(tickers, end, prices: PriceStore = None) -> str:
+    """
+    Versión de los precios que ve una evaluación que termina en `end`: último
+    día guardado de cada ticker hasta esa fecha. Los días que el almacén añade
+    después de `end` no cambian la versión.
+    """
+    prices = prices or get_price_store()
+    end = pd.Timestamp(end)
+    versions = {}
+    for ticker in sorted(set(tickers) - SYNTHETIC_TICKERS):
+        df = prices.read(ticker)
+        dates = df.index[df.index <= end]
+        versions[ticker] = dates.max().date().isoformat() if len(dates) else None
+    return hashlib.sha256(json.dumps(versions).encode()).hexdigest()[:12]
+
+
+def _pack_sequences(episodes) -> tuple:
+    """Apila episodios de distinta longitud en float32, rellenando con NaN."""
+    arrays = [np.asarray(episode, dtype=np.float32) for episode in episodes]
+    lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+    tail = arrays[0].shape[1:] if arrays else ()
+    packed = np.full((len(arrays), int(lengths.max(initial=0)), *tail), np.nan)
+    for i, a in enumerate(arrays):
+        packed[i, : len(a)] = a
+    return packed.astype(np.float32), lengths
+
+
+class TrajectoryStore:
+    """
+    Trayectorias de evaluación en disco, en float32 comprimido.
+
+    Cada evaluación se guarda en un NPZ con las métricas por episodio, las
+    secuencias por paso (rewards, sharpes, valor del portafolio, acciones y
+    rewards acumulados) y sus parámetros en JSON. La clave es run_id(params),
+    así que la misma evaluación se reutiliza entre reruns, sesiones y usuarios.
+    """
+
+    def __init__(self, root: Path = TRAJECTORY_STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def path(self, run: str) -> Path:
+        return self.root / f"{run}.npz"
+
+    def has(self, run: str) -> bool:
+        return self.path(run).exists()
+
+    def save(self, run: str, params: dict, info_eval: dict, extra: dict = None):
+        """Guarda `info_eval` (formato de Tester.evaluate) y datos de la vista en `extra`."""
+        arrays = {
+            key: np.asarray(info_eval[key], dtype=np.float32) for key in EPISODE_METRICS
+        }
+        for key in EPISODE_SEQUENCES:
+            arrays[key], arrays[f"{key}_lengths"] = _pack_sequences(info_eval[key])
+
+        meta = {
+            "params": params,
+            "extra": extra or {},
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        arrays["meta"] = np.array(json.dumps(meta, default=str))
+
+        path = self.path(run)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+        logger.info(f"Trayectoria {run} guardada ({path.stat().st_size / 1024:.0f} KB)")
+
+    def load(self, run: str):
+        """
+        Returns:
+            tuple | None: (info_eval, meta) con el mismo formato que Tester.evaluate,
+            o None si la evaluación no está guardada.
+        """
+        path = self.path(run)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                info_eval = {key: data[key].tolist() for key in EPISODE_METRICS}
+                for key in EPISODE_SEQUENCES:
+                    packed, lengths = data[key], data[f"{key}_lengths"]
+                    info_eval[key] = [packed[i, :n] for i, n in enumerate(lengths)]
+        except Exception as e:
+            logger.warning(f"No se pudo leer la trayectoria {run}: {e}")
+            return None
+        return info_eval, meta
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_trajectory_store() -> TrajectoryStore:
+    """Instancia del almacén de trayectorias compartida por todo el proceso."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TrajectoryStore()
+    return _store
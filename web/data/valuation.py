@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from web.data.price_store import SYNTHETIC_TICKERS, get_price_store
+
+# Días antes del registro más antiguo que se cargan para encontrar su cierre
+LOOKBACK_DAYS = 10
+
+HOLDING_COLUMNS = [
+    "portfolio_id",
+    "portfolio_name",
+    "portfolio_value",
+    "recorded_at",
+    "ticker",
+    "name",
+    "weight",
+]
+
+
+def load_closes(tickers, start) -> pd.DataFrame:
+    """
+    Cierres de todos los tickers en una única carga del almacén de precios.
+
+    Los activos sintéticos (CASH) valen siempre 1 y los huecos (festivos de un
+    mercado) se rellenan con el último cierre conocido.
+    """
+    real = sorted(set(tickers) - SYNTHETIC_TICKERS)
+    closes = get_price_store().load_close(
+        real, start=pd.Timestamp(start) - timedelta(days=LOOKBACK_DAYS)
+    )
+    for ticker in SYNTHETIC_TICKERS & set(tickers):
+        closes[ticker] = 1.0
+    return closes.sort_index().ffill()
+
+
+def value_portfolios(holdings: pd.DataFrame, closes: pd.DataFrame):
+    """
+    Valora a mercado todas las carteras de `holdings` en una sola pasada de NumPy.
+
+    Args:
+        holdings: una fila por (cartera, activo) con las columnas HOLDING_COLUMNS:
+            pesos de la última fecha registrada y valor de la cartera en esa fecha.
+        closes: cierres por fecha (filas) y ticker (columnas), ver load_closes.
+
+    Returns:
+        tuple: (resumen por cartera, detalle por activo). El detalle incluye el
+        peso actual, la deriva respecto al peso registrado y el PnL de cada activo.
+    """
+    if holdings.empty or closes.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    dates = closes.index.values.astype("datetime64[D]")
+    prices = closes.to_numpy(dtype=np.float64)
+    column = {ticker: i for i, ticker in enumerate(closes.columns)}
+
+    ticker_idx = holdings["ticker"].map(column).to_numpy()
+    has_prices = ~pd.isna(ticker_idx)
+    ticker_idx = np.where(has_prices, ticker_idx, 0).astype(np.int64)
+
+    # Último cierre en o antes de la fecha de registro de cada fila
+    recorded = pd.to_datetime(holdings["recorded_at"]).values.astype("datetime64[D]")
+    date_idx = np.searchsorted(dates, recorded, side="right") - 1
+    has_prices &= date_idx >= 0
+    date_idx = np.clip(date_idx, 0, None)
+
+    previous_price = prices[date_idx, ticker_idx]
+    current_price = prices[-1, ticker_idx]
+    ratio = current_price / previous_price
+    # Sin precio se considera que el activo no ha cambiado de valor
+    has_prices &= np.isfinite(ratio)
+    ratio = np.where(has_prices, ratio, 1.0)
+
+    weight = holdings["weight"].to_numpy(dtype=np.float64)
+    previous_value = weight * holdings["portfolio_value"].to_numpy(dtype=np.float64)
+    current_value = previous_value * ratio
+
+    codes, portfolio_ids = pd.factorize(holdings["portfolio_id"])
+    total_previous = np.bincount(codes, weights=previous_value)
+    total_current = np.bincount(codes, weights=current_value)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        current_weight = current_value / total_current[codes]
+        total_return = total_current / total_previous - 1.0
+    drift = current_weight - weight
+
+    assets = holdings.assign(
+        previous_price=previous_price,
+        current_price=current_price,
+        previous_value=previous_value,
+        current_value=current_value,
+        pnl=current_value - previous_value,
+        current_weight=current_weight,
+        drift=drift,
+        has_prices=has_prices,
+    )
+
+    max_drift = np.zeros(len(portfolio_ids))
+    np.maximum.at(max_drift, codes, np.abs(np.nan_to_num(drift)))
+
+    first = holdings.groupby(codes, sort=True).first()
+    overview = pd.DataFrame(
+        {
+            "portfolio_id": portfolio_ids,
+            "portfolio_name": first["portfolio_name"].to_numpy(),
+            "recorded_at": first["recorded_at"].to_numpy(),
+            "recorded_value": total_previous,
+            "current_value": total_current,
+            "pnl": total_current - total_previous,
+            "return": total_return,
+            "max_drift": max_drift,
+            "missing_prices": np.bincount(codes, weights=~has_prices).astype(int),
+        }
+    )
+    overview.attrs["as_of"] = closes.index[-1]
+    return overview, assets
+
+
+def value_user_portfolios(holdings: pd.DataFrame):
+    """Carga los precios una vez para todas las carteras y las valora."""
+    if holdings.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    closes = load_closes(holdings["ticker"].unique(), holdings["recorded_at"].min())
+    return value_portfolios(holdings, closes)
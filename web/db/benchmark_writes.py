@@ -0,0 +1,145 @@
+import argparse
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+from web.commons.logging import logger
+from web.db.commons.db_connection import connect_db
+from web.db.commons.writes import register_model, save_portfolio, save_weights
+
+# Todo se hace dentro de una transacción que se deshace al final: la base de
+# datos queda igual que estaba.
+SYNTHETIC_PREFIX = "BENCH_"
+
+
+def create_synthetic_data(cursor, n_companies):
+    cursor.execute(
+        """
+        INSERT INTO users (username, email, password)
+        VALUES ('bench_user', 'bench@example.com', 'x')
+        RETURNING user_id;
+        """
+    )
+    user_id = cursor.fetchone()[0]
+    tickers = [f"{SYNTHETIC_PREFIX}{i}" for i in range(n_companies)]
+    cursor.execute(
+        """
+        INSERT INTO companies (name, ticker, sector)
+        SELECT t, t, 'Benchmark' FROM unnest(%s::text[]) AS t
+        ON CONFLICT (ticker) DO NOTHING;
+        """,
+        (tickers,),
+    )
+    return user_id, tickers
+
+
+def row_by_row_writes(cursor, user_id, name, tickers):
+    """Las escrituras antiguas: una sentencia por compañía (referencia de comparación)."""
+    cursor.execute(
+        "INSERT INTO portfolios (user_id, name) VALUES (%s, %s) RETURNING portfolio_id;",
+        (user_id, name),
+    )
+    portfolio_id = cursor.fetchone()[0]
+    for ticker in tickers:
+        cursor.execute(
+            "INSERT INTO portfolio_companies (portfolio_id, company_id) "
+            "VALUES (%s, (SELECT company_id FROM companies WHERE ticker = %s));",
+            (portfolio_id, ticker),
+        )
+    cursor.execute(
+        "INSERT INTO favorites (user_id, type, reference_id, name) VALUES (%s, 'portfolio', %s, %s);",
+        (user_id, portfolio_id, name),
+    )
+    cursor.execute(
+        "SELECT c.company_id FROM companies c WHERE c.ticker = ANY(%s);", (tickers,)
+    )
+    company_ids = [row[0] for row in cursor.fetchall()]
+    for company_id in company_ids:
+        cursor.execute(
+            "INSERT INTO portfolio_weights (portfolio_id, company_id, weight, recorded_at) "
+            "VALUES (%s, %s, %s, %s)",
+            (portfolio_id, company_id, 1 / len(company_ids), date.today()),
+        )
+    cursor.execute(
+        "INSERT INTO models (algorithm, feature_extractor, ncompanies, file_path, created_at, name) "
+        "VALUES ('PPO', 'Default', %s, 'bench/', %s, %s) RETURNING model_id;",
+        (len(tickers), datetime.now(), name),
+    )
+    model_id = cursor.fetchone()[0]
+    for ticker in tickers:
+        cursor.execute("SELECT company_id FROM companies WHERE ticker = %s", (ticker,))
+        cursor.execute(
+            "INSERT INTO model_companies (model_id, company_id) VALUES (%s, %s);",
+            (model_id, cursor.fetchone()[0]),
+        )
+
+
+def set_based_writes(cursor, user_id, name, tickers):
+    portfolio_id = save_portfolio(cursor, user_id, name, tickers)
+    cursor.execute("SELECT company_id FROM companies WHERE ticker = ANY(%s);", (tickers,))
+    company_ids = [row[0] for row in cursor.fetchall()]
+    save_weights(
+        cursor,
+        portfolio_id,
+        {company_id: 1 / len(company_ids) for company_id in company_ids},
+        date.today(),
+    )
+    register_model(
+        cursor,
+        name=name,
+        algorithm="PPO",
+        feature_extractor="Default",
+        companies_abv=tickers,
+        file_path="bench/",
+        created_at=datetime.now(),
+        normalization="standard",
+    )
+
+
+def benchmark(sizes, repeats):
+    conn = connect_db()
+    results = []
+    try:
+        with conn.cursor() as cursor:
+            user_id, all_tickers = create_synthetic_data(cursor, max(sizes))
+            for size in sizes:
+                tickers = all_tickers[:size]
+                for label, writes in (
+                    ("row-by-row", row_by_row_writes),
+                    ("set-based", set_based_writes),
+                ):
+                    timings = []
+                    for i in range(repeats):
+                        cursor.execute("SAVEPOINT bench;")
+                        started = time.perf_counter()
+                        writes(cursor, user_id, f"bench_{label}_{size}_{i}", tickers)
+                        timings.append((time.perf_counter() - started) * 1000)
+                        cursor.execute("ROLLBACK TO SAVEPOINT bench;")
+                    results.append((size, label, np.median(timings), np.max(timings)))
+    finally:
+        conn.rollback()
+        conn.close()
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure portfolio, weights and model write latency by portfolio size"
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="*",
+        type=int,
+        default=[5, 10, 25, 50, 100, 250, 500],
+        help="Portfolio sizes (number of companies) to benchmark",
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per size")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logger.info(f"{'assets':>7} {'mode':>11} {'median ms':>10} {'max ms':>8}")
+    for size, label, median, worst in benchmark(args.sizes, args.repeats):
+        logger.info(f"{size:>7} {label:>11} {median:>10.1f} {worst:>8.1f}")
@@ -0,0 +1,139 @@
+import argparse
+import json
+import sys
+
+from web.commons.logging import logger
+from web.db.commons.db_connection import connect_db
+from web.db.commons.ticker_sets import ticker_signature
+from web.pages.commons.database_connectors import (
+    MODELS_BY_SIGNATURE_QUERY,
+    TICKER_SET_MODES,
+)
+
+# Consultas de los conectores (web/pages/commons/database_connectors.py), la
+# tabla que debe leerse por índice en cada una y, si importa cuál, el índice
+CHECKS = {
+    "get_evaluation_by_model": (
+        "evaluation_metrics",
+        None,
+        """
+        SELECT ev.evaluation_id, evm.metric_name, evm.value
+        FROM evaluations ev
+        JOIN evaluation_metrics evm ON ev.evaluation_id = evm.evaluation_id
+        WHERE ev.model_id = %s
+        """,
+        (1,),
+    ),
+    "evaluations_by_model": (
+        "evaluations",
+        None,
+        "SELECT evaluation_id FROM evaluations WHERE model_id = %s",
+        (1,),
+    ),
+    "get_favorite_models": (
+        "favorites",
+        None,
+        """
+        SELECT m.model_id, m.name, f.name
+        FROM favorites f
+        JOIN models m ON f.reference_id = m.model_id
+        WHERE f.user_id = %s AND f.type = 'model'
+        """,
+        (1,),
+    ),
+    "models_by_name": (
+        "models",
+        None,
+        "SELECT model_id FROM models WHERE name = %s",
+        ("model",),
+    ),
+    "get_models_by_companies": (
+        "models",
+        "idx_models_ticker_signature",
+        MODELS_BY_SIGNATURE_QUERY,
+        (ticker_signature(["AAPL", "CASH"]),),
+    ),
+    "search_models_by_companies": (
+        "models",
+        "idx_models_ticker_set",
+        f"SELECT m.model_id FROM models m WHERE {TICKER_SET_MODES['superset']}",
+        {"tickers": ["AAPL", "CASH"]},
+    ),
+}
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+def scans_by_table(plan, found=None, indexes=None) -> tuple:
+    """
+    ({tabla: {tipos de nodo}}, {índices usados}) de todos los accesos del plan.
+    Los Bitmap Index Scan no llevan tabla: se asocian a su Bitmap Heap Scan.
+    """
+    found = {} if found is None else found
+    indexes = set() if indexes is None else indexes
+    relation = plan.get("Relation Name")
+    if relation:
+        found.setdefault(relation, set()).add(plan["Node Type"])
+        if plan["Node Type"] == "Bitmap Heap Scan":
+            found[relation].add("Bitmap Index Scan")
+    if plan.get("Index Name"):
+        indexes.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        scans_by_table(child, found, indexes)
+    return found, indexes
+
+
+def check_indexes(disable_seqscan=True) -> bool:
+    """
+    Ejecuta EXPLAIN sobre cada consulta y comprueba que su tabla se lee por índice.
+
+    Con pocas filas el planificador prefiere Seq Scan aunque exista el índice, por
+    eso por defecto se desactiva: así se comprueba que el índice es utilizable.
+    """
+    conn = connect_db()
+    ok = True
+    try:
+        with conn.cursor() as cursor:
+            if disable_seqscan:
+                cursor.execute("SET enable_seqscan = off;")
+            for name, (table, index, query, params) in CHECKS.items():
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                found, indexes = scans_by_table(plan[0]["Plan"])
+                scans = found.get(table, set())
+                if index and index not in indexes:
+                    ok = False
+                    logger.error(
+                        f"{name}: {table} no usa {index} "
+                        f"({', '.join(sorted(indexes)) or 'ningún índice'})"
+                    )
+                elif scans & INDEX_SCANS:
+                    logger.success(f"{name}: {table} -> {', '.join(sorted(scans))}")
+                else:
+                    ok = False
+                    logger.error(
+                        f"{name}: {table} -> {', '.join(sorted(scans)) or '?'}"
+                    )
+    finally:
+        conn.rollback()
+        conn.close()
+    return ok
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Check that the connector queries use index scans"
+    )
+    parser.add_argument(
+        "--allow-seqscan",
+        action="store_true",
+        help="Keep enable_seqscan on and report the planner's real choice",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(0 if check_indexes(disable_seqscan=not args.allow_seqscan) else 1)
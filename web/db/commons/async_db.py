@@ -0,0 +1,95 @@
+import asyncio
+import os
+import threading
+
+from web.commons.logging import logger
+
+from .db_connection import DB_CONFIG, POOL_CONFIG
+
+# Conexiones del pool asíncrono (independiente del pool síncrono de psycopg2)
+ASYNC_POOL_MAX = int(os.getenv("DB_ASYNC_POOL_MAX", str(POOL_CONFIG["maxconn"])))
+
+
+class AsyncDatabase:
+    """
+    Acceso asíncrono a PostgreSQL con psycopg 3.
+
+    El pool vive en un bucle de eventos propio, en un hilo en segundo plano, de
+    modo que los scripts de Streamlit (síncronos) pueden lanzar varias consultas
+    a la vez con run()/gather() sin crear un bucle en cada ejecución.
+    """
+
+    def __init__(self, max_size=ASYNC_POOL_MAX):
+        self.max_size = max_size
+        self.pid = os.getpid()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="async-db", daemon=True
+        )
+        self._thread.start()
+        self._pool = self.run(self._open_pool())
+
+    async def _open_pool(self):
+        from psycopg.conninfo import make_conninfo
+        from psycopg_pool import AsyncConnectionPool
+
+        pool = AsyncConnectionPool(
+            make_conninfo(**DB_CONFIG),
+            min_size=POOL_CONFIG["minconn"],
+            max_size=self.max_size,
+            timeout=POOL_CONFIG["timeout"],
+            max_idle=POOL_CONFIG["health_check_after"] * 10,
+            open=False,
+        )
+        await pool.open()
+        logger.info(f"Pool asíncrono creado (max={self.max_size})")
+        return pool
+
+    def run(self, coro):
+        """Ejecuta una corrutina en el bucle del pool y espera su resultado."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def gather(self, **coros) -> dict:
+        """
+        Ejecuta varias corrutinas a la vez y devuelve {nombre: resultado}.
+
+        La latencia total es la de la consulta más lenta, no la suma de todas.
+        Si alguna falla, la excepción se propaga.
+        """
+
+        async def _gather():
+            results = await asyncio.gather(*coros.values())
+            return dict(zip(coros.keys(), results))
+
+        return self.run(_gather())
+
+    async def fetch_all(self, query, params=None) -> list:
+        async with self._pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchall()
+
+    async def fetch_one(self, query, params=None):
+        async with self._pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchone()
+
+
+_db = None
+_db_lock = threading.Lock()
+
+
+def get_async_db() -> AsyncDatabase:
+    """Instancia del proceso (se recrea tras un fork, como el pool síncrono)."""
+    global _db
+    if _db is None or _db.pid != os.getpid():
+        with _db_lock:
+            if _db is None or _db.pid != os.getpid():
+                _db = AsyncDatabase()
+    return _db
+
+
+def gather_queries(**coros) -> dict:
+    """Lanza a la vez las consultas independientes de una página."""
+    return get_async_db().gather(**coros)
@@ -1,6 +1,14 @@
 import os
+import threading
+import time
+import traceback
+import weakref
+from contextlib import contextmanager
 
 import psycopg2
+from psycopg2 import pool
+
+from web.commons.logging import logger
 
 from .connect_dotenv import load_env_from_project_root
 
@@ -16,6 +24,226 @@ DB_CONFIG = {
     "port": "5432",
 }
 
+# Configuración del pool de conexiones (compartido por todo el proceso)
+POOL_CONFIG = {
+    "minconn": int(os.getenv("DB_POOL_MIN", "1")),
+    "maxconn": int(os.getenv("DB_POOL_MAX", "10")),
+    # Segundos máximos esperando una conexión libre
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    # Segundos de inactividad tras los que se comprueba la conexión con SELECT 1
+    "health_check_after": float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30")),
+    # Segundos prestada a partir de los que una conexión se considera fugada
+    "leak_threshold": float(os.getenv("DB_POOL_LEAK_THRESHOLD", "300")),
+}
+
+
+class PoolTimeoutError(pool.PoolError):
+    """No se ha podido obtener una conexión del pool en el tiempo configurado."""
+
+
+class PooledConnection:
+    """
+    Conexión prestada por el pool. Se comporta como una conexión de psycopg2,
+    pero close() la devuelve al pool en lugar de cerrar el socket.
+    """
+
+    def __init__(self, owner, conn):
+        self._owner = owner
+        self._conn = conn
+        self._returned = False
+        self.checked_out_at = time.monotonic()
+        self.origin = "".join(traceback.format_stack(limit=6)[:-3])
+        self.leak_reported = False
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self):
+        return 1 if self._returned else self._conn.closed
+
+    def close(self):
+        if not self._returned:
+            self._returned = True
+            self._owner.release(self._conn)
+
+    def __del__(self):
+        # Conexiones que nunca se cerraron: se devuelven al pool al recolectarlas
+        try:
+            if not self._returned:
+                self._owner.record_leak(self, collected=True)
+                self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Pool de conexiones thread-safe con health check, detección de fugas y métricas."""
+
+    def __init__(
+        self,
+        minconn,
+        maxconn,
+        timeout,
+        health_check_after,
+        leak_threshold,
+        **db_config,
+    ):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self.leak_threshold = leak_threshold
+        self.pid = os.getpid()
+
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **db_config)
+        # ThreadedConnectionPool lanza un error si se agota; el semáforo hace esperar
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._borrowed = weakref.WeakSet()
+        self._stats = {
+            "checkouts": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "leaks": 0,
+        }
+
+    def getconn(self):
+        """Obtiene una conexión sana del pool, esperando si todas están en uso."""
+        self._report_leaks()
+
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeoutError(
+                f"No hay conexiones libres tras {self.timeout}s "
+                f"(maxconn={self.maxconn})"
+            )
+        waited = time.monotonic() - start
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        wrapper = PooledConnection(self, conn)
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            self._borrowed.add(wrapper)
+        return wrapper
+
+    def _checkout_healthy(self):
+        conn = self._pool.getconn()
+        idle = time.monotonic() - self._last_used.get(id(conn), 0.0)
+
+        if conn.closed or idle > self.health_check_after:
+            try:
+                if conn.closed:
+                    raise psycopg2.InterfaceError("connection already closed")
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error as e:
+                logger.warning(f"Conexión descartada por health check: {e}")
+                with self._lock:
+                    self._stats["health_check_failures"] += 1
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+        return conn
+
+    def release(self, conn):
+        """Devuelve una conexión al pool (putconn deshace la transacción abierta)."""
+        try:
+            self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def record_leak(self, wrapper, collected=False):
+        if wrapper.leak_reported:
+            return
+        wrapper.leak_reported = True
+        with self._lock:
+            self._stats["leaks"] += 1
+        held = time.monotonic() - wrapper.checked_out_at
+        reason = "no se cerró" if collected else f"lleva {held:.0f}s prestada"
+        logger.warning(
+            f"Posible fuga de conexión ({reason}). Obtenida en:\n{wrapper.origin}"
+        )
+
+    def _report_leaks(self):
+        now = time.monotonic()
+        for wrapper in list(self._borrowed):
+            if (
+                not wrapper._returned
+                and now - wrapper.checked_out_at > self.leak_threshold
+            ):
+                self.record_leak(wrapper)
+
+    def stats(self) -> dict:
+        """Métricas del pool: préstamos, tiempos de espera y tamaño."""
+        with self._lock:
+            stats = dict(self._stats)
+            in_use = sum(1 for w in self._borrowed if not w._returned)
+        stats["wait_time_avg"] = (
+            stats["wait_time_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        )
+        stats["size"] = len(self._pool._pool) + len(self._pool._used)
+        stats["idle"] = len(self._pool._pool)
+        stats["in_use"] = in_use
+        stats["maxconn"] = self.maxconn
+        return stats
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Devuelve el pool del proceso, creándolo (o recreándolo tras un fork) si hace falta."""
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool(**POOL_CONFIG, **DB_CONFIG)
+                logger.info(
+                    f"Pool de conexiones creado (min={POOL_CONFIG['minconn']}, "
+                    f"max={POOL_CONFIG['maxconn']})"
+                )
+    return _pool
+
+
+def pool_stats() -> dict:
+    return get_pool().stats()
+
 
 def connect_db():
-    return psycopg2.connect(**DB_CONFIG)
+    """Obtiene una conexión del pool. Llamar a close() la devuelve al pool."""
+    return get_pool().getconn()
+
+
+@contextmanager
+def db_connection():
+    """Presta una conexión del pool: confirma al salir, deshace si hay error y la devuelve."""
+    conn = connect_db()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
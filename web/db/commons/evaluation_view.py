@@ -0,0 +1,100 @@
+from psycopg2 import sql
+
+from web.commons.logging import logger
+
+# Vista con una fila por evaluación y una columna por métrica, más los
+# hiperparámetros que se codifican en el nombre del modelo.
+VIEW_NAME = "evaluation_wide"
+
+BASE_COLUMNS = [
+    "evaluation_id",
+    "model_id",
+    "model_name",
+    "algorithm",
+    "feature_extractor",
+    "normalization",
+    "start_date",
+    "end_date",
+    "phase",
+    "num_evaluations",
+    "learning_rate",
+    "number_of_companies",
+]
+
+METRIC_NAMES_QUERY = (
+    "SELECT DISTINCT metric_name FROM evaluation_metrics ORDER BY metric_name;"
+)
+
+VIEW_COLUMNS_QUERY = """
+    SELECT a.attname
+    FROM pg_attribute a
+    JOIN pg_class c ON a.attrelid = c.oid
+    WHERE c.relname = %s AND c.relkind = 'm' AND a.attnum > 0 AND NOT a.attisdropped
+    ORDER BY a.attnum;
+"""
+
+CREATE_VIEW_TEMPLATE = """
+    CREATE MATERIALIZED VIEW {view} AS
+    SELECT ev.evaluation_id, ev.model_id, m.name AS model_name, m.algorithm,
+           m.feature_extractor, m.normalization, ev.start_date, ev.end_date,
+           ev.phase, ev.num_evaluations,
+           substring(m.name from 'lr_([0-9]+\\.?[0-9]*)')::float AS learning_rate,
+           substring(m.name from 'ncompanies_([0-9]+)')::int AS number_of_companies
+           {metrics}
+    FROM evaluations ev
+    JOIN evaluation_metrics evm ON ev.evaluation_id = evm.evaluation_id
+    JOIN models m ON ev.model_id = m.model_id
+    GROUP BY ev.evaluation_id, m.model_id;
+    CREATE UNIQUE INDEX {index} ON {view} (evaluation_id);
+"""
+
+
+def _metric_names(cursor) -> list:
+    cursor.execute(METRIC_NAMES_QUERY)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _view_columns(cursor) -> list:
+    cursor.execute(VIEW_COLUMNS_QUERY, (VIEW_NAME,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _create_view(cursor, metric_names):
+    # Mismo agregado (media) que el pivot_table que hacía la página
+    metrics = sql.SQL("").join(
+        sql.SQL(", AVG(evm.value) FILTER (WHERE evm.metric_name = {}) AS {}").format(
+            sql.Literal(name), sql.Identifier(name)
+        )
+        for name in metric_names
+    )
+    cursor.execute(
+        sql.SQL(CREATE_VIEW_TEMPLATE).format(
+            view=sql.Identifier(VIEW_NAME),
+            index=sql.Identifier(f"idx_{VIEW_NAME}_evaluation"),
+            metrics=metrics,
+        )
+    )
+
+
+def refresh_evaluation_wide(cursor, only_if_missing=False):
+    """
+    Crea o refresca la vista evaluation_wide dentro de la transacción en curso.
+
+    Las columnas dependen de las métricas que existan, así que si aparece o
+    desaparece alguna la vista se vuelve a crear en lugar de refrescarse.
+    """
+    existing = _view_columns(cursor)
+    if existing and only_if_missing:
+        return
+
+    metric_names = _metric_names(cursor)
+    if existing == BASE_COLUMNS + metric_names:
+        cursor.execute(sql.SQL("REFRESH MATERIALIZED VIEW {}").format(sql.Identifier(VIEW_NAME)))
+        logger.info(f"Vista {VIEW_NAME} refrescada.")
+        return
+
+    cursor.execute(
+        sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {}").format(sql.Identifier(VIEW_NAME))
+    )
+    _create_view(cursor, metric_names)
+    logger.info(f"Vista {VIEW_NAME} creada con {len(metric_names)} métricas.")
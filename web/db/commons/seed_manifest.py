@@ -0,0 +1,41 @@
+import hashlib
+import json
+from pathlib import Path
+
+# Hash de contenido de cada fuente ya cargada (tabla seed_manifest).
+# Los uploaders lo consultan para no repetir trabajo en cada arranque.
+GET_HASH_QUERY = "SELECT content_hash FROM seed_manifest WHERE source = %s;"
+
+RECORD_HASH_QUERY = """
+    INSERT INTO seed_manifest (source, content_hash)
+    VALUES (%s, %s)
+    ON CONFLICT (source) DO UPDATE
+    SET content_hash = EXCLUDED.content_hash, applied_at = CURRENT_TIMESTAMP;
+"""
+
+
+def file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 del contenido de un fichero."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_hash(data) -> str:
+    """SHA-256 de una estructura serializable a JSON (independiente del orden de claves)."""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_unchanged(cursor, source: str, content_hash: str) -> bool:
+    """True si `source` ya se cargó con este mismo contenido."""
+    cursor.execute(GET_HASH_QUERY, (source,))
+    row = cursor.fetchone()
+    return row is not None and row[0] == content_hash
+
+
+def record(cursor, source: str, content_hash: str):
+    """Anota el hash aplicado. Debe ir en la misma transacción que los datos."""
+    cursor.execute(RECORD_HASH_QUERY, (source, content_hash))
@@ -0,0 +1,89 @@
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from web.commons.logging import logger
+
+from .db_connection import db_connection
+
+# Filas que se traen del servidor en cada viaje
+FETCH_SIZE = int(os.getenv("DB_STREAM_FETCH_SIZE", "5000"))
+
+_cursor_ids = itertools.count()
+
+
+def _compact_chunk(chunk: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    for column, dtype in dtypes.items():
+        if column not in chunk:
+            continue
+        if dtype == "datetime64[ns]":
+            chunk[column] = pd.to_datetime(chunk[column])
+        else:
+            chunk[column] = chunk[column].astype(dtype)
+    return chunk
+
+
+def _concat_chunks(chunks, columns, dtypes) -> pd.DataFrame:
+    """Une los bloques columna a columna sin pasar por objetos de Python."""
+    data = {}
+    for column in columns:
+        parts = [chunk[column] for chunk in chunks]
+        if dtypes.get(column) == "category":
+            data[column] = pd.Categorical(union_categoricals(parts))
+        elif len(parts) == 1:
+            data[column] = parts[0].to_numpy()
+        else:
+            data[column] = np.concatenate([p.to_numpy() for p in parts])
+    return pd.DataFrame(data, columns=columns)
+
+
+def read_frame(
+    query, params=None, dtypes=None, fetch_size=None, default_dtype=None
+) -> pd.DataFrame:
+    """
+    Ejecuta `query` con un cursor de servidor y construye el DataFrame por bloques.
+
+    Cada bloque de `fetch_size` filas se convierte enseguida a los tipos de
+    `dtypes` ({columna: "category" | "float32" | "int32" | "datetime64[ns]" ...}),
+    así nunca se tiene en memoria el resultado completo como objetos de Python.
+    Las columnas que no están en `dtypes` se convierten a `default_dtype` si se
+    indica (p. ej. las métricas de una vista con columnas variables).
+    """
+    dtypes = dtypes or {}
+    fetch_size = fetch_size or FETCH_SIZE
+    chunks, columns, naive_bytes = [], None, 0
+
+    with db_connection() as conn, conn.cursor(
+        name=f"stream_{next(_cursor_ids)}"
+    ) as cursor:
+        cursor.itersize = fetch_size
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            if columns is None:
+                columns = [desc[0] for desc in cursor.description]
+                if default_dtype:
+                    dtypes = {
+                        **{column: default_dtype for column in columns},
+                        **dtypes,
+                    }
+            chunk = pd.DataFrame.from_records(rows, columns=columns)
+            naive_bytes += int(chunk.memory_usage(deep=True).sum())
+            chunks.append(_compact_chunk(chunk, dtypes))
+
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+
+    frame = _concat_chunks(chunks, columns, dtypes)
+    compact_bytes = int(frame.memory_usage(deep=True).sum())
+    logger.debug(
+        f"{len(frame)} filas en {len(chunks)} bloques: {compact_bytes / 1024**2:.1f} MB "
+        f"(ahorro de {(naive_bytes - compact_bytes) / 1024**2:.1f} MB frente a objetos)"
+    )
+    frame.attrs["bytes_saved"] = naive_bytes - compact_bytes
+    return frame
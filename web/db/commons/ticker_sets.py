@@ -0,0 +1,11 @@
+SIGNATURE_SEPARATOR = ","
+
+
+def canonical_tickers(tickers) -> list:
+    """Tickers sin duplicados y ordenados por código (igual que COLLATE "C" en Postgres)."""
+    return sorted(set(tickers))
+
+
+def ticker_signature(tickers) -> str:
+    """Firma canónica de un conjunto de tickers: dos carteras iguales tienen la misma firma."""
+    return SIGNATURE_SEPARATOR.join(canonical_tickers(tickers))
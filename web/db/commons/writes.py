@@ -0,0 +1,151 @@
+from web.db.commons.ticker_sets import canonical_tickers, ticker_signature
+
+# Escrituras de carteras, pesos y modelos. Cada una es un número fijo de
+# sentencias sobre el cursor recibido, sea cual sea el número de compañías; la
+# transacción (commit/rollback) la gestiona quien llama.
+
+RESOLVE_TICKERS_QUERY = """
+    SELECT ticker, company_id FROM companies WHERE ticker = ANY(%s);
+"""
+
+# Si el usuario ya tiene una cartera con ese nombre no se escribe nada y la
+# consulta no devuelve filas
+SAVE_PORTFOLIO_QUERY = """
+    WITH portfolio AS (
+        INSERT INTO portfolios (user_id, name, portfolio_value)
+        VALUES (%(user_id)s, %(name)s, %(value)s)
+        ON CONFLICT (user_id, name) DO NOTHING
+        RETURNING portfolio_id
+    ), members AS (
+        INSERT INTO portfolio_companies (portfolio_id, company_id)
+        SELECT p.portfolio_id, unnest(%(company_ids)s::int[])
+        FROM portfolio p
+        ON CONFLICT DO NOTHING
+    ), favorite AS (
+        INSERT INTO favorites (user_id, type, reference_id, name)
+        SELECT %(user_id)s, 'portfolio', p.portfolio_id, %(name)s
+        FROM portfolio p
+        ON CONFLICT (user_id, type, reference_id) DO UPDATE SET name = EXCLUDED.name
+    )
+    SELECT portfolio_id FROM portfolio;
+"""
+
+# Volver a guardar los pesos el mismo día sustituye los de ese día
+SAVE_WEIGHTS_QUERY = """
+    INSERT INTO portfolio_weights (portfolio_id, company_id, weight, recorded_at)
+    SELECT %(portfolio_id)s, company_id, weight, %(recorded_at)s
+    FROM unnest(%(company_ids)s::int[], %(weights)s::float8[]) AS w (company_id, weight)
+    ON CONFLICT (portfolio_id, company_id, recorded_at) DO UPDATE
+    SET weight = EXCLUDED.weight;
+"""
+
+PORTFOLIO_COMPANIES_QUERY = """
+    SELECT company_id FROM portfolio_companies WHERE portfolio_id = %s;
+"""
+
+# Un modelo ya registrado (mismo nombre, algoritmo y extractor) no se toca: sus
+# evaluaciones guardadas se refieren a su checkpoint y normalización
+REGISTER_MODEL_QUERY = """
+    WITH model AS (
+        INSERT INTO models (algorithm, feature_extractor, ncompanies, file_path, created_at, name,
+                            normalization, ticker_set, ticker_signature)
+        VALUES (%(algorithm)s, %(feature_extractor)s, %(ncompanies)s, %(file_path)s, %(created_at)s,
+                %(name)s, %(normalization)s, %(ticker_set)s, %(ticker_signature)s)
+        ON CONFLICT (name, algorithm, feature_extractor) DO NOTHING
+        RETURNING model_id
+    ), links AS (
+        INSERT INTO model_companies (model_id, company_id)
+        SELECT m.model_id, unnest(%(company_ids)s::int[])
+        FROM model m
+        ON CONFLICT DO NOTHING
+    )
+    SELECT model_id FROM model;
+"""
+
+
+def resolve_company_ids(cursor, tickers) -> list:
+    """company_id de cada ticker (sin duplicados). Lanza ValueError si falta alguno."""
+    tickers = list(dict.fromkeys(tickers))
+    cursor.execute(RESOLVE_TICKERS_QUERY, (tickers,))
+    company_ids = dict(cursor.fetchall())
+    missing = [t for t in tickers if t not in company_ids]
+    if missing:
+        raise ValueError(
+            f"Error: Company with ticker '{', '.join(missing)}' not found in the database."
+        )
+    return [company_ids[t] for t in tickers]
+
+
+def save_portfolio(cursor, user_id, name, tickers, portfolio_value=0.0) -> int:
+    """
+    Crea una cartera favorita con sus compañías. Devuelve su portfolio_id.
+    Lanza ValueError si el usuario ya tiene una cartera con ese nombre.
+    """
+    cursor.execute(
+        SAVE_PORTFOLIO_QUERY,
+        {
+            "user_id": user_id,
+            "name": name,
+            "value": portfolio_value,
+            "company_ids": resolve_company_ids(cursor, tickers),
+        },
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError(f"Ya existe un portafolio con el nombre '{name}'.")
+    return row[0]
+
+
+def portfolio_company_ids(cursor, portfolio_id) -> set:
+    cursor.execute(PORTFOLIO_COMPANIES_QUERY, (portfolio_id,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def save_weights(cursor, portfolio_id, companies_weights: dict, recorded_at):
+    """Guarda los pesos {company_id: peso} de una cartera para el día `recorded_at`."""
+    cursor.execute(
+        SAVE_WEIGHTS_QUERY,
+        {
+            "portfolio_id": portfolio_id,
+            "company_ids": list(companies_weights.keys()),
+            "weights": [float(w) for w in companies_weights.values()],
+            "recorded_at": recorded_at,
+        },
+    )
+
+
+def register_model(
+    cursor,
+    name,
+    algorithm,
+    feature_extractor,
+    companies_abv,
+    file_path,
+    created_at,
+    normalization,
+) -> int:
+    """
+    Registra un modelo y sus compañías. Devuelve su model_id.
+    Lanza ValueError si ya hay un modelo con ese nombre, algoritmo y extractor.
+    """
+    cursor.execute(
+        REGISTER_MODEL_QUERY,
+        {
+            "algorithm": algorithm,
+            "feature_extractor": feature_extractor,
+            "ncompanies": len(companies_abv),
+            "file_path": file_path,
+            "created_at": created_at,
+            "name": name,
+            "normalization": normalization,
+            "ticker_set": canonical_tickers(companies_abv),
+            "ticker_signature": ticker_signature(companies_abv),
+            "company_ids": resolve_company_ids(cursor, companies_abv),
+        },
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError(
+            f"Ya existe un modelo '{name}' con {algorithm} y {feature_extractor}."
+        )
+    return row[0]
@@ -103,6 +103,34 @@ TABLES = {
             value FLOAT NOT NULL
         );
     """,
+    "training_jobs": """
+        CREATE TABLE IF NOT EXISTS training_jobs (
+            job_id SERIAL PRIMARY KEY,
+            user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued'
+                CHECK (status IN ('queued', 'running', 'completed', 'failed', 'cancelled')),
+            parameters JSONB NOT NULL,
+            model_id INT REFERENCES models(model_id) ON DELETE SET NULL,
+            cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+            worker VARCHAR(255),
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_training_jobs_status_created
+            ON training_jobs (status, created_at);
+        CREATE INDEX IF NOT EXISTS idx_training_jobs_user_created
+            ON training_jobs (user_id, created_at DESC);
+    """,
+    "seed_manifest": """
+        CREATE TABLE IF NOT EXISTS seed_manifest (
+            source VARCHAR(255) PRIMARY KEY,
+            content_hash CHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """,
 }
 
 
@@ -0,0 +1,138 @@
+import argparse
+
+from web.commons.logging import logger
+from web.db.commons.db_connection import connect_db
+
+SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+# Evita que dos contenedores migren a la vez (web y worker arrancan juntos)
+MIGRATION_LOCK_ID = 4_203_117
+
+# Migraciones en orden. Solo se añaden al final y nunca se modifican una vez
+# publicadas: cada una se aplica una vez por base de datos.
+MIGRATIONS = [
+    (
+        1,
+        "Indexes for the hot join paths",
+        # evaluations(model_id), favorites(user_id, type) y models(name) ya están
+        # cubiertos por el prefijo de sus restricciones UNIQUE, así que no se duplican.
+        """
+        CREATE INDEX IF NOT EXISTS idx_evaluation_metrics_evaluation
+            ON evaluation_metrics (evaluation_id);
+        CREATE INDEX IF NOT EXISTS idx_portfolio_weights_portfolio_recorded
+            ON portfolio_weights (portfolio_id, recorded_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_model_companies_company
+            ON model_companies (company_id);
+        """,
+    ),
+    (
+        2,
+        "Ticker-set signature on models",
+        # Orden COLLATE "C" para que coincida con sorted() de Python (ticker_sets.py)
+        """
+        ALTER TABLE models ADD COLUMN IF NOT EXISTS ticker_set TEXT[];
+        ALTER TABLE models ADD COLUMN IF NOT EXISTS ticker_signature TEXT;
+        UPDATE models m
+        SET ticker_set = s.tickers,
+            ticker_signature = array_to_string(s.tickers, ',')
+        FROM (
+            SELECT mc.model_id,
+                   array_agg(DISTINCT c.ticker::text COLLATE "C" ORDER BY c.ticker::text COLLATE "C")
+                       AS tickers
+            FROM model_companies mc
+            JOIN companies c ON mc.company_id = c.company_id
+            GROUP BY mc.model_id
+        ) s
+        WHERE m.model_id = s.model_id;
+        CREATE INDEX IF NOT EXISTS idx_models_ticker_signature
+            ON models (ticker_signature);
+        CREATE INDEX IF NOT EXISTS idx_models_ticker_set
+            ON models USING GIN (ticker_set);
+        """,
+    ),
+    (
+        3,
+        "Daily portfolio value series",
+        # Una fila de 4 + 4 + 4 bytes por cartera y sesión; la clave primaria
+        # sirve tanto para leer la serie como para buscar el último día guardado.
+        """
+        CREATE TABLE IF NOT EXISTS portfolio_values (
+            portfolio_id INT REFERENCES portfolios(portfolio_id) ON DELETE CASCADE,
+            date DATE NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (portfolio_id, date)
+        );
+        """,
+    ),
+]
+
+
+def current_version(cursor) -> int:
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version;")
+    return cursor.fetchone()[0]
+
+
+def migrate(target=None):
+    """Aplica, cada una en su transacción, las migraciones pendientes hasta `target`."""
+    conn = None
+    try:
+        conn = connect_db()
+        with conn.cursor() as cursor:
+            cursor.execute(SCHEMA_VERSION_TABLE)
+            conn.commit()
+
+            applied = 0
+            for version, description, sql in MIGRATIONS:
+                if target is not None and version > target:
+                    break
+
+                cursor.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+                if version <= current_version(cursor):
+                    conn.rollback()
+                    continue
+
+                logger.info(f"Aplicando migración {version}: {description}")
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s);",
+                    (version, description),
+                )
+                conn.commit()
+                applied += 1
+
+            logger.success(
+                f"Esquema en la versión {current_version(cursor)} "
+                f"({applied} migraciones aplicadas)."
+            )
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.exception(f"Error al migrar el esquema: {e}")
+        raise
+
+    finally:
+        if conn:
+            conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument(
+        "--target",
+        type=int,
+        default=None,
+        help="Stop after this schema version (defaults to the latest)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    migrate(args.target)
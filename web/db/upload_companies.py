@@ -1,6 +1,12 @@
+import argparse
+
 from commons.db_connection import connect_db
+from psycopg2.extras import execute_values
 
 from web.commons.logging import logger
+from web.db.commons.seed_manifest import data_hash, is_unchanged, record
+
+MANIFEST_SOURCE = "companies"
 
 # Dictionary of companies by sector
 sectors = {
@@ -107,40 +113,51 @@ sectors = {
 }
 
 
-def upload_companies(add_cash=True):
-    """Upload all companies to the database, avoiding duplicates."""
+UPSERT_COMPANIES_QUERY = """
+    INSERT INTO companies (name, ticker, sector)
+    VALUES %s
+    ON CONFLICT (ticker) DO UPDATE
+    SET name = EXCLUDED.name, sector = EXCLUDED.sector
+    WHERE (companies.name, companies.sector)
+        IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.sector)
+    RETURNING ticker, (xmax = 0) AS inserted;
+"""
+
+
+def company_rows(add_cash=True) -> list:
+    """(name, ticker, sector) por ticker; si un ticker se repite se queda el primero."""
+    rows = {}
+    for sector, companies in sectors.items():
+        for ticker, name in companies:
+            rows.setdefault(ticker, (name, ticker, sector))
+    if add_cash:
+        rows.setdefault("CASH", ("Cash", "CASH", None))
+    return list(rows.values())
+
+
+def upload_companies(add_cash=True, force=False):
+    """Upload all companies to the database, applying only the changes."""
     conn = None
+    rows = company_rows(add_cash)
+    content_hash = data_hash(rows)
     try:
         conn = connect_db()
         with conn.cursor() as cursor:
-            for sector, companies in sectors.items():
-                for ticker, name in companies:
-                    cursor.execute(
-                        "SELECT 1 FROM companies WHERE ticker = %s", (ticker,)
-                    )
-                    if not cursor.fetchone():
-                        cursor.execute(
-                            """
-                            INSERT INTO companies (name, ticker, sector)
-                            VALUES (%s, %s, %s)
-                            """,
-                            (name, ticker, sector),
-                        )
-                        logger.info(f"Added {name} ({ticker}) in {sector}")
-                    else:
-                        logger.debug(f"Skipped duplicate: {ticker}")
-
-            if add_cash:
-                cursor.execute("SELECT 1 FROM companies WHERE ticker = 'CASH'")
-                if not cursor.fetchone():
-                    cursor.execute(
-                        "INSERT INTO companies (name, ticker) VALUES (%s, %s)",
-                        ("Cash", "CASH"),
-                    )
-                    logger.info("Added synthetic 'Cash' asset")
+            if not force and is_unchanged(cursor, MANIFEST_SOURCE, content_hash):
+                logger.info("Companies unchanged since last upload — skipping.")
+                return
+
+            changed = execute_values(
+                cursor, UPSERT_COMPANIES_QUERY, rows, fetch=True
+            )
+            for ticker, inserted in changed:
+                logger.info(f"{'Added' if inserted else 'Updated'} {ticker}")
+            record(cursor, MANIFEST_SOURCE, content_hash)
 
         conn.commit()
-        logger.success("Companies upload completed!")
+        logger.success(
+            f"Companies upload completed! {len(changed)} of {len(rows)} changed."
+        )
 
     except Exception as e:
         logger.exception(f"Error during upload: {e}")
@@ -150,5 +167,16 @@ def upload_companies(add_cash=True):
             conn.close()
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Upload the company catalog")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Upload even if the catalog has not changed",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    upload_companies()
+    args = parse_args()
+    upload_companies(force=args.force)
@@ -1,13 +1,18 @@
 import argparse
+import io
 import os
+import time
 from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
 from commons.connect_dotenv import load_env_from_project_root
+from psycopg2.extras import execute_values
 
 from web.commons.logging import logger
 from web.db.commons.db_connection import connect_db
+from web.db.commons.evaluation_view import refresh_evaluation_wide
+from web.db.commons.seed_manifest import file_hash, is_unchanged, record
 
 # ========================
 # Configuración
@@ -18,6 +23,42 @@ DEFAULT_CSV_PATH = Path(
     os.getenv("RESULTS_CSV_PATH", "examples/results/evaluation_results.csv")
 )
 
+# Periodos (inicio, fin) de cada fase
+EVAL_PERIOD = (datetime(2018, 6, 30), datetime(2022, 6, 30))
+TRAIN_PERIOD = (datetime(2008, 6, 30), datetime(2018, 6, 30))
+NUM_EVALUATIONS = 50
+BATCH_SIZE = 1000
+MANIFEST_SOURCE = "evaluations"
+
+# Si hay varios modelos con el mismo nombre se usa el primero
+RESOLVE_MODELS_QUERY = """
+    SELECT DISTINCT ON (name) name, model_id
+    FROM models
+    WHERE name = ANY(%s)
+    ORDER BY name, model_id;
+"""
+
+# Una evaluación por (modelo, fase): volver a cargar la actualiza en lugar de duplicarla
+UPSERT_EVALUATIONS_QUERY = """
+    INSERT INTO evaluations (model_id, start_date, end_date, num_evaluations, evaluation_notes, phase)
+    VALUES %s
+    ON CONFLICT (model_id, phase) DO UPDATE
+    SET start_date = EXCLUDED.start_date,
+        end_date = EXCLUDED.end_date,
+        num_evaluations = EXCLUDED.num_evaluations,
+        evaluation_notes = EXCLUDED.evaluation_notes
+    RETURNING model_id, phase, evaluation_id;
+"""
+
+DELETE_METRICS_QUERY = """
+    DELETE FROM evaluation_metrics WHERE evaluation_id = ANY(%s);
+"""
+
+COPY_METRICS_QUERY = """
+    COPY evaluation_metrics (evaluation_id, metric_name, value)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Upload evaluation data from CSV")
@@ -27,6 +68,11 @@ def parse_args():
         default=DEFAULT_CSV_PATH,
         help="Path to the evaluation results CSV file",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Upload even if the CSV has not changed since the last upload",
+    )
     return parser.parse_args()
 
 
@@ -41,23 +87,35 @@ def convert_timestamp_format(df):
     return df
 
 
-def insert_evaluation(cursor, model_id, start_date, end_date, num_evals, notes, phase):
-    query = """
-        INSERT INTO evaluations (model_id, start_date, end_date, num_evaluations, evaluation_notes, phase)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        RETURNING evaluation_id;
-    """
-    cursor.execute(query, (model_id, start_date, end_date, num_evals, notes, phase))
-    return cursor.fetchone()[0]
+def metric_columns(df) -> list:
+    return [
+        col
+        for col in df.columns
+        if col.startswith("mean_") or col.startswith("std_") or col == "final_drawdowns"
+    ]
+
+
+def resolve_model_ids(cursor, names) -> dict:
+    """Resuelve todos los nombres de modelo en una sola consulta."""
+    cursor.execute(RESOLVE_MODELS_QUERY, (list(names),))
+    return dict(cursor.fetchall())
 
 
-def insert_metrics(cursor, evaluation_id, metrics: dict):
-    query = """
-        INSERT INTO evaluation_metrics (evaluation_id, metric_name, value)
-        VALUES (%s, %s, %s);
-    """
-    for name, value in metrics.items():
-        cursor.execute(query, (evaluation_id, name, value))
+def upsert_evaluations(cursor, rows) -> dict:
+    """Inserta o actualiza las evaluaciones en bloque. Devuelve {(model_id, phase): evaluation_id}."""
+    result = execute_values(
+        cursor, UPSERT_EVALUATIONS_QUERY, rows, page_size=BATCH_SIZE, fetch=True
+    )
+    return {(model_id, phase): evaluation_id for model_id, phase, evaluation_id in result}
+
+
+def replace_metrics(cursor, metrics: pd.DataFrame):
+    """Sustituye las métricas de las evaluaciones cargando las nuevas con COPY FROM STDIN."""
+    cursor.execute(DELETE_METRICS_QUERY, (metrics["evaluation_id"].unique().tolist(),))
+    buffer = io.StringIO()
+    metrics.to_csv(buffer, index=False, header=False, na_rep="NaN")
+    buffer.seek(0)
+    cursor.copy_expert(COPY_METRICS_QUERY, buffer)
 
 
 # ========================
@@ -65,10 +123,8 @@ def insert_metrics(cursor, evaluation_id, metrics: dict):
 # ========================
 
 
-def insert_data_from_csv(csv_file: Path):
+def insert_data_from_csv(csv_file: Path, force: bool = False):
     conn = None
-    inserted = 0
-    skipped = 0
 
     logger.info(f"Reading CSV file: {csv_file}")
     if not csv_file.exists():
@@ -76,61 +132,96 @@ def insert_data_from_csv(csv_file: Path):
         return
 
     try:
+        started = time.perf_counter()
+        content_hash = file_hash(csv_file)
         conn = connect_db()
         with conn.cursor() as cursor:
-            df = pd.read_csv(csv_file, sep=";", decimal=",", header=0)
-            df = convert_timestamp_format(df)
-
-            for _, row in df.iterrows():
-                model_name = row.get("model_name")
-                phase = row.get("phase")
-
-                if not model_name or not phase:
-                    logger.warning("Row with missing data — skipping.")
-                    skipped += 1
-                    continue
-
-                if phase == "eval":
-                    end_date = datetime(2022, 6, 30)
-                    start_date = datetime(2018, 6, 30)
-                else:
-                    end_date = datetime(2018, 6, 30)
-                    start_date = datetime(2008, 6, 30)
-
-                cursor.execute(
-                    "SELECT model_id FROM models WHERE name = %s", (model_name,)
-                )
-                result = cursor.fetchone()
-                if not result:
-                    logger.warning(f"Model not found in database: {model_name}")
-                    skipped += 1
-                    continue
+            if not force and is_unchanged(cursor, MANIFEST_SOURCE, content_hash):
+                logger.info(f"{csv_file} unchanged since last upload — skipping.")
+                refresh_evaluation_wide(cursor, only_if_missing=True)
+                conn.commit()
+                return
 
-                model_id = result[0]
-                notes = f"Algorithm: {row['algorithm']}, Feature: {row['feature']}"
+        df = pd.read_csv(csv_file, sep=";", decimal=",", header=0)
+        df = convert_timestamp_format(df)
 
-                evaluation_id = insert_evaluation(
-                    cursor, model_id, start_date, end_date, 50, notes, phase
-                )
+        valid = df["model_name"].notna() & df["phase"].notna()
+        skipped = int((~valid).sum())
+        if skipped:
+            logger.warning(f"{skipped} rows with missing data — skipping.")
+        df = df[valid].reset_index(drop=True)
 
-                metrics = {
-                    col: row[col]
-                    for col in df.columns
-                    if col.startswith("mean_")
-                    or col.startswith("std_")
-                    or col == "final_drawdowns"
-                }
-
-                insert_metrics(cursor, evaluation_id, metrics)
-                logger.info(f"Inserted: {model_name} | {phase}")
-                inserted += 1
+        with conn.cursor() as cursor:
+            model_ids = resolve_model_ids(cursor, df["model_name"].unique())
+            df["model_id"] = df["model_name"].map(model_ids)
+
+            missing = df["model_id"].isna()
+            for model_name in df.loc[missing, "model_name"].unique():
+                logger.warning(f"Model not found in database: {model_name}")
+            skipped += int(missing.sum())
+            df = df[~missing].reset_index(drop=True)
+            df["model_id"] = df["model_id"].astype(int)
+
+            # Si el CSV repite (modelo, fase) vale la última fila, como en clean_duplicates
+            duplicated = df.duplicated(["model_id", "phase"], keep="last")
+            if duplicated.any():
+                logger.warning(f"{int(duplicated.sum())} duplicated evaluations — keeping the last.")
+                df = df[~duplicated].reset_index(drop=True)
+
+            if df.empty:
+                logger.info(f"Nothing to insert. Skipped: {skipped}")
+                return
+
+            is_eval = df["phase"] == "eval"
+            rows = [
+                (
+                    model_id,
+                    EVAL_PERIOD[0] if eval_phase else TRAIN_PERIOD[0],
+                    EVAL_PERIOD[1] if eval_phase else TRAIN_PERIOD[1],
+                    NUM_EVALUATIONS,
+                    f"Algorithm: {algorithm}, Feature: {feature}",
+                    phase,
+                )
+                for model_id, eval_phase, algorithm, feature, phase in zip(
+                    df["model_id"].tolist(), is_eval, df["algorithm"], df["feature"], df["phase"]
+                )
+            ]
+            evaluation_ids = upsert_evaluations(cursor, rows)
+            df["evaluation_id"] = [
+                evaluation_ids[key] for key in zip(df["model_id"].tolist(), df["phase"])
+            ]
+
+            metrics = df.melt(
+                id_vars=["evaluation_id"],
+                value_vars=metric_columns(df),
+                var_name="metric_name",
+                value_name="value",
+            )
+            replace_metrics(cursor, metrics)
+            # La vista se refresca en la misma transacción: nunca se ve a medias
+            refresh_evaluation_wide(cursor)
+            # Con filas de modelos aún no registrados no se marca el CSV como subido:
+            # la próxima carga las reintenta aunque el CSV no haya cambiado
+            if missing.any():
+                logger.warning(
+                    f"{int(missing.sum())} rows skipped for unknown models — "
+                    "the CSV will be reprocessed on the next upload."
+                )
+            else:
+                record(cursor, MANIFEST_SOURCE, content_hash)
 
             conn.commit()
-            logger.info(
-                f"Finished insertion. Total inserted: {inserted}, skipped: {skipped}"
-            )
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Finished upload. Total upserted: {len(df)} evaluations and "
+            f"{len(metrics)} metrics, skipped: {skipped} "
+            f"({(len(df) + len(metrics)) / elapsed:,.0f} rows/s in {elapsed:.2f}s)"
+        )
 
     except Exception as e:
+        if conn:
+            conn.rollback()
         logger.exception(f"Error during evaluation data upload: {e}")
 
     finally:
@@ -141,4 +232,4 @@ def insert_data_from_csv(csv_file: Path):
 
 if __name__ == "__main__":
     args = parse_args()
-    insert_data_from_csv(args.csv_file)
+    insert_data_from_csv(args.csv_file, force=args.force)
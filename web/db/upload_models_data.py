@@ -7,26 +7,48 @@ from pathlib import Path
 
 from commons.configurations import get_companies
 from commons.connect_dotenv import load_env_from_project_root
+from psycopg2.extras import execute_values
 
 from web.commons.logging import logger
 from web.db.commons.db_connection import connect_db
+from web.db.commons.seed_manifest import file_hash, is_unchanged, record
+from web.db.commons.ticker_sets import canonical_tickers, ticker_signature
 
 # Carga variables desde .env
 load_env_from_project_root()
 
 DEFAULT_JSON_PATH = Path(os.getenv("MODEL_HIERARCHY", "models/metadata/hierarchy.json"))
 
-INSERT_MODEL_QUERY = """
-    INSERT INTO models (algorithm, feature_extractor, ncompanies, file_path, created_at, name, normalization)
-    VALUES (%s, %s, %s, %s, %s, %s, %s)
-    RETURNING model_id;
+MANIFEST_SOURCE = "models"
+
+# Solo devuelve los modelos nuevos o los que han cambiado
+UPSERT_MODELS_QUERY = """
+    INSERT INTO models (algorithm, feature_extractor, ncompanies, file_path, created_at, name, normalization,
+                        ticker_set, ticker_signature)
+    VALUES %s
+    ON CONFLICT (name, algorithm, feature_extractor) DO UPDATE
+    SET ncompanies = EXCLUDED.ncompanies,
+        file_path = EXCLUDED.file_path,
+        created_at = EXCLUDED.created_at,
+        normalization = EXCLUDED.normalization,
+        ticker_set = EXCLUDED.ticker_set,
+        ticker_signature = EXCLUDED.ticker_signature
+    WHERE (models.ncompanies, models.file_path, models.created_at, models.normalization,
+           models.ticker_signature)
+        IS DISTINCT FROM
+        (EXCLUDED.ncompanies, EXCLUDED.file_path, EXCLUDED.created_at, EXCLUDED.normalization,
+         EXCLUDED.ticker_signature)
+    RETURNING model_id, name, ticker_set, (xmax = 0) AS inserted;
 """
 
-INSERT_COMPANY_QUERY = """
+INSERT_COMPANIES_QUERY = """
     INSERT INTO model_companies (model_id, company_id)
-    VALUES (%s, %s);
+    VALUES %s
+    ON CONFLICT (model_id, company_id) DO NOTHING;
 """
 
+COMPANY_IDS_QUERY = "SELECT ticker, company_id FROM companies WHERE ticker = ANY(%s);"
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -38,6 +60,11 @@ def parse_args():
         default=DEFAULT_JSON_PATH,
         help="Path to the model hierarchy JSON file",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Upload even if the JSON has not changed since the last upload",
+    )
     return parser.parse_args()
 
 
@@ -59,69 +86,93 @@ def detect_normalization(name):
     return "standard"  # Default normalization
 
 
-def search_company(cursor, ticker):
-    cursor.execute("SELECT company_id FROM companies WHERE ticker = %s", (ticker,))
-    return cursor.fetchone()
-
-
-def insert_models_from_json(json_path: Path):
-    """Insert model metadata into the database from a JSON file."""
+def model_rows(data) -> list:
+    """Filas de la tabla models a partir de la jerarquía de modelos."""
+    rows = {}
+    for algorithm, features in data.get("gym_models", {}).items():
+        for feature_extractor, models in features.items():
+            for name in models:
+                ncompanies = extract_ncompanies(name)
+                if not ncompanies:
+                    logger.warning(f"Skipped: No 'ncompanies' in model name: {name}")
+                    continue
+                companies_abv, _ = get_companies(ncompanies)
+                tickers = companies_abv + ["CASH"]
+                # Clave única de la tabla: un duplicado en el JSON se carga una vez
+                rows[(name, algorithm, feature_extractor)] = (
+                    algorithm,
+                    feature_extractor,
+                    ncompanies,
+                    f"models/{algorithm}/{feature_extractor}/{name}/",
+                    extract_datetime_from_name(name),
+                    name,
+                    detect_normalization(name),
+                    canonical_tickers(tickers),
+                    ticker_signature(tickers),
+                )
+    return list(rows.values())
+
+
+def model_company_rows(cursor, changed_models) -> list:
+    """(model_id, company_id) de los modelos insertados o actualizados."""
+    tickers_by_model = {
+        model_id: ticker_set for model_id, _, ticker_set, _ in changed_models
+    }
+
+    all_tickers = sorted({t for tickers in tickers_by_model.values() for t in tickers})
+    cursor.execute(COMPANY_IDS_QUERY, (all_tickers,))
+    company_ids = dict(cursor.fetchall())
+
+    missing = set(all_tickers) - company_ids.keys()
+    if missing:
+        raise ValueError(f"Company not found in DB: {', '.join(sorted(missing))}")
+
+    return [
+        (model_id, company_ids[ticker])
+        for model_id, tickers in tickers_by_model.items()
+        for ticker in tickers
+    ]
+
+
+def insert_models_from_json(json_path: Path, force: bool = False):
+    """Upsert model metadata from a JSON file, skipping it if it has not changed."""
     conn = None
     if not json_path.exists():
         logger.error(f"JSON not found: {json_path}")
         return
 
     try:
-        with open(json_path, "r") as f:
-            data = json.load(f)
-
+        content_hash = file_hash(json_path)
         conn = connect_db()
         with conn.cursor() as cursor:
-            for algorithm, features in data.get("gym_models", {}).items():
-                for feature_extractor, models in features.items():
-                    for name in models:
-                        ncompanies = extract_ncompanies(name)
-                        created_at = extract_datetime_from_name(name)
-                        normalization = detect_normalization(name)
-                        file_path = f"models/{algorithm}/{feature_extractor}/{name}/"
-
-                        if not ncompanies:
-                            logger.warning(
-                                f"Skipped: No 'ncompanies' in model name: {name}"
-                            )
-                            continue
-
-                        cursor.execute(
-                            INSERT_MODEL_QUERY,
-                            (
-                                algorithm,
-                                feature_extractor,
-                                ncompanies,
-                                file_path,
-                                created_at,
-                                name,
-                                normalization,
-                            ),
-                        )
-                        model_id = cursor.fetchone()[0]
-                        logger.info(f"Inserted model '{name}' with ID {model_id}")
-
-                        companies_abv, _ = get_companies(ncompanies)
-                        companies_abv.append("CASH")
-
-                        for ticker in companies_abv:
-                            result = search_company(cursor, ticker)
-                            if result:
-                                cursor.execute(
-                                    INSERT_COMPANY_QUERY, (model_id, result[0])
-                                )
-                            else:
-                                raise ValueError(f"Company not found in DB: {ticker}")
+            if not force and is_unchanged(cursor, MANIFEST_SOURCE, content_hash):
+                logger.info(f"{json_path} unchanged since last upload — skipping.")
+                return
+
+            with open(json_path, "r") as f:
+                data = json.load(f)
+
+            rows = model_rows(data)
+            changed = execute_values(cursor, UPSERT_MODELS_QUERY, rows, fetch=True)
+            for model_id, name, _, inserted in changed:
+                logger.info(
+                    f"{'Inserted' if inserted else 'Updated'} model '{name}' with ID {model_id}"
+                )
+
+            if changed:
+                execute_values(
+                    cursor, INSERT_COMPANIES_QUERY, model_company_rows(cursor, changed)
+                )
+            record(cursor, MANIFEST_SOURCE, content_hash)
 
             conn.commit()
-            logger.success("Model metadata inserted successfully!")
+            logger.success(
+                f"Model metadata uploaded! {len(changed)} of {len(rows)} models changed."
+            )
 
     except Exception as e:
+        if conn:
+            conn.rollback()
         logger.exception(f"Error during model metadata upload: {e}")
 
     finally:
@@ -131,4 +182,4 @@ def insert_models_from_json(json_path: Path):
 
 if __name__ == "__main__":
     args = parse_args()
-    insert_models_from_json(args.json_file)
+    insert_models_from_json(args.json_file, force=args.force)
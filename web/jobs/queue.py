@@ -0,0 +1,186 @@
+import os
+
+from psycopg2.extras import Json
+
+from web.db.commons.db_connection import db_connection
+
+# Trabajos activos (en cola o en ejecución) que puede tener cada usuario
+MAX_ACTIVE_JOBS_PER_USER = int(os.getenv("TRAINING_MAX_ACTIVE_JOBS_PER_USER", "3"))
+# Trabajos de un mismo usuario que pueden entrenar a la vez
+MAX_RUNNING_JOBS_PER_USER = int(os.getenv("TRAINING_MAX_RUNNING_JOBS_PER_USER", "1"))
+
+ACTIVE_STATUSES = ("queued", "running")
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobLimitError(Exception):
+    """El usuario ya tiene el máximo de trabajos activos."""
+
+
+# Espacio de claves de los advisory locks por usuario de la cola. Contar y
+# escribir con el lock del usuario tomado serializa sus encolados y la toma de
+# sus trabajos, así dos transacciones no pueden pasar a la vez el mismo límite
+USER_LOCK_NAMESPACE = 7001
+
+USER_LOCK_QUERY = "SELECT pg_advisory_xact_lock(%s, %s);"
+
+ENQUEUE_JOB_QUERY = """
+    INSERT INTO training_jobs (user_id, parameters)
+    SELECT %(user_id)s, %(parameters)s
+    WHERE (
+        SELECT COUNT(*) FROM training_jobs
+        WHERE user_id = %(user_id)s AND status IN ('queued', 'running')
+    ) < %(max_active)s
+    RETURNING job_id;
+"""
+
+# Trabajo en cola más antiguo cuyo usuario no haya llegado a su límite.
+# SKIP LOCKED permite varios workers sin que se bloqueen entre sí.
+CLAIM_CANDIDATE_QUERY = """
+    SELECT j.job_id, j.user_id
+    FROM training_jobs j
+    WHERE j.status = 'queued'
+      AND NOT j.cancel_requested
+      AND (
+          SELECT COUNT(*) FROM training_jobs r
+          WHERE r.user_id = j.user_id AND r.status = 'running'
+      ) < %(max_running)s
+    ORDER BY j.created_at
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1;
+"""
+
+# Con el lock del usuario tomado se vuelve a contar antes de marcarlo 'running'
+CLAIM_JOB_QUERY = """
+    UPDATE training_jobs
+    SET status = 'running', worker = %(worker)s,
+        started_at = NOW(), heartbeat_at = NOW()
+    WHERE job_id = %(job_id)s
+      AND (
+          SELECT COUNT(*) FROM training_jobs r
+          WHERE r.user_id = %(user_id)s AND r.status = 'running'
+      ) < %(max_running)s
+    RETURNING job_id, user_id, parameters;
+"""
+
+HEARTBEAT_QUERY = """
+    UPDATE training_jobs SET heartbeat_at = NOW()
+    WHERE job_id = %s
+    RETURNING cancel_requested;
+"""
+
+FINISH_JOB_QUERY = """
+    UPDATE training_jobs
+    SET status = %s, model_id = %s, error = %s, finished_at = NOW()
+    WHERE job_id = %s AND status = 'running';
+"""
+
+CANCEL_JOB_QUERY = """
+    UPDATE training_jobs
+    SET cancel_requested = TRUE,
+        status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+        finished_at = CASE WHEN status = 'queued' THEN NOW() ELSE finished_at END
+    WHERE job_id = %s AND user_id = %s AND status IN ('queued', 'running')
+    RETURNING status;
+"""
+
+USER_JOBS_QUERY = """
+    SELECT job_id, status, parameters->>'model_name' AS model_name,
+           parameters->>'algorithm' AS algorithm, model_id, error,
+           created_at, started_at, finished_at, cancel_requested
+    FROM training_jobs
+    WHERE user_id = %s
+    ORDER BY created_at DESC
+    LIMIT %s;
+"""
+
+FAIL_STALE_JOBS_QUERY = """
+    UPDATE training_jobs
+    SET status = 'failed', error = 'Worker perdido durante el entrenamiento',
+        finished_at = NOW()
+    WHERE status = 'running'
+      AND heartbeat_at < NOW() - make_interval(secs => %s)
+    RETURNING job_id;
+"""
+
+
+def enqueue_training_job(user_id: int, parameters: dict) -> int:
+    """Encola un entrenamiento. Lanza JobLimitError si el usuario está en su límite."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(USER_LOCK_QUERY, (USER_LOCK_NAMESPACE, user_id))
+        cursor.execute(
+            ENQUEUE_JOB_QUERY,
+            {
+                "user_id": user_id,
+                "parameters": Json(parameters),
+                "max_active": MAX_ACTIVE_JOBS_PER_USER,
+            },
+        )
+        row = cursor.fetchone()
+    if row is None:
+        raise JobLimitError(
+            f"Ya tienes {MAX_ACTIVE_JOBS_PER_USER} entrenamientos en cola o en curso."
+        )
+    return row[0]
+
+
+def claim_next_job(worker: str):
+    """Marca como 'running' el siguiente trabajo disponible y lo devuelve (o None)."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            CLAIM_CANDIDATE_QUERY, {"max_running": MAX_RUNNING_JOBS_PER_USER}
+        )
+        candidate = cursor.fetchone()
+        if candidate is None:
+            return None
+        job_id, user_id = candidate
+
+        # Otro worker puede estar tomando un trabajo del mismo usuario: se espera
+        # a que termine su transacción y se cuenta de nuevo
+        cursor.execute(USER_LOCK_QUERY, (USER_LOCK_NAMESPACE, user_id))
+        cursor.execute(
+            CLAIM_JOB_QUERY,
+            {
+                "worker": worker,
+                "job_id": job_id,
+                "user_id": user_id,
+                "max_running": MAX_RUNNING_JOBS_PER_USER,
+            },
+        )
+        return cursor.fetchone()
+
+
+def heartbeat(job_id: int) -> bool:
+    """Actualiza el latido del trabajo y devuelve si se ha pedido cancelarlo."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(HEARTBEAT_QUERY, (job_id,))
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def finish_job(job_id: int, status: str, model_id=None, error=None):
+    assert status in FINAL_STATUSES, f"Estado final no válido: {status}"
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(FINISH_JOB_QUERY, (status, model_id, error, job_id))
+
+
+def cancel_job(job_id: int, user_id: int):
+    """Cancela un trabajo del usuario. Devuelve el nuevo estado o None si ya terminó."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(CANCEL_JOB_QUERY, (job_id, user_id))
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def get_jobs_for_user(user_id: int, limit: int = 20) -> list:
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(USER_JOBS_QUERY, (user_id, limit))
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def fail_stale_jobs(timeout_seconds: float) -> list:
+    """Marca como fallidos los trabajos cuyo worker dejó de dar señales de vida."""
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(FAIL_STALE_JOBS_QUERY, (timeout_seconds,))
+        return [row[0] for row in cursor.fetchall()]
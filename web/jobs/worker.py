@@ -0,0 +1,202 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import date, datetime
+
+from web.commons.logging import logger
+from web.jobs.queue import claim_next_job, fail_stale_jobs, finish_job, heartbeat
+
+# Segundos entre consultas a la cola cuando no hay trabajo
+POLL_INTERVAL = float(os.getenv("TRAINING_POLL_INTERVAL", "5"))
+# Segundos entre latidos de un trabajo en curso
+HEARTBEAT_INTERVAL = float(os.getenv("TRAINING_HEARTBEAT_INTERVAL", "10"))
+# Un trabajo sin latido durante este tiempo se da por perdido
+STALE_AFTER = float(os.getenv("TRAINING_STALE_AFTER", "300"))
+# Bytes del mensaje de error que un entrenamiento devuelve al supervisor
+ERROR_BYTES = 1024
+
+
+def train_model(parameters: dict, result, error):
+    """
+    Entrena y registra un modelo. Se ejecuta en un proceso hijo para que el
+    supervisor pueda cancelarlo sin afectar al resto de trabajos. Si el registro
+    falla, el motivo se deja en `error` para guardarlo en el trabajo.
+    """
+    from quant_drl.configurations import get_complete_configuration
+    from quant_drl.trainer.trainer import Trainer
+
+    from web.pages.commons.database_connectors import (
+        insert_model,
+        save_favorite_model,
+    )
+
+    companies = [
+        (abv, name)
+        for abv, name in zip(parameters["companies_abv"], parameters["companies_names"])
+        if abv != "CASH"
+    ]
+    configuration = get_complete_configuration(
+        companies_pairs=companies,
+        key_value_pairs={
+            "algorithm": parameters["algorithm"],
+            "feature": parameters["feature_extractor"],
+            "normalize": parameters["normalization"],
+            "length_train_data": parameters["years_train"],
+            "length_eval_data": parameters["years_test"],
+            "end_date": date.fromisoformat(parameters["final_date"]),
+            "total_timesteps": parameters["total_timesteps"],
+            "checkpoint_freq": parameters["checkpoint_freq"],
+            "model_name": parameters["model_name"],
+            "user_id": parameters["user_id"],
+        },
+    )
+
+    trainer = Trainer(
+        configuration,
+        generate_default_name=False,
+        run=False,
+        logs_dir="../logs/",
+        save_dir="../models/",
+    )
+    trainer.run_experiment()
+
+    try:
+        model_id = insert_model(
+            name=parameters["model_name"],
+            algorithm=parameters["algorithm"],
+            feature_extractor=parameters["feature_extractor"],
+            companies_abv=[abv for abv, _ in companies] + ["CASH"],
+            file_path=trainer.save_path,
+            created_at=datetime.now(),
+            normalization=parameters["normalization"],
+        )
+    except Exception as e:
+        message = f"No se pudo registrar el modelo en la base de datos: {e}"
+        error.value = message.encode()[: ERROR_BYTES - 1]
+        raise
+
+    save_favorite_model(
+        user_id=parameters["user_id"],
+        model_id=model_id,
+        favorite_name=parameters["model_name"],
+    )
+    result.value = model_id
+
+
+class Worker:
+    """
+    Supervisor que toma trabajos de la cola y los entrena en procesos hijos.
+
+    Mantiene como mucho `concurrency` entrenamientos en paralelo, envía latidos
+    y termina el proceso hijo si el usuario cancela el trabajo.
+    """
+
+    def __init__(self, concurrency=1, name=None):
+        self.concurrency = concurrency
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        # spawn: torch no es seguro tras un fork
+        self._context = multiprocessing.get_context("spawn")
+        self._running = {}  # job_id -> (process, result, error, last_heartbeat)
+
+    def _start(self, job_id, parameters):
+        result = self._context.Value("i", 0)
+        error = self._context.Array("c", ERROR_BYTES)
+        process = self._context.Process(
+            target=train_model,
+            args=(parameters, result, error),
+            name=f"training-job-{job_id}",
+        )
+        process.start()
+        self._running[job_id] = (process, result, error, time.monotonic())
+        logger.info(f"[{self.name}] Trabajo {job_id} iniciado (pid {process.pid})")
+
+    def _check(self, job_id):
+        process, result, error, last_heartbeat = self._running[job_id]
+
+        if not process.is_alive():
+            process.join()
+            del self._running[job_id]
+            if process.exitcode == 0 and result.value:
+                finish_job(job_id, "completed", model_id=result.value)
+                logger.success(f"Trabajo {job_id} completado (modelo {result.value})")
+            else:
+                finish_job(
+                    job_id,
+                    "failed",
+                    error=error.value.decode(errors="replace")
+                    or f"El entrenamiento terminó con código {process.exitcode}",
+                )
+                logger.error(f"Trabajo {job_id} fallido (código {process.exitcode})")
+            return
+
+        if time.monotonic() - last_heartbeat < HEARTBEAT_INTERVAL:
+            return
+        self._running[job_id] = (process, result, error, time.monotonic())
+        if heartbeat(job_id):
+            process.terminate()
+            process.join()
+            del self._running[job_id]
+            finish_job(job_id, "cancelled")
+            logger.warning(f"Trabajo {job_id} cancelado por el usuario")
+
+    def run_forever(self):
+        logger.info(f"Worker {self.name} escuchando (concurrencia {self.concurrency})")
+        while True:
+            for job_id in list(self._running):
+                self._check(job_id)
+
+            stale = fail_stale_jobs(STALE_AFTER)
+            if stale:
+                logger.warning(f"Trabajos sin latido marcados como fallidos: {stale}")
+
+            claimed = False
+            while len(self._running) < self.concurrency:
+                job = claim_next_job(self.name)
+                if job is None:
+                    break
+                job_id, _, parameters = job
+                self._start(job_id, parameters)
+                claimed = True
+
+            if not claimed:
+                time.sleep(POLL_INTERVAL if not self._running else 1)
+
+    def shutdown(self):
+        """Detiene los entrenamientos en curso y los devuelve como fallidos."""
+        for job_id, (process, *_) in list(self._running.items()):
+            process.terminate()
+            process.join()
+            finish_job(job_id, "failed", error="Worker detenido")
+        self._running.clear()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run queued model training jobs")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("TRAINING_WORKER_CONCURRENCY", "1")),
+        help="Maximum number of trainings running at the same time",
+    )
+    parser.add_argument("--name", default=None, help="Worker name stored in the jobs")
+    return parser.parse_args()
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # `docker stop` envía SIGTERM: se trata como Ctrl+C para pasar por shutdown()
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    worker = Worker(concurrency=args.concurrency, name=args.name)
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        logger.info("Deteniendo worker...")
+    finally:
+        worker.shutdown()
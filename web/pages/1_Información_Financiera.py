@@ -3,15 +3,260 @@ import time
 
 import plotly.graph_objects as go
 import streamlit as st
-from quant_drl.data.stock_data import StockData
 
+from web.commons.charts import (
+    candlestick_trace,
+    clip_window,
+    line_trace,
+    plotly_chart_with_payload,
+    select_window,
+)
 from web.commons.session import check_login
 from web.commons.style_utils import add_logo
+from web.commons.timing import show_timings, timed
 from web.pages.commons.database_connectors import (
     fetch_companies,
     fetch_favorite_portfolios,
     save_favorite_portfolio,
 )
+from web.pages.commons.stock_cache import load_return_frames, load_stock_data
+
+## Funciones auxiliares
+
+
+def build_company_figure(
+    empresa, company_abv, multi_index_df, selected_features, window=slice(None)
+):
+    # Solo la ventana elegida, reducida a un número de puntos acotado (WebGL)
+    multi_index_df = clip_window(multi_index_df, window)
+    fig = go.Figure()
+
+    for feature in selected_features:
+        feature_data = multi_index_df.get((company_abv, feature))
+        if feature_data is not None:
+            fig.add_trace(line_trace(feature_data, name=f"{empresa} - {feature}"))
+
+    candle_data = multi_index_df.get(company_abv, ["Open", "High", "Low", "Close"])
+
+    fig.add_trace(
+        candlestick_trace(
+            candle_data,
+            name=f"{empresa} - Candlestick",
+            visible=False,  # Oculto por defecto
+        )
+    )
+
+    for feature in selected_features:
+        feature_data = multi_index_df.get((company_abv, feature))
+        if feature_data is not None:
+            fig.add_trace(
+                line_trace(
+                    feature_data,
+                    name=f"{empresa} - {feature} (Mountain)",
+                    fill="tozeroy",
+                    visible=False,  # Oculto por defecto
+                )
+            )
+
+    # Dropdown para cambiar vistas
+    fig.update_layout(
+        updatemenus=[
+            {
+                "buttons": [
+                    {
+                        "label": "Line",
+                        "method": "update",
+                        "args": [{"visible": [True, False, False]}],
+                    },
+                    {
+                        "label": "Candle",
+                        "method": "update",
+                        "args": [{"visible": [False, True, False]}],
+                    },
+                    {
+                        "label": "Mountain",
+                        "method": "update",
+                        "args": [{"visible": [False, False, True]}],
+                    },
+                ],
+                "direction": "down",
+                "showactive": True,
+            }
+        ],
+    )
+
+    fig.update_layout(
+        dragmode="zoom",  # Habilita zoom en ambas direcciones (X e Y)
+        xaxis=dict(
+            # El rangeslider no dibuja trazas WebGL: la ventana se elige con select_window
+            rangeslider=dict(visible=False),
+            fixedrange=False,  # Permite zoom en X
+        ),
+        yaxis=dict(fixedrange=False),  # Permite zoom en Y
+    )
+
+    fig.update_xaxes(
+        rangeslider_visible=False,
+        rangeselector=dict(
+            buttons=list(
+                [
+                    dict(count=1, label="1m", step="month", stepmode="backward"),
+                    dict(count=6, label="6m", step="month", stepmode="backward"),
+                    dict(count=1, label="YTD", step="year", stepmode="todate"),
+                    dict(count=1, label="1y", step="year", stepmode="backward"),
+                    dict(step="all"),
+                ]
+            )
+        ),
+    )
+
+    fig.add_annotation(
+        align="right",
+        text=f"<b>{empresa}</b>",
+        xref="paper",
+        yref="paper",
+        x=0.5,
+        y=1.3,
+        showarrow=False,
+        font=dict(size=20),
+    )
+
+    fig.update_xaxes(minor=dict(ticks="inside", showgrid=True))
+    return fig
+
+
+# Vistas de la gráfica unificada: (vista de stock_cache.RETURN_VIEWS, sufijo)
+UNIFIED_VIEWS = {
+    "Original": (None, ""),
+    "Gross": ("gross", " Gross Return"),
+    "Gross Winsorized": ("winsorized", " Gross Return (Winsorized)"),
+    "Gross Standardized": ("standard", " Gross Return (Standardized)"),
+}
+
+
+def build_unified_figure(
+    selected_companies_unified,
+    companies_dict,
+    multi_index_df,
+    return_frames,
+    selected_features,
+    window=slice(None),
+    suffix="",
+):
+    """
+    Gráfica de la vista elegida. `return_frames` son las rentabilidades de esa
+    vista por ticker, o None para los datos originales.
+    """
+    multi_index_df = clip_window(multi_index_df, window)
+    fig_unificado = go.Figure()
+    for empresa in selected_companies_unified:
+        company_abv = companies_dict[empresa]
+        if return_frames is None:
+            company_df = multi_index_df.get(company_abv)
+        else:
+            # return_frames ya viene agrupado por ticker: acceso directo por empresa
+            company_df = clip_window(return_frames[company_abv], window)
+
+        for feature in selected_features:
+            feature_data = company_df.get(feature) if company_df is not None else None
+            if feature_data is not None:
+                fig_unificado.add_trace(
+                    line_trace(feature_data, name=f"{empresa} - {feature}{suffix}")
+                )
+
+    fig_unificado.update_xaxes(
+        rangeslider_visible=False,
+        rangeselector=dict(
+            buttons=list(
+                [
+                    dict(count=1, label="1m", step="month", stepmode="backward"),
+                    dict(count=6, label="6m", step="month", stepmode="backward"),
+                    dict(count=1, label="YTD", step="year", stepmode="todate"),
+                    dict(count=1, label="1y", step="year", stepmode="backward"),
+                    dict(step="all"),
+                ]
+            )
+        ),
+    )
+
+    fig_unificado.update_layout(
+        dragmode="zoom",  # Habilita zoom en ambas direcciones (X e Y)
+        xaxis=dict(
+            # El rangeslider no dibuja trazas WebGL: la ventana se elige con select_window
+            rangeslider=dict(visible=False),
+            fixedrange=False,  # Permite zoom en X
+        ),
+        yaxis=dict(fixedrange=False),  # Permite zoom en Y
+    )
+    return fig_unificado
+
+
+@st.fragment
+def separate_view(
+    selected_companies_names, companies_dict, multi_index_df, selected_features
+):
+    """Una gráfica por empresa; se recalcula solo cuando cambia esta sección."""
+    window = select_window(multi_index_df.index, key="separate_view_window")
+    with timed("Vista separada"):
+        col1, col2 = st.columns(2)
+        for i, empresa in enumerate(selected_companies_names):
+            fig = build_company_figure(
+                empresa,
+                companies_dict[empresa],
+                multi_index_df,
+                selected_features,
+                window,
+            )
+            plotly_chart_with_payload(
+                fig,
+                container=col1 if i % 2 == 0 else col2,
+                label=empresa,
+                use_container_width=True,
+            )
+
+
+@st.fragment
+def unified_view(
+    selected_companies_names,
+    companies_dict,
+    multi_index_df,
+    data_key,
+    selected_features,
+):
+    """
+    Gráfica conjunta. Cambiar las empresas mostradas solo vuelve a ejecutar este
+    fragmento: los datos y la vista separada no se recalculan.
+
+    Solo se dibuja la vista elegida; las rentabilidades normalizadas se calculan
+    la primera vez que se elige su vista (memoizadas por datos y vista).
+    """
+    col1, col2 = st.columns([3, 1])
+    selected_companies_unified = col1.multiselect(
+        "Selecciona empresas para visualizar en el gráfico unificado:",
+        selected_companies_names,
+        default=selected_companies_names,
+    )
+    view_name = col2.selectbox("Vista", list(UNIFIED_VIEWS))
+    view, suffix = UNIFIED_VIEWS[view_name]
+    window = select_window(multi_index_df.index, key="unified_view_window")
+    with timed("Vista unificada"):
+        return_frames = load_return_frames(*data_key, view) if view else None
+        fig_unificado = build_unified_figure(
+            selected_companies_unified,
+            companies_dict,
+            multi_index_df,
+            return_frames,
+            selected_features,
+            window,
+            suffix,
+        )
+        plotly_chart_with_payload(
+            fig_unificado, label="unificada", use_container_width=True
+        )
+
+
+##
+
 
 # change_theme_toogle()
 add_logo(with_name=False, sidebar=True)
@@ -92,25 +337,19 @@ if st.sidebar.button("Actualizar Datos"):
 
 
 if selected_companies_names:
-    stockdata = StockData(
-        comp_abv=selected_companies_abv,
-        comp_names=selected_companies_names,
-        start_date=fecha_inicio,
-        end_date=fecha_final,
-        winsorize=True,
-        percentile=0.001,
+    # Precios e indicadores memoizados por (empresas, fechas); las rentabilidades
+    # normalizadas se piden solo desde la vista unificada que las muestra
+    data_key = (
+        tuple(selected_companies_abv),
+        tuple(selected_companies_names),
+        fecha_inicio,
+        fecha_final,
     )
+    with timed("Carga de datos"):
+        stockdata = load_stock_data(*data_key)
 
     multi_index_df = stockdata.multi_index_df
 
-    gross_return_df = stockdata.extract_return_data_as_df(return_type="gross")
-    gross_return_winsorized_df = stockdata.extract_return_data_as_df(
-        return_type="gross", normalized="winsorized"
-    )
-    gross_return_standardized_df = stockdata.extract_return_data_as_df(
-        return_type="gross", normalized="standard"
-    )
-
     if stockdata:
         with st.expander("Selección de Características", expanded=True):
             selected_features = st.multiselect(
@@ -135,255 +374,20 @@ if selected_companies_names:
     tab1, tab2 = st.tabs(["Vista Separada", "Vista Unificada"])
 
     with tab1:
-        col1, col2 = st.columns(2)
-
-        for i, empresa in enumerate(selected_companies_names):
-            company_abv = companies_dict[empresa]
-            fig = go.Figure()
-
-            for feature in selected_features:
-                feature_data = multi_index_df.get((company_abv, feature))
-                if feature_data is not None:
-                    fig.add_trace(
-                        go.Scatter(
-                            x=feature_data.index,
-                            y=feature_data.values,
-                            mode="lines",
-                            name=f"{empresa} - {feature}",
-                        )
-                    )
-
-            candle_data = multi_index_df.get(
-                company_abv, ["Open", "High", "Low", "Close"]
-            )
-
-            fig.add_trace(
-                go.Candlestick(
-                    x=candle_data.index,
-                    open=candle_data["Open"],
-                    high=candle_data["High"],
-                    low=candle_data["Low"],
-                    close=candle_data["Close"],
-                    name=f"{empresa} - Candlestick",
-                    visible=False,  # Oculto por defecto
-                )
-            )
-
-            for feature in selected_features:
-                feature_data = multi_index_df.get((company_abv, feature))
-                if feature_data is not None:
-                    fig.add_trace(
-                        go.Scatter(
-                            x=feature_data.index,
-                            y=feature_data.values,
-                            mode="lines",
-                            fill="tozeroy",
-                            name=f"{empresa} - {feature} (Mountain)",
-                            visible=False,  # Oculto por defecto
-                        )
-                    )
-
-            # Dropdown para cambiar vistas
-            fig.update_layout(
-                updatemenus=[
-                    {
-                        "buttons": [
-                            {
-                                "label": "Line",
-                                "method": "update",
-                                "args": [{"visible": [True, False, False]}],
-                            },
-                            {
-                                "label": "Candle",
-                                "method": "update",
-                                "args": [{"visible": [False, True, False]}],
-                            },
-                            {
-                                "label": "Mountain",
-                                "method": "update",
-                                "args": [{"visible": [False, False, True]}],
-                            },
-                        ],
-                        "direction": "down",
-                        "showactive": True,
-                    }
-                ],
-            )
-
-            fig.update_layout(
-                dragmode="zoom",  # Habilita zoom en ambas direcciones (X e Y)
-                xaxis=dict(
-                    rangeslider=dict(
-                        visible=True
-                    ),  # Mantiene el selector de rango en X
-                    fixedrange=False,  # Permite zoom en X
-                ),
-                yaxis=dict(
-                    fixedrange=False  # Permite zoom en Y
-                ),
-            )
-
-            fig.update_xaxes(
-                rangeslider_visible=True,
-                rangeselector=dict(
-                    buttons=list(
-                        [
-                            dict(
-                                count=1, label="1m", step="month", stepmode="backward"
-                            ),
-                            dict(
-                                count=6, label="6m", step="month", stepmode="backward"
-                            ),
-                            dict(count=1, label="YTD", step="year", stepmode="todate"),
-                            dict(count=1, label="1y", step="year", stepmode="backward"),
-                            dict(step="all"),
-                        ]
-                    )
-                ),
-            )
-
-            fig.add_annotation(
-                align="right",
-                text=f"<b>{empresa}</b>",
-                xref="paper",
-                yref="paper",
-                x=0.5,
-                y=1.3,
-                showarrow=False,
-                font=dict(size=20),
-            )
-
-            fig.update_xaxes(minor=dict(ticks="inside", showgrid=True))
-
-            (col1 if i % 2 == 0 else col2).plotly_chart(fig, use_container_width=True)
+        separate_view(
+            selected_companies_names, companies_dict, multi_index_df, selected_features
+        )
 
     with tab2:
-        selected_companies_unified = st.multiselect(
-            "Selecciona empresas para visualizar en el gráfico unificado:",
+        unified_view(
             selected_companies_names,
-            default=selected_companies_names,
+            companies_dict,
+            multi_index_df,
+            data_key,
+            selected_features,
         )
 
-        fig_unificado = go.Figure()
-        for empresa in selected_companies_unified:
-            company_abv = companies_dict[empresa]
-
-            for feature in selected_features:
-                feature_data = multi_index_df.get((company_abv, feature))
-                if feature_data is not None:
-                    fig_unificado.add_trace(
-                        go.Scatter(
-                            x=feature_data.index,
-                            y=feature_data.values,
-                            mode="lines",
-                            name=f"{empresa} - {feature}",
-                        )
-                    )
-
-                f_gross_data = gross_return_df.query(f"Stock == '{company_abv}'")[
-                    feature
-                ]
-
-                if f_gross_data is not None:
-                    fig_unificado.add_trace(
-                        go.Scatter(
-                            x=f_gross_data.index,
-                            y=f_gross_data.values,
-                            mode="lines",
-                            name=f"{empresa} - {feature} Gross Return",
-                            visible=False,
-                        )
-                    )
-
-                f_gross_win_data = gross_return_winsorized_df.query(
-                    f"Stock == '{company_abv}'"
-                )[feature]
-
-                if f_gross_win_data is not None:
-                    fig_unificado.add_trace(
-                        go.Scatter(
-                            x=f_gross_win_data.index,
-                            y=f_gross_win_data.values,
-                            mode="lines",
-                            name=f"{empresa} - {feature} Gross Return (Winsorized)",
-                            visible=False,
-                        )
-                    )
-
-                f_gross_std_data = gross_return_standardized_df.query(
-                    f"Stock == '{company_abv}'"
-                )[feature]
-
-                if f_gross_std_data is not None:
-                    fig_unificado.add_trace(
-                        go.Scatter(
-                            x=f_gross_std_data.index,
-                            y=f_gross_std_data.values,
-                            mode="lines",
-                            name=f"{empresa} - {feature} Gross Return (Standardized)",
-                            visible=False,
-                        )
-                    )
-
-        fig_unificado.update_layout(
-            updatemenus=[
-                {
-                    "buttons": [
-                        {
-                            "label": "Original",
-                            "method": "update",
-                            "args": [{"visible": [True, False, False, False]}],
-                        },
-                        {
-                            "label": "Gross",
-                            "method": "update",
-                            "args": [{"visible": [False, True, False, False]}],
-                        },
-                        {
-                            "label": "Gross Winsorized",
-                            "method": "update",
-                            "args": [{"visible": [False, False, True, False]}],
-                        },
-                        {
-                            "label": "Gross Standardized",
-                            "method": "update",
-                            "args": [{"visible": [False, False, False, True]}],
-                        },
-                    ],
-                    "direction": "down",
-                    "showactive": True,
-                }
-            ],
-        )
-
-        fig_unificado.update_xaxes(
-            rangeslider_visible=True,
-            rangeselector=dict(
-                buttons=list(
-                    [
-                        dict(count=1, label="1m", step="month", stepmode="backward"),
-                        dict(count=6, label="6m", step="month", stepmode="backward"),
-                        dict(count=1, label="YTD", step="year", stepmode="todate"),
-                        dict(count=1, label="1y", step="year", stepmode="backward"),
-                        dict(step="all"),
-                    ]
-                )
-            ),
-        )
-
-        fig_unificado.update_layout(
-            dragmode="zoom",  # Habilita zoom en ambas direcciones (X e Y)
-            xaxis=dict(
-                rangeslider=dict(visible=True),  # Mantiene el selector de rango en X
-                fixedrange=False,  # Permite zoom en X
-            ),
-            yaxis=dict(
-                fixedrange=False  # Permite zoom en Y
-            ),
-        )
-
-        st.plotly_chart(fig_unificado, use_container_width=True)
-
+    show_timings()
 
 else:
     st.warning("Por favor, selecciona al menos una empresa.")
@@ -13,24 +13,44 @@ import plotly.graph_objects as go
 import streamlit as st
 from matplotlib import pyplot as plt
 from quant_drl.configurations import get_companies, get_complete_configuration
-from quant_drl.tester.tester import Tester
 
 from web.commons.session import check_login
 from web.commons.style_utils import add_logo
+from web.commons.timing import show_timings, timed
+from web.data.stock_data import StoredTester
+from web.data.trading_calendar import portfolio_session_range
+from web.data.trajectory_store import data_version, get_trajectory_store, run_id
+from web.db.commons.async_db import gather_queries
+from web.pages.commons.async_connectors import (
+    fetch_favorite_portfolios_async,
+    get_companies_from_model_async,
+    get_favorite_models_async,
+    get_model_information_async,
+    get_models_async,
+)
 from web.pages.commons.database_connectors import (
-    fetch_favorite_portfolios,
-    get_companies_from_model,
-    get_favorite_models,
-    get_model_information,
-    get_models,
     get_models_by_companies,
     save_favorite_model,
 )
+from web.pages.commons.evaluation_engine import (
+    EARLY_STOP_MIN_EPISODES,
+    MAX_SEED,
+    ci_converged,
+    confidence_halfwidth,
+    iter_episodes,
+    iter_steps,
+    merge_episodes,
+    summarize_episode,
+)
+from web.pages.commons.model_cache import load_model_cached, model_cache
 
 # change_theme_toogle()
 add_logo(with_name=False, sidebar=True)
 check_login()
 
+# Intervalo mínimo entre refrescos de los resultados parciales
+LIVE_REFRESH_SECONDS = 0.5
+
 
 ## Funciones auxiliares
 
@@ -43,16 +63,6 @@ def color_name_to_rgba(color_name, alpha=0.2):
     )
 
 
-def count_financial_days(start_date, end_date) -> int:
-    import yfinance
-
-    data = yfinance.download("AAPL", start=start_date, end=end_date)
-
-    if data.empty:
-        return 0, None, None
-    return len(data), data.index.min().date(), data.index.max().date()
-
-
 def plot_box_plot(data, title, y_label, color):
     fig = go.Figure()
     fig.add_trace(
@@ -155,239 +165,120 @@ def map_model_steps_size(
         raise ValueError("Tamaño de modelo no válido. Usa: 'Small', 'Medium', 'Large'.")
 
 
-##
-
-
-# st.set_page_config(page_title="Evaluación de Modelos", layout="wide")
-
-# Cargar modelos en Streamlit
-st.title("🧠 Evaluación de Modelos")
-
-continue_flag = False
-selected_model = None
-modelos_dict = None
-selected_model_id = None
-selected_companies_abv = []
-selected_companies_names = []
-selection_mode_models = "Global"
-# --- Selection Mode ---
-selection_mode = st.sidebar.radio(
-    "Seleccione un módo de búsqueda", ["Por Portfolio", "Por Nombre"], horizontal=True
-)
-if selection_mode == "Por Portfolio":
-    # Lista de empresas (ejemplo con tickers de Yahoo Finance)
-    companies_abv, companies_names = get_companies()
-    # Diccionario de empresas
-    companies_dict = dict(zip(companies_names, companies_abv))
-
-    selected_companies_abv = []
-    selected_companies_names = []
-
-    # --- Favorite Portfolio Selection ---
-    favorite_portfolios = fetch_favorite_portfolios(st.session_state.get("user_id", 1))
-
-    if not favorite_portfolios:
-        st.warning(
-            "No se encontraron portafolios favoritos. Visita la sección de 'Gestión de Carteras' para crear uno."
-        )
-        st.stop()
-
-    favorite_selected = st.sidebar.selectbox(
-        "Seleccione un Portafolio", list(favorite_portfolios.keys())
-    )
-    if favorite_selected:
-        selected_companies_abv = favorite_portfolios[favorite_selected]
-        selected_companies_names = [
-            name
-            for name, abv in companies_dict.items()
-            if abv in selected_companies_abv
-        ]
-
-        modelos_dict = get_models_by_companies(selected_companies_abv)
-
-    if not modelos_dict:
-        st.warning("No se encontraron modelos con las empresas seleccionadas.")
-        st.stop()
-    else:
-        selected_model = st.sidebar.selectbox(
-            "Seleccione un modelo", modelos_dict.keys()
-        )
-        selected_model_id = modelos_dict[selected_model]
-
-
-else:  # Por Modelos
-    # --- Selection Mode ---
-    selection_mode_models = st.sidebar.radio(
-        "Seleccione un tipo de búsqueda de modelos",
-        ["Favoritos", "Todos"],
-        horizontal=True,
+def model_checkpoint(model_information, model_size):
+    """Ruta del modelo y checkpoint (steps) que corresponde a `model_size`."""
+    model_path = model_information[0]
+    full_path, _ = model_path.rsplit("/", 1)
+    return model_path, map_model_steps_size(
+        model_base_path=full_path, model_size=model_size
     )
 
-    if selection_mode_models == "Todos":
-        modelos_dict = get_models()
 
-        selected_model = st.sidebar.selectbox(
-            "Seleccione un modelo", modelos_dict.keys()
+def load_stored_results(run):
+    """Resultados de la sesión si son de `run`; si no, los del almacén de trayectorias."""
+    results = st.session_state.get("evaluation_results")
+    if results and results["key"] == run:
+        return results
+    stored = get_trajectory_store().load(run)
+    if stored is None:
+        return None
+    info_eval, meta = stored
+    results = {"key": run, "info_eval": info_eval, **meta}
+    st.session_state["evaluation_results"] = results
+    return results
+
+
+def show_results(results):
+    """Resultados individuales o en lote según el modo con que se evaluaron."""
+    if results.get("created_at"):
+        st.caption(f"Resultados guardados el {results['created_at']}.")
+    if st.button("🔗 Obtener enlace para compartir"):
+        st.query_params["run"] = results["key"]
+        st.rerun()
+    if results["params"]["mode"] == "individual":
+        show_individual_results(
+            results["extra"]["dates"],
+            results["info_eval"],
+            results["extra"]["companies"],
         )
     else:
-        modelos_list = get_favorite_models(st.session_state.get("user_id", 1))
-
-        if modelos_list:
-            favorites_names = list(map(lambda x: x[0], modelos_list))
-
-            selected_model = st.sidebar.selectbox(
-                "Seleccione un modelo",
-                favorites_names,
-            )
-
-            selected_model = list(
-                filter(lambda x: x[0] == selected_model, modelos_list)
-            )[0][1]
-
-            modelos_dict = dict(
-                zip(
-                    list(map(lambda x: x[1], modelos_list)),
-                    list(map(lambda x: x[2], modelos_list)),
-                ),
-            )
-        else:
-            st.warning("No se encontraron modelos favoritos")
+        show_batch_results(results["info_eval"])
 
-if not selected_model:
-    st.warning("Seleccione un modelo para continuar.")
-    st.stop()
-
-selected_model_id = modelos_dict[selected_model]
-
-associated_companies = get_companies_from_model(selected_model_id)
-
-if not associated_companies:
-    st.warning("No se encontraron empresas asociadas al modelo seleccionado.")
-    st.stop()
-
-selected_companies_abv = list(associated_companies.values())
-selected_companies_names = list(associated_companies.keys())
-selected_companies_abv.remove("CASH")
-selected_companies_names.remove("Cash")
-continue_flag = True
 
-if selection_mode_models == "Todos":
-    # Guardar modelo favorito
-    favorite_name = st.sidebar.text_input(
-        "Asignar nombre al modelo",
-        placeholder="Alias para el modelo.",
+def show_live_steps(placeholder, steps, render):
+    """Valor del portfolio y reward acumulado de los pasos simulados hasta ahora."""
+    x = list(range(len(steps)))
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=x, y=[step["pv"] for step in steps], mode="lines", name="Portfolio Value"
+        )
     )
-    if st.sidebar.button("⭐ Guardar como Favorito") and favorite_name:
-        save_favorite_model(
-            st.session_state.get("user_id", 1),
-            selected_model_id,
-            favorite_name,
+    fig.add_trace(
+        go.Scatter(
+            x=x,
+            y=[step["episode_reward"] for step in steps],
+            mode="lines",
+            name="Acumulated Rewards",
+            yaxis="y2",
         )
-
-model_size = st.sidebar.select_slider(
-    "Modelos", ["Small", "Medium", "Large"], value="Medium"
-)
-# Mostrar al usuario las empresas asociadas al modelo
-
-with st.expander("Ver Empresas Asociadas", expanded=False, icon="ℹ️"):
-    st.subheader("Empresas Asociadas al Modelo")
-    df_companies = pd.DataFrame(
-        list(associated_companies.items()), columns=["Empresa", "Ticker"]
     )
-    st.dataframe(df_companies, use_container_width=True, hide_index=True)
-
-# Botón para actualizar
-if st.sidebar.button("Actualizar Datos"):
-    st.rerun()
-    time.sleep(0.5)
-
-if not continue_flag:
-    st.stop()
-
-companies_pairs = list(zip(selected_companies_abv, selected_companies_names))
-
-configuration = get_complete_configuration(companies_pairs=companies_pairs)
-time.sleep(1)
-
-# # Selección de fechas para evaluación
-evaluation_type = st.radio(
-    "Tipo de Evaluación", ["En Lote", "Individual"], horizontal=True
-)
-st.subheader("Seleccione métricas para la evaluación")
-min_date = pd.to_datetime("2010-01-01")
-max_date = pd.Timestamp.today().date()
-
-
-if evaluation_type == "Individual":
-    start_date, end_date = st.date_input(
-        label="Rango de fechas",
-        value=(pd.to_datetime("2024-03-01"), pd.to_datetime("2024-05-31")),
-        min_value=min_date,
-        max_value=max_date,
+    fig.update_layout(
+        title=f"Simulación en curso: paso {len(steps)}",
+        template="plotly_white",
+        yaxis2=dict(overlaying="y", side="right"),
     )
-    number_of_days, start_eval, end_eval = count_financial_days(start_date, end_date)
-    if number_of_days == 0:
-        st.error("No hay datos para el rango de fechas seleccionado.")
-        st.stop()
-
-    st.markdown(f"Rango de fechas con mercado abierto: {start_date} - {end_date}")
-
-    configuration["steps"] = number_of_days
-    configuration["length_train_data"] = 1
-
-    if st.button("Cargar y Evaluar Modelo"):
-        try:
-            (model_path, normalization, algorithm, feature_extractor, num_assets) = (
-                get_model_information(selected_model_id)
-            )
-            full_path, _ = model_path.rsplit("/", 1)
-            base_path, model_name = full_path.rsplit("/", 1)
-
-            configuration["normalize"] = normalization
-
-            tester = Tester(configuration, setup=False)
-            tester.reset_data_env(
-                start_eval_date=start_eval,
-                end_eval_date=end_eval,
-                random_initialization=False,
-            )
-            steps_selected = map_model_steps_size(
-                model_base_path=full_path, model_size=model_size
-            )
-            with st.spinner("Cargando el modelo... Esto puede tardar unos segundos."):
-                tester.load_model(
-                    base_path,
-                    model_name,
-                    algorithm=algorithm,
-                    steps=steps_selected,
-                    feature_extractor=feature_extractor,
-                    num_assets=num_assets,
-                )
-                st.success(
-                    f"Modelo cargado correctamente. {model_name} con {steps_selected} steps."
-                )
-        except Exception as e:
-            st.error(f"Error al cargar el modelo: {e}")
-
-        st.subheader("Evaluación en Progreso")
-
-        # Mostrar animación mientras se evalúa el modelo
-        with st.spinner("Evaluando el modelo... Esto puede tardar unos segundos."):
-            info_eval = tester.evaluate(num_episodes=1)
-
-        internal_env = tester.port_eval_env.envs[0].env
-        filtered_dates = list(
-            filter(
-                lambda x: x >= start_eval and x <= end_eval,
-                map(lambda x: x.date(), internal_env.dates),
-            )
+    placeholder.plotly_chart(fig, key=f"live_steps_{render}")
+
+
+def show_live_batch(placeholder, episodes, total, render):
+    """Tabla, intervalo de confianza y boxplots de los episodios ya terminados."""
+    final_pvs = [e["final_pv"] for e in episodes]
+    final_rewards = [e["final_reward"] for e in episodes]
+    with placeholder.container():
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Simulaciones", f"{len(episodes)}/{total}")
+        col2.metric(
+            "Valor Portfolio Final (media)",
+            f"{np.mean(final_pvs):,.2f}",
+            f"± {confidence_halfwidth(final_pvs):,.2f} (IC 95 %)",
+            delta_color="off",
         )
+        col3.metric("Recompensa Final (media)", f"{np.mean(final_rewards):,.4f}")
 
-        dates_str = [d.strftime("%Y-%m-%d") for d in filtered_dates]
+        col1, col2 = st.columns(2)
+        col1.plotly_chart(
+            plot_box_plot(final_rewards, "Recompensa final", "Recompensa", "blue"),
+            key=f"live_rewards_{render}",
+        )
+        col2.plotly_chart(
+            plot_box_plot(
+                final_pvs,
+                "Valor del portfolio final",
+                "Valor del portfolio (USD)",
+                "green",
+            ),
+            key=f"live_pvs_{render}",
+        )
+        st.dataframe(
+            pd.DataFrame(
+                {
+                    "Simulación": [f"Sim {i + 1}" for i in range(len(episodes))],
+                    "Recompensa Final": final_rewards,
+                    "Valor Portfolio Final": final_pvs,
+                    "Final MDD": [e["final_drawdown"] for e in episodes],
+                    "Media Sharpe Ratio": [e["mean_sharpe"] for e in episodes],
+                }
+            ),
+            hide_index=True,
+            use_container_width=True,
+        )
 
-        # Ocultar animación y mostrar mensaje de éxito
-        st.success("Evaluación completada.")
 
+@st.fragment
+def show_individual_results(dates_str, info_eval, selected_companies_names):
+    """Gráficas de una evaluación individual ya calculada."""
+    with timed("Resultados individuales"):
         # Extraer métricas de la evaluación
         rewards = np.array(info_eval["all_rewards"][0])
         rewards = rewards.reshape(-1)
@@ -402,7 +293,6 @@ if evaluation_type == "Individual":
         # Gráficos de evolución
         st.markdown("### Evolución de las Métricas Durante la Simulación")
         col1, col2 = st.columns(2)
-        steps = list(range(len(rewards)))
 
         fig_rewards = go.Figure()
         fig_rewards.add_trace(
@@ -448,7 +338,7 @@ if evaluation_type == "Individual":
         col2.plotly_chart(fig_sharpes)
 
         st.markdown("### Evolución de los pesos del portfolio")
-        actions_reshaped = actions.reshape(-1, len(selected_companies_abv) + 1)
+        actions_reshaped = actions.reshape(-1, len(selected_companies_names) + 1)
 
         with plt.style.context(matplotx.styles.dracula):
             fig, ax = plt.subplots(figsize=(12, 6))
@@ -466,7 +356,7 @@ if evaluation_type == "Individual":
             ax.set_xlabel("Steps", fontsize=12, color="white")
             ax.tick_params(axis="x", rotation=90)
             ax.set_ylabel("Cantidad Asignada", fontsize=12, color="white")
-            legend = ax.legend(
+            ax.legend(
                 loc="upper right",
                 bbox_to_anchor=(
                     1.3,
@@ -480,85 +370,34 @@ if evaluation_type == "Individual":
 
             st.pyplot(fig)
 
-else:
-    col1, col2 = st.columns(2)
-    start_eval, end_eval = col1.date_input(
-        label="Rango de fechas",
-        value=(pd.to_datetime("2023-01-01"), pd.to_datetime("2024-12-31")),
-        min_value=min_date,
-        max_value=max_date,
-    )
 
-    num_episodes = col2.number_input("Número de Simulaciones", 1, 100, 50, format="%d")
+@st.fragment
+def show_batch_results(info_eval):
+    """Descargas y gráficas de una evaluación en lote ya calculada."""
+    with timed("Resultados en lote"):
+        # Extraer métricas
+        final_rewards = info_eval["final_rewards"]
+        final_pvs = info_eval["final_pvs"]
+        all_episode_rewards = info_eval["all_episode_rewards"]
+        all_pvs = info_eval["all_pvs"]
+        all_sharpes = info_eval["all_sharpes"]
 
-    if (end_eval - start_eval).days < 150:
-        st.warning(
-            "El rango de fechas para la evaluación en lote debe ser de al menos de 6 meses."
+        df_resultados = pd.DataFrame(
+            {
+                "Simulación": [f"Sim {i + 1}" for i in range(len(final_rewards))],
+                "Recompensa Final": info_eval["final_rewards"],
+                "Valor Portfolio Final": info_eval["final_pvs"],
+                "Final MDD": info_eval["final_drawdowns"],
+                "Media Sharpe Ratio": info_eval["mean_sharpes"],
+                "Media Reward": info_eval["mean_rewards"],
+                "Media Portfolio Value": info_eval["mean_pvs"],
+                "Std Sharpe Ratio": info_eval["std_sharpes"],
+                "Std Reward": info_eval["std_rewards"],
+                "Std Portfolio Value": info_eval["std_pvs"],
+            }
         )
-        st.stop()
 
-    if st.button("Cargar y Evaluar Modelo"):
-        try:
-            model_path, normalization, algorithm, feature_extractor, num_assets = (
-                get_model_information(selected_model_id)
-            )
-            full_path, _ = model_path.rsplit("/", 1)
-            base_path, model_name = full_path.rsplit("/", 1)
-
-            configuration["normalize"] = normalization
-
-            tester = Tester(configuration, setup=False)
-            tester.reset_data_env(
-                start_eval_date=start_eval,
-                end_eval_date=end_eval,
-                random_initialization=True,
-            )
-
-            steps_selected = map_model_steps_size(
-                model_base_path=full_path, model_size=model_size
-            )
-            with st.spinner("Cargando el modelo... Esto puede tardar unos segundos."):
-                tester.load_model(
-                    base_path,
-                    model_name,
-                    algorithm=algorithm,
-                    steps=steps_selected,
-                    feature_extractor=feature_extractor,
-                    num_assets=num_assets,
-                )
-                st.success(
-                    f"Modelo cargado correctamente. {model_name} con {steps_selected} steps."
-                )
-        except Exception as e:
-            st.error(f"Error al cargar el modelo: {e}")
-
-        with st.spinner("Evaluando el modelo... Esto puede tardar unos segundos."):
-            info_eval = tester.evaluate(num_episodes=num_episodes)
-            st.success("Evaluación completada.")
-
-        # Extraer métricas
-        final_rewards = info_eval["final_rewards"]
-        final_pvs = info_eval["final_pvs"]
-        all_episode_rewards = info_eval["all_episode_rewards"]
-        all_pvs = info_eval["all_pvs"]
-        all_sharpes = info_eval["all_sharpes"]
-
-        df_resultados = pd.DataFrame(
-            {
-                "Simulación": [f"Sim {i + 1}" for i in range(len(final_rewards))],
-                "Recompensa Final": info_eval["final_rewards"],
-                "Valor Portfolio Final": info_eval["final_pvs"],
-                "Final MDD": info_eval["final_drawdowns"],
-                "Media Sharpe Ratio": info_eval["mean_sharpes"],
-                "Media Reward": info_eval["mean_rewards"],
-                "Media Portfolio Value": info_eval["mean_pvs"],
-                "Std Sharpe Ratio": info_eval["std_sharpes"],
-                "Std Reward": info_eval["std_rewards"],
-                "Std Portfolio Value": info_eval["std_pvs"],
-            }
-        )
-
-        df_stats = df_resultados.describe().T
+        df_stats = df_resultados.describe().T
 
         df_stats["Feature"] = [
             "Recompensa Final",
@@ -685,3 +524,498 @@ else:
             st.plotly_chart(fig_sim_pvs)
 
         st.success("Análisis completado con éxito.")
+
+
+##
+
+
+# st.set_page_config(page_title="Evaluación de Modelos", layout="wide")
+
+# Cargar modelos en Streamlit
+st.title("🧠 Evaluación de Modelos")
+
+# Enlace compartido (?run=<id>): se muestra la evaluación guardada sin recalcular
+shared_run = st.query_params.get("run")
+if shared_run:
+    shared_results = load_stored_results(shared_run)
+    if shared_results is None:
+        st.warning("El resultado compartido no existe o ya no está disponible.")
+        del st.query_params["run"]
+    else:
+        params = shared_results["params"]
+        st.info(
+            f"Resultado compartido: modelo {params['model_id']} "
+            f"({params['steps'] or 'final'} steps), {params['start']} - {params['end']}, "
+            f"{len(shared_results['info_eval']['final_rewards'])} simulaciones. "
+            "Copia la URL del navegador para compartirlo."
+        )
+        if st.button("Nueva evaluación"):
+            del st.query_params["run"]
+            st.rerun()
+        show_results(shared_results)
+        show_timings()
+        st.stop()
+
+continue_flag = False
+selected_model = None
+modelos_dict = None
+selected_model_id = None
+selected_companies_abv = []
+selected_companies_names = []
+selection_mode_models = "Global"
+# --- Selection Mode ---
+selection_mode = st.sidebar.radio(
+    "Seleccione un módo de búsqueda", ["Por Portfolio", "Por Nombre"], horizontal=True
+)
+
+# Consultas de catálogo independientes entre sí: se lanzan a la vez
+user_id = st.session_state.get("user_id", 1)
+catalog = gather_queries(
+    favorite_portfolios=fetch_favorite_portfolios_async(user_id),
+    models=get_models_async(),
+    favorite_models=get_favorite_models_async(user_id),
+)
+if selection_mode == "Por Portfolio":
+    # Lista de empresas (ejemplo con tickers de Yahoo Finance)
+    companies_abv, companies_names = get_companies()
+    # Diccionario de empresas
+    companies_dict = dict(zip(companies_names, companies_abv))
+
+    selected_companies_abv = []
+    selected_companies_names = []
+
+    # --- Favorite Portfolio Selection ---
+    favorite_portfolios = catalog["favorite_portfolios"]
+
+    if not favorite_portfolios:
+        st.warning(
+            "No se encontraron portafolios favoritos. Visita la sección de 'Gestión de Carteras' para crear uno."
+        )
+        st.stop()
+
+    favorite_selected = st.sidebar.selectbox(
+        "Seleccione un Portafolio", list(favorite_portfolios.keys())
+    )
+    if favorite_selected:
+        selected_companies_abv = favorite_portfolios[favorite_selected]
+        selected_companies_names = [
+            name
+            for name, abv in companies_dict.items()
+            if abv in selected_companies_abv
+        ]
+
+        modelos_dict = get_models_by_companies(selected_companies_abv)
+
+    if not modelos_dict:
+        st.warning("No se encontraron modelos con las empresas seleccionadas.")
+        st.stop()
+    else:
+        selected_model = st.sidebar.selectbox(
+            "Seleccione un modelo", modelos_dict.keys()
+        )
+        selected_model_id = modelos_dict[selected_model]
+
+
+else:  # Por Modelos
+    # --- Selection Mode ---
+    selection_mode_models = st.sidebar.radio(
+        "Seleccione un tipo de búsqueda de modelos",
+        ["Favoritos", "Todos"],
+        horizontal=True,
+    )
+
+    if selection_mode_models == "Todos":
+        modelos_dict = catalog["models"]
+
+        selected_model = st.sidebar.selectbox(
+            "Seleccione un modelo", modelos_dict.keys()
+        )
+    else:
+        modelos_list = catalog["favorite_models"]
+
+        if modelos_list:
+            favorites_names = list(map(lambda x: x[0], modelos_list))
+
+            selected_model = st.sidebar.selectbox(
+                "Seleccione un modelo",
+                favorites_names,
+            )
+
+            selected_model = list(
+                filter(lambda x: x[0] == selected_model, modelos_list)
+            )[0][1]
+
+            modelos_dict = dict(
+                zip(
+                    list(map(lambda x: x[1], modelos_list)),
+                    list(map(lambda x: x[2], modelos_list)),
+                ),
+            )
+        else:
+            st.warning("No se encontraron modelos favoritos")
+
+if not selected_model:
+    st.warning("Seleccione un modelo para continuar.")
+    st.stop()
+
+selected_model_id = modelos_dict[selected_model]
+
+# Compañías e información del modelo seleccionado, también en paralelo
+model_data = gather_queries(
+    companies=get_companies_from_model_async(selected_model_id),
+    information=get_model_information_async(selected_model_id),
+)
+associated_companies = model_data["companies"]
+model_information = model_data["information"]
+
+if not associated_companies:
+    st.warning("No se encontraron empresas asociadas al modelo seleccionado.")
+    st.stop()
+
+selected_companies_abv = list(associated_companies.values())
+selected_companies_names = list(associated_companies.keys())
+selected_companies_abv.remove("CASH")
+selected_companies_names.remove("Cash")
+continue_flag = True
+
+if selection_mode_models == "Todos":
+    # Guardar modelo favorito
+    favorite_name = st.sidebar.text_input(
+        "Asignar nombre al modelo",
+        placeholder="Alias para el modelo.",
+    )
+    if st.sidebar.button("⭐ Guardar como Favorito") and favorite_name:
+        save_favorite_model(
+            st.session_state.get("user_id", 1),
+            selected_model_id,
+            favorite_name,
+        )
+
+model_size = st.sidebar.select_slider(
+    "Modelos", ["Small", "Medium", "Large"], value="Medium"
+)
+# Mostrar al usuario las empresas asociadas al modelo
+
+with st.expander("Ver Empresas Asociadas", expanded=False, icon="ℹ️"):
+    st.subheader("Empresas Asociadas al Modelo")
+    df_companies = pd.DataFrame(
+        list(associated_companies.items()), columns=["Empresa", "Ticker"]
+    )
+    st.dataframe(df_companies, use_container_width=True, hide_index=True)
+
+with st.sidebar.expander("Caché de modelos", expanded=False):
+    cache_stats = model_cache.stats()
+    col1, col2 = st.columns(2)
+    col1.metric("Aciertos", cache_stats["hits"])
+    col2.metric("Fallos", cache_stats["misses"])
+    st.metric("Modelos en memoria", cache_stats["entries"])
+    st.progress(
+        min(cache_stats["bytes"] / cache_stats["max_bytes"], 1.0),
+        text=f"{cache_stats['bytes'] / 1024**2:.1f} MB "
+        f"de {cache_stats['max_bytes'] / 1024**2:.0f} MB",
+    )
+
+# Botón para actualizar
+if st.sidebar.button("Actualizar Datos"):
+    st.rerun()
+    time.sleep(0.5)
+
+if not continue_flag:
+    st.stop()
+
+companies_pairs = list(zip(selected_companies_abv, selected_companies_names))
+
+configuration = get_complete_configuration(companies_pairs=companies_pairs)
+
+# # Selección de fechas para evaluación
+evaluation_type = st.radio(
+    "Tipo de Evaluación", ["En Lote", "Individual"], horizontal=True
+)
+st.subheader("Seleccione métricas para la evaluación")
+min_date = pd.to_datetime("2010-01-01")
+max_date = pd.Timestamp.today().date()
+
+
+if evaluation_type == "Individual":
+    start_date, end_date = st.date_input(
+        label="Rango de fechas",
+        value=(pd.to_datetime("2024-03-01"), pd.to_datetime("2024-05-31")),
+        min_value=min_date,
+        max_value=max_date,
+    )
+    number_of_days, start_eval, end_eval = portfolio_session_range(
+        selected_companies_abv, start_date, end_date
+    )
+    if number_of_days == 0:
+        st.error("No hay datos para el rango de fechas seleccionado.")
+        st.stop()
+
+    st.markdown(f"Rango de fechas con mercado abierto: {start_eval} - {end_eval}")
+
+    configuration["steps"] = number_of_days
+    configuration["length_train_data"] = 1
+
+    try:
+        model_path, steps_selected = model_checkpoint(model_information, model_size)
+    except Exception as e:
+        st.error(f"Error al cargar el modelo: {e}")
+        st.stop()
+
+    # La evaluación queda determinada por estos parámetros: se guarda con ellos
+    run_params = {
+        "mode": "individual",
+        "model_id": selected_model_id,
+        "model_path": model_path,
+        "steps": steps_selected,
+        "start": start_eval,
+        "end": end_eval,
+        "num_episodes": 1,
+        "seed": None,
+        "data_version": data_version(selected_companies_abv, end_eval),
+    }
+    results_key = run_id(run_params)
+    # Los resultados se guardan en la sesión y en el almacén de trayectorias:
+    # interactuar con ellos solo vuelve a ejecutar su fragmento, y reabrir la
+    # misma evaluación (en esta u otra sesión) no vuelve a simularla
+    results = load_stored_results(results_key)
+    evaluate = st.button("Cargar y Evaluar Modelo")
+    if evaluate and results:
+        st.success("Evaluación recuperada de las guardadas, sin volver a simular.")
+    elif evaluate:
+        try:
+            model_path, normalization, algorithm, feature_extractor, num_assets = (
+                model_information
+            )
+            full_path, _ = model_path.rsplit("/", 1)
+            base_path, model_name = full_path.rsplit("/", 1)
+
+            configuration["normalize"] = normalization
+
+            tester = StoredTester(configuration, setup=False)
+            tester.reset_data_env(
+                start_eval_date=start_eval,
+                end_eval_date=end_eval,
+                random_initialization=False,
+            )
+            with st.spinner("Cargando el modelo... Esto puede tardar unos segundos."):
+                from_cache = load_model_cached(
+                    tester,
+                    file_path=model_path,
+                    base_path=base_path,
+                    model_name=model_name,
+                    algorithm=algorithm,
+                    steps=steps_selected,
+                    feature_extractor=feature_extractor,
+                    num_assets=num_assets,
+                )
+                st.success(
+                    f"Modelo cargado correctamente. {model_name} con {steps_selected} steps."
+                    + (" (desde caché)" if from_cache else "")
+                )
+        except Exception as e:
+            st.error(f"Error al cargar el modelo: {e}")
+
+        st.subheader("Evaluación en Progreso")
+
+        # Los pasos se dibujan según se simulan, no al terminar el episodio
+        live = st.empty()
+        steps, renders, last_render = [], 0, 0.0
+        with st.spinner("Evaluando el modelo... Esto puede tardar unos segundos."):
+            with timed("Evaluación individual"):
+                for step in iter_steps(tester.model, tester.port_eval_env):
+                    steps.append(step)
+                    if time.monotonic() - last_render >= LIVE_REFRESH_SECONDS:
+                        renders += 1
+                        show_live_steps(live, steps, renders)
+                        last_render = time.monotonic()
+                info_eval = merge_episodes([summarize_episode(steps)])
+        live.empty()
+
+        internal_env = tester.port_eval_env.envs[0].env
+        filtered_dates = list(
+            filter(
+                lambda x: x >= start_eval and x <= end_eval,
+                map(lambda x: x.date(), internal_env.dates),
+            )
+        )
+
+        dates_str = [d.strftime("%Y-%m-%d") for d in filtered_dates]
+
+        # Ocultar animación y mostrar mensaje de éxito
+        st.success("Evaluación completada.")
+
+        extra = {"dates": dates_str, "companies": selected_companies_names}
+        get_trajectory_store().save(results_key, run_params, info_eval, extra)
+        results = {
+            "key": results_key,
+            "info_eval": info_eval,
+            "params": run_params,
+            "extra": extra,
+        }
+        st.session_state["evaluation_results"] = results
+
+    if results:
+        show_results(results)
+
+
+else:
+    col1, col2 = st.columns(2)
+    start_eval, end_eval = col1.date_input(
+        label="Rango de fechas",
+        value=(pd.to_datetime("2023-01-01"), pd.to_datetime("2024-12-31")),
+        min_value=min_date,
+        max_value=max_date,
+    )
+
+    num_episodes = col2.number_input("Número de Simulaciones", 1, 100, 50, format="%d")
+    base_seed = col2.number_input(
+        "Semilla", 0, MAX_SEED, 0, format="%d", help="Misma semilla, mismos episodios."
+    )
+    stop_ci = col2.number_input(
+        "Parar con IC 95 % menor que (% del valor final)",
+        0.0,
+        50.0,
+        0.0,
+        step=0.5,
+        help=f"Detiene la evaluación cuando el intervalo de confianza del valor final "
+        f"medio es más estrecho que este porcentaje (tras al menos "
+        f"{EARLY_STOP_MIN_EPISODES} simulaciones). 0 para ejecutarlas todas.",
+    )
+
+    number_of_days, first_session, last_session = portfolio_session_range(
+        selected_companies_abv, start_eval, end_eval
+    )
+    # Cada episodio simula `steps` sesiones; la ventana de observación sale del
+    # histórico previo que StockData carga antes de la fecha de inicio
+    min_sessions = configuration["steps"] + 1
+    if number_of_days < min_sessions:
+        st.warning(
+            f"El rango de fechas para la evaluación en lote debe tener al menos "
+            f"{min_sessions} sesiones de mercado (tiene {number_of_days})."
+        )
+        st.stop()
+
+    st.markdown(
+        f"Rango de fechas con mercado abierto: {first_session} - {last_session} "
+        f"({number_of_days} sesiones)"
+    )
+
+    try:
+        model_path, steps_selected = model_checkpoint(model_information, model_size)
+    except Exception as e:
+        st.error(f"Error al cargar el modelo: {e}")
+        st.stop()
+
+    run_params = {
+        "mode": "batch",
+        "model_id": selected_model_id,
+        "model_path": model_path,
+        "steps": steps_selected,
+        "start": start_eval,
+        "end": end_eval,
+        "num_episodes": num_episodes,
+        "seed": base_seed,
+        "data_version": data_version(selected_companies_abv, end_eval),
+    }
+    if stop_ci:
+        run_params["stop_ci"] = stop_ci
+    results_key = run_id(run_params)
+    results = load_stored_results(results_key)
+    evaluate = st.button("Cargar y Evaluar Modelo")
+    if evaluate and results:
+        st.success("Evaluación recuperada de las guardadas, sin volver a simular.")
+    elif evaluate:
+        try:
+            model_path, normalization, algorithm, feature_extractor, num_assets = (
+                model_information
+            )
+            full_path, _ = model_path.rsplit("/", 1)
+            base_path, model_name = full_path.rsplit("/", 1)
+
+            configuration["normalize"] = normalization
+
+            evaluation_spec = {
+                "configuration": configuration,
+                "start_eval": start_eval,
+                "end_eval": end_eval,
+                "random_initialization": True,
+                "model": {
+                    "file_path": model_path,
+                    "base_path": base_path,
+                    "model_name": model_name,
+                    "steps": steps_selected,
+                    "algorithm": algorithm,
+                    "feature_extractor": feature_extractor,
+                    "num_assets": num_assets,
+                },
+            }
+        except Exception as e:
+            st.error(f"Error al cargar el modelo: {e}")
+            st.stop()
+
+        # Los episodios se reparten entre procesos, cada uno con su modelo y entorno.
+        # Se muestran según terminan; solo cuentan los consecutivos desde el primero
+        # (0..k-1), así que parar antes da el mismo resultado sea cual sea el orden
+        progress_bar = st.progress(0.0, text="Evaluando el modelo...")
+        live = st.empty()
+        finished, pending = [], {}
+        renders, last_render = 0, 0.0
+        stopped_early = False
+
+        try:
+            with timed("Evaluación en lote"):
+                episodes = iter_episodes(
+                    evaluation_spec, num_episodes, base_seed=base_seed
+                )
+                for i, episode in episodes:
+                    pending[i] = episode
+                    while len(finished) in pending:
+                        finished.append(pending.pop(len(finished)))
+                    done = len(finished) + len(pending)
+                    progress_bar.progress(
+                        done / num_episodes,
+                        text=f"Evaluando el modelo... {done}/{num_episodes} simulaciones",
+                    )
+
+                    if stop_ci and ci_converged(
+                        [e["final_pv"] for e in finished], stop_ci / 100
+                    ):
+                        stopped_early = True
+                        episodes.close()
+                        break
+                    if finished and (
+                        time.monotonic() - last_render >= LIVE_REFRESH_SECONDS
+                    ):
+                        renders += 1
+                        show_live_batch(live, finished, num_episodes, renders)
+                        last_render = time.monotonic()
+        except Exception as e:
+            st.error(f"Error al evaluar el modelo: {e}")
+            st.stop()
+        live.empty()
+        info_eval = merge_episodes(finished)
+
+        if stopped_early:
+            st.success(
+                f"Evaluación detenida tras {len(finished)} de {num_episodes} "
+                f"simulaciones: IC 95 % del valor final por debajo del {stop_ci} %. "
+                f"{model_name} con {steps_selected} steps."
+            )
+        else:
+            st.success(
+                f"Evaluación completada. {model_name} con {steps_selected} steps."
+            )
+
+        get_trajectory_store().save(results_key, run_params, info_eval)
+        results = {
+            "key": results_key,
+            "info_eval": info_eval,
+            "params": run_params,
+            "extra": {},
+        }
+        st.session_state["evaluation_results"] = results
+
+    if results:
+        show_results(results)
+
+show_timings()
@@ -1,5 +1,3 @@
-import re
-
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -7,18 +5,7 @@ import streamlit as st
 
 from web.commons.session import check_login
 from web.commons.style_utils import add_logo
-from web.pages.commons.database_connectors import get_evaluations
-
-
-def extract_learning_rate(model_name):
-    match = re.search(r"lr_([\d\.]+)", model_name)
-    return float(match.group(1)) if match else None
-
-
-def extract_number_companies(model_name):
-    match = re.search(r"ncompanies_(\d+)", model_name)
-    return int(match.group(1)) if match else None
-
+from web.pages.commons.database_connectors import get_evaluations_wide
 
 # change_theme_toogle()
 add_logo(with_name=False, sidebar=True)
@@ -27,7 +14,8 @@ check_login()
 # st.set_page_config(page_title="Análisis de Métricas de Modelos", layout="wide")
 
 st.title("📈 Análisis de Métricas de Modelos")
-df = get_evaluations()
+# Ya viene en formato ancho: una fila por evaluación y una columna por métrica
+df = get_evaluations_wide()
 
 if not df.empty:
     # Convertir fechas a formato datetime
@@ -46,27 +34,7 @@ if not df.empty:
     if df.empty:
         st.warning("No hay datos disponibles en el rango seleccionado.")
     else:
-        df_pivot = df.pivot_table(
-            index=[
-                "evaluation_id",
-                "model_id",
-                "model_name",
-                "algorithm",
-                "feature_extractor",
-                "normalization",
-                "start_date",
-                "end_date",
-                "phase",
-                "num_evaluations",
-            ],
-            columns="metric_name",
-            values="value",
-        ).reset_index()
-
-        df_pivot["learning_rate"] = df_pivot["model_name"].apply(extract_learning_rate)
-        df_pivot["number_of_companies"] = df_pivot["model_name"].apply(
-            extract_number_companies
-        )
+        df_pivot = df
 
         # AgGrid(df_pivot)
         selection = st.dataframe(df_pivot, hide_index=True, on_select="rerun")
@@ -149,13 +117,13 @@ if not df.empty:
 
                 hover_text = (
                     "Model: "
-                    + df_val["model_name"]
+                    + df_val["model_name"].astype(str)
                     + "<br>Algorithm: "
-                    + df_val["algorithm"]
+                    + df_val["algorithm"].astype(str)
                     + "<br>Feature Extractor: "
-                    + df_val["feature_extractor"]
+                    + df_val["feature_extractor"].astype(str)
                     + "<br>Phase: "
-                    + df_val["phase"]
+                    + df_val["phase"].astype(str)
                     + "<br>Learning Rate: "
                     + df_val["learning_rate"].astype(str)
                     + "<br>Number of Companies: "
@@ -179,13 +147,13 @@ if not df.empty:
 
             hover_text = (
                 "Model: "
-                + df_pivot["model_name"]
+                + df_pivot["model_name"].astype(str)
                 + "<br  >Algorithm: "
-                + df_pivot["algorithm"]
+                + df_pivot["algorithm"].astype(str)
                 + "<br>Feature Extractor: "
-                + df_pivot["feature_extractor"]
+                + df_pivot["feature_extractor"].astype(str)
                 + "<br>Phase: "
-                + df_pivot["phase"]
+                + df_pivot["phase"].astype(str)
                 + "<br>Learning Rate: "
                 + df_pivot["learning_rate"].astype(str)
                 + "<br>Number of Companies: "
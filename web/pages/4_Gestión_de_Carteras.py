@@ -1,22 +1,138 @@
+import numpy as np
 import plotly.graph_objects as go
 import streamlit as st
-from quant_drl.data.stock_data import StockData
+from plotly.subplots import make_subplots
 
 from web.commons.session import check_login
 from web.commons.style_utils import add_logo
+from web.data.portfolio_series import update_portfolio_values
+from web.data.valuation import value_user_portfolios
 from web.pages.commons.database_connectors import (
-    check_if_portfolio_has_assets_weights,
     fetch_companies,
     get_companies_from_portfolio,
+    get_latest_weights_for_user,
+    get_portfolio_values,
     get_portfolios_from_user,
-    get_weights_for_portfolio,
+    get_weights_history,
     save_favorite_portfolio,
     save_weights_for_portfolio,
 )
+from web.pages.commons.query_cache import invalidate
 
 ## Funciones auxiliares
 
 
+def show_weights_history(portfolio_id, page_size=10):
+    """Historial de pesos paginado: cada página pide solo sus fechas a la base de datos."""
+    # Pila de cursores (`before`) de las páginas visitadas de esta cartera
+    key = f"weights_history_pages_{portfolio_id}"
+    pages = st.session_state.setdefault(key, [None])
+
+    history, next_before = get_weights_history(
+        portfolio_id, before=pages[-1], limit=page_size
+    )
+    if history.empty:
+        st.info("No hay historial de pesos.")
+    else:
+        st.dataframe(
+            history.pivot(index="recorded_at", columns="ticker", values="weight")
+            .sort_index(ascending=False)
+            .style.format("{:.4f}"),
+            use_container_width=True,
+        )
+
+    # La navegación se dibuja siempre, también en una página vacía
+    col1, col2 = st.columns(2)
+    if col1.button("⬅️ Más recientes", disabled=len(pages) == 1, key=f"{key}_newer"):
+        pages.pop()
+        st.rerun()
+    if col2.button("Anteriores ➡️", disabled=next_before is None, key=f"{key}_older"):
+        pages.append(next_before)
+        st.rerun()
+
+
+def show_portfolios_overview(overview):
+    """Valor actual, PnL y deriva máxima de todas las carteras del usuario."""
+    st.caption(f"Precios de cierre a {overview.attrs['as_of']:%Y-%m-%d}")
+    if overview["missing_prices"].any():
+        st.warning(
+            "Algunos activos no tienen precios: se valoran al precio de la fecha de registro."
+        )
+    st.dataframe(
+        overview.drop(columns=["portfolio_id", "missing_prices"]).assign(
+            **{"return": overview["return"] * 100}
+        ),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "portfolio_name": "Cartera",
+            "recorded_at": st.column_config.DateColumn("Registro"),
+            "recorded_value": st.column_config.NumberColumn(
+                "Valor registrado", format="$%.2f"
+            ),
+            "current_value": st.column_config.NumberColumn(
+                "Valor actual", format="$%.2f"
+            ),
+            "pnl": st.column_config.NumberColumn("PnL", format="$%.2f"),
+            "return": st.column_config.NumberColumn("Rentabilidad", format="%.2f%%"),
+            "max_drift": st.column_config.NumberColumn(
+                "Deriva máx.", format="%.4f"
+            ),
+        },
+    )
+
+
+def show_portfolio_value_series(portfolio_id):
+    """Curva de valor, drawdown y rentabilidades mensuales de la serie precalculada."""
+    series = get_portfolio_values(portfolio_id)
+    if len(series) < 2:
+        st.info("La serie de valor se genera cada noche a partir de los pesos guardados.")
+        if st.button("Calcular ahora", key=f"portfolio_values_{portfolio_id}"):
+            with st.spinner("Calculando serie de valor..."):
+                update_portfolio_values([portfolio_id])
+            invalidate("portfolio_values")
+            st.rerun()
+        return
+
+    drawdown = series / series.cummax() - 1
+    daily_returns = series.pct_change().dropna()
+    monthly_returns = series.resample("ME").last().pct_change().dropna()
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rentabilidad total", f"{series.iloc[-1] / series.iloc[0] - 1:.2%}")
+    col2.metric("Máximo drawdown", f"{drawdown.min():.2%}")
+    col3.metric("Volatilidad anual", f"{daily_returns.std() * np.sqrt(252):.2%}")
+
+    fig = make_subplots(
+        rows=3,
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.05,
+        row_heights=[0.5, 0.25, 0.25],
+        subplot_titles=("Valor (USD)", "Drawdown", "Rentabilidad mensual"),
+    )
+    fig.add_trace(go.Scatter(x=series.index, y=series, name="Valor"), row=1, col=1)
+    fig.add_trace(
+        go.Scatter(x=drawdown.index, y=drawdown, name="Drawdown", fill="tozeroy"),
+        row=2,
+        col=1,
+    )
+    fig.add_trace(
+        go.Bar(
+            x=monthly_returns.index,
+            y=monthly_returns,
+            name="Mensual",
+            marker_color=np.where(monthly_returns >= 0, "seagreen", "indianred"),
+        ),
+        row=3,
+        col=1,
+    )
+    fig.update_yaxes(tickformat=".1%", row=2, col=1)
+    fig.update_yaxes(tickformat=".1%", row=3, col=1)
+    fig.update_layout(height=700, showlegend=False)
+    st.plotly_chart(fig, use_container_width=True)
+
+
 def plot_weights_pie_chart(weights_dict):
     weights = list(weights_dict.items())
     values = list(map(lambda x: x[1], weights))
@@ -204,6 +320,15 @@ tab_selection = st.radio(
 if tab_selection == "Mis Portafolios":
     portfolios = get_portfolios_from_user(st.session_state.get("user_id", 1))
     if portfolios:
+        # Todas las carteras se valoran juntas: una consulta y una carga de precios
+        holdings = get_latest_weights_for_user(st.session_state.get("user_id", 1))
+        with st.spinner("Cargando datos..."):
+            overview, assets = value_user_portfolios(holdings)
+
+        if not overview.empty:
+            st.subheader("📋 Resumen de carteras")
+            show_portfolios_overview(overview)
+
         st.subheader("⭐ Mis Portafolios Favoritos")
         selected_portfolio = st.selectbox(
             "Selecciona un portafolio:", portfolios, format_func=lambda x: x[2]
@@ -212,33 +337,24 @@ if tab_selection == "Mis Portafolios":
         if selected_portfolio:
             portfolio_id = selected_portfolio[0]
 
-            # Mostrar pesos si existen
-            if check_if_portfolio_has_assets_weights(portfolio_id):
+            # Mostrar pesos si existen (solo los de la última fecha registrada)
+            portfolio_assets = (
+                assets[assets["portfolio_id"] == portfolio_id]
+                if not assets.empty
+                else assets
+            )
+            if not portfolio_assets.empty:
                 st.subheader("📊 Pesos actuales:")
-                weights = get_weights_for_portfolio(portfolio_id)
-
-                weights_dict = {k: v for _, k, v, _, _, _ in weights}
 
-                recorded_date = weights[0][3]
-                portfolio_value = weights[0][4]
+                recorded_date = portfolio_assets["recorded_at"].iloc[0]
+                portfolio_value = portfolio_assets["previous_value"].sum()
+                new_portfolio_value = portfolio_assets["current_value"].sum()
                 st.write(f"Fecha de registro: {recorded_date}")
 
-                # Add a wait message and a spinner
-                with st.spinner("Cargando datos..."):
-                    stockdata = StockData(
-                        comp_abv=[t for _, t, _, _, _, _ in weights],
-                        comp_names=[n for n, _, _, _, _, _ in weights],
-                        difference_start_end=5,
-                    )
-
-                new_portfolio_value, new_weights, previous_values, new_values = (
-                    stockdata.calculate_portfolio_value(
-                        weights_dict, recorded_date, portfolio_value
-                    )
+                investement_dict = dict(
+                    zip(portfolio_assets["ticker"], portfolio_assets["current_value"])
                 )
 
-                investement_dict = new_values
-
                 fig = plot_weights_pie_chart(investement_dict)
                 fig.update_layout(
                     title_text=f"Resumen de inversión. Nuevo valor del portafolio: ${new_portfolio_value:.5f}"
@@ -250,6 +366,37 @@ if tab_selection == "Mis Portafolios":
                     f"El valor del portafolio ha cambiado en: ${(float(new_portfolio_value) - float(portfolio_value)):.5f} (Precio de cierre)"
                 )
 
+                st.subheader("📈 Evolución del valor")
+                show_portfolio_value_series(portfolio_id)
+
+                with st.expander("⚖️ Deriva de pesos", expanded=False):
+                    st.dataframe(
+                        portfolio_assets[
+                            ["ticker", "name", "weight", "current_weight", "drift", "pnl"]
+                        ],
+                        hide_index=True,
+                        use_container_width=True,
+                        column_config={
+                            "ticker": "Ticker",
+                            "name": "Empresa",
+                            "weight": st.column_config.NumberColumn(
+                                "Peso registrado", format="%.4f"
+                            ),
+                            "current_weight": st.column_config.NumberColumn(
+                                "Peso actual", format="%.4f"
+                            ),
+                            "drift": st.column_config.NumberColumn(
+                                "Deriva", format="%+.4f"
+                            ),
+                            "pnl": st.column_config.NumberColumn(
+                                "PnL (USD)", format="%.2f"
+                            ),
+                        },
+                    )
+
+                with st.expander("🗂️ Historial de pesos", expanded=False):
+                    show_weights_history(portfolio_id)
+
             else:
                 st.warning("No hay pesos registrados para este portafolio")
                 # 2️⃣ Modificar pesos de un portafolio
@@ -1,24 +1,28 @@
 import os
 import subprocess
 import time
-from datetime import datetime
 
 import pandas as pd
 import streamlit as st
 import streamlit.components.v1 as components
-from quant_drl.configurations import get_complete_configuration
-from quant_drl.trainer.trainer import Trainer
 
 from web.commons.session import check_login
 from web.commons.style_utils import add_logo
+from web.jobs.queue import (
+    ACTIVE_STATUSES,
+    JobLimitError,
+    cancel_job,
+    enqueue_training_job,
+    get_jobs_for_user,
+)
 from web.pages.commons.database_connectors import (
     fetch_companies,
     fetch_favorite_portfolios,
     get_models_by_companies,
-    insert_model,
-    save_favorite_model,
     save_favorite_portfolio,
+    search_models_by_companies,
 )
+from web.pages.commons.query_cache import invalidate
 
 
 ## Auxiliar Functions
@@ -95,6 +99,14 @@ if not selected_companies_abv:
 search_models = st.sidebar.button("Buscar Modelos")
 
 if search_models:
+    column_config = {
+        "model_id": "Model ID",
+        "algorithm": "Algoritmo",
+        "feature_extractor": "Extractor de Características",
+        "normalization": "Normalización",
+        "name": "Nombre",
+    }
+
     modelos = get_models_by_companies(selected_companies_abv, add_extras=True)
     if modelos is not None:
         df_modelos = pd.DataFrame(
@@ -108,14 +120,6 @@ if search_models:
             ],
         )
 
-        column_config = {
-            "model_id": "Model ID",
-            "algorithm": "Algoritmo",
-            "feature_extractor": "Extractor de Características",
-            "normalization": "Normalización",
-            "name": "Nombre",
-        }
-
         st.write("Modelos encontrados:")
         st.dataframe(
             df_modelos,
@@ -126,6 +130,22 @@ if search_models:
     else:
         st.warning("No se encontraron modelos para las empresas seleccionadas.")
 
+    # Modelos que comparten parte de la cartera, por similitud de Jaccard
+    similares = search_models_by_companies(selected_companies_abv, mode="jaccard")
+    if not similares.empty:
+        st.write("Modelos que cubren parte de la cartera:")
+        st.dataframe(
+            similares,
+            column_config={
+                **column_config,
+                "common": "Compañías en común",
+                "jaccard": st.column_config.ProgressColumn(
+                    "Similitud", min_value=0.0, max_value=1.0, format="%.2f"
+                ),
+            },
+            hide_index=True,
+        )
+
 
 # Model Creation
 if st.sidebar.button("Crear Nuevo Modelo"):
@@ -190,70 +210,88 @@ if st.session_state.create_new_model and not st.session_state.model_submitted:
         st.session_state.model_submitted = True
 
 if st.session_state.model_submitted and not st.session_state.model_trained:
-    st.info("Configuración recibida. Comenzando entrenamiento...")
     values = st.session_state.form_values
-    selected_companies_abv.remove("CASH")
-    selected_companies_names.remove("Cash")
-    configuration = get_complete_configuration(
-        companies_pairs=list(zip(selected_companies_abv, selected_companies_names)),
-        key_value_pairs={
-            "algorithm": values["algorithm"],
-            "feature": values["feature_extractor"],
-            "normalize": values["normalization"],
-            "length_train_data": values["years_train"],
-            "length_eval_data": values["years_test"],
-            "end_date": values["final_date"],
-            "total_timesteps": values["total_timesteps"],
-            "checkpoint_freq": values["checkpoint_freq"],
-            "model_name": values["model_name"],
-            "user_id": st.session_state.get("user_id", 1),
-        },
-    )
+    user_id = st.session_state.get("user_id", 1)
 
-    trainer = Trainer(
-        configuration,
-        generate_default_name=False,
-        run=False,
-        logs_dir="../logs/",
-        save_dir="../models/",
-    )
+    # El entrenamiento lo ejecuta un worker (web/jobs/worker.py), no esta sesión
+    try:
+        job_id = enqueue_training_job(
+            user_id,
+            {
+                **values,
+                "final_date": values["final_date"].isoformat(),
+                "companies_abv": selected_companies_abv,
+                "companies_names": selected_companies_names,
+                "user_id": user_id,
+            },
+        )
+        st.success(f"✅ Entrenamiento #{job_id} en cola.")
+        st.session_state.model_trained = True
+    except JobLimitError as e:
+        st.warning(str(e))
+        st.session_state.model_submitted = False
 
+if st.session_state.model_trained:
     # Directorio de logs por usuario
     user_id = st.session_state.get("user_id", 1)
     logdir = os.path.abspath(f"../logs/USERS/{user_id}")
-    launch_tensorboard(logdir)
+    if "tensorboard_launched" not in st.session_state:
+        launch_tensorboard(logdir)
+        st.session_state.tensorboard_launched = True
 
     # Mostrar TensorBoard embebido
     components.iframe("http://localhost:6006", height=600)
-
-    # Entrenar modelo
-    with st.spinner("Creando Modelo..."):
-        trainer.run_experiment()
-
-    selected_companies_abv.append("CASH")
-    selected_companies_names.append("Cash")
-    model_id = insert_model(
-        name=values["model_name"],
-        algorithm=values["algorithm"],
-        feature_extractor=values["feature_extractor"],
-        companies_abv=selected_companies_abv,
-        file_path=trainer.save_path,
-        created_at=datetime.now(),
-        normalization=values["normalization"],
+    st.write(
+        "Puedes cerrar esta página: el entrenamiento continúa en segundo plano. "
+        "Cuando termine podrás pasar a la evaluación del modelo."
     )
-
-    if model_id:
-        saved = save_favorite_model(
-            user_id=st.session_state.get("user_id", 1),
-            model_id=model_id,
-            favorite_name=model_name,
+    if st.button("Crear otro modelo"):
+        st.session_state.model_submitted = False
+        st.session_state.model_trained = False
+        st.rerun()
+
+STATUS_LABELS = {
+    "queued": "⏳ En cola",
+    "running": "🏃 Entrenando",
+    "completed": "✅ Completado",
+    "failed": "❌ Fallido",
+    "cancelled": "🚫 Cancelado",
+}
+
+
+@st.fragment(run_every=5)
+def training_jobs_status():
+    """Estado de los entrenamientos del usuario; solo se re-ejecuta este bloque."""
+    user_id = st.session_state.get("user_id", 1)
+    jobs = get_jobs_for_user(user_id)
+    if not jobs:
+        return
+
+    # Los modelos los registra el worker en otro proceso: refrescamos la caché
+    completed = {j["job_id"] for j in jobs if j["status"] == "completed"}
+    if completed - st.session_state.get("completed_jobs", set()):
+        invalidate("models")
+    st.session_state.completed_jobs = completed
+
+    st.subheader("Entrenamientos")
+    for job in jobs:
+        cols = st.columns([1, 3, 1, 2, 3, 1])
+        cols[0].write(f"#{job['job_id']}")
+        cols[1].write(job["model_name"])
+        cols[2].write(job["algorithm"])
+        status = STATUS_LABELS.get(job["status"], job["status"])
+        if job["status"] == "running" and job["cancel_requested"]:
+            status = "🛑 Cancelando..."
+        cols[3].write(status)
+        cols[4].write(
+            job["error"]
+            or (f"Modelo {job['model_id']}" if job["model_id"] else "")
+            or f"{job['created_at']:%Y-%m-%d %H:%M}"
         )
-        if saved:
-            st.success("✅ Modelo creado exitosamente.")
-            st.balloons()
-        st.session_state.model_trained = True
-    else:
-        st.error("❌ Error al crear el modelo.")
+        if job["status"] in ACTIVE_STATUSES and not job["cancel_requested"]:
+            if cols[5].button("Cancelar", key=f"cancel_job_{job['job_id']}"):
+                cancel_job(job["job_id"], user_id)
+                st.rerun(scope="fragment")
 
-if st.session_state.model_trained:
-    st.write("Puedes ahora pasar a la evaluación del modelo.")
+
+training_jobs_status()
@@ -0,0 +1,72 @@
+from web.db.commons.async_db import get_async_db
+from web.pages.commons.database_connectors import (
+    CATALOG_TTL,
+    FAVORITE_MODELS_QUERY,
+    FAVORITE_PORTFOLIOS_QUERY,
+    MODEL_COMPANIES_QUERY,
+    MODEL_INFORMATION_QUERY,
+    MODELS_QUERY,
+    MODELS_TTL,
+    PORTFOLIOS_TTL,
+)
+from web.pages.commons.query_cache import cached_query
+
+# Versiones asíncronas de los conectores de solo lectura que las páginas cargan
+# al entrar. Se lanzan juntas con gather_queries (web.db.commons.async_db) y
+# usan las mismas consultas que sus versiones síncronas.
+
+
+@cached_query(ttl=PORTFOLIOS_TTL, tags=("portfolios",))
+async def fetch_favorite_portfolios_async(user_id):
+    """Fetch favorite portfolios for the user from the database."""
+    try:
+        portfolios = await get_async_db().fetch_all(
+            FAVORITE_PORTFOLIOS_QUERY, (user_id,)
+        )
+        return {p[1]: p[2] for p in portfolios}
+    except Exception as e:
+        print(f"Error conectando a la base de datos: {e}")
+        return {}
+
+
+@cached_query(ttl=MODELS_TTL, tags=("models",))
+async def get_models_async() -> dict:
+    """Todos los modelos: {nombre: model_id}."""
+    try:
+        rows = await get_async_db().fetch_all(MODELS_QUERY)
+        return {name: model_id for model_id, name in rows}
+    except Exception as e:
+        print(f"Error conectando a la base de datos: {e}")
+        return {}
+
+
+async def get_favorite_models_async(user_id: int) -> list:
+    """Modelos favoritos del usuario: [(favorite_name, name, model_id)]."""
+    try:
+        rows = await get_async_db().fetch_all(FAVORITE_MODELS_QUERY, (user_id,))
+        return [tuple(row) for row in rows]
+    except Exception as e:
+        print(f"Error conectando a la base de datos: {e}")
+        return []
+
+
+@cached_query(ttl=CATALOG_TTL, tags=("models", "companies"))
+async def get_companies_from_model_async(model_id) -> dict:
+    """Compañías de un modelo: {nombre: ticker}."""
+    try:
+        rows = await get_async_db().fetch_all(MODEL_COMPANIES_QUERY, (model_id,))
+        return dict(rows)
+    except Exception as e:
+        print(f"Error conectando a la base de datos: {e}")
+        return {}
+
+
+async def get_model_information_async(model_id):
+    """(file_path, normalization, algorithm, feature_extractor, ncompanies) de un modelo."""
+    try:
+        return tuple(
+            await get_async_db().fetch_one(MODEL_INFORMATION_QUERY, (model_id,))
+        )
+    except Exception as e:
+        print(f"Error conectando a la base de datos: {e}")
+        return ""
@@ -6,10 +6,68 @@ import pandas as pd
 import streamlit as st
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
-from web.db.commons.db_connection import connect_db
+from web.db.commons.db_connection import connect_db, db_connection
+from web.db.commons.streaming import read_frame
+from web.db.commons.ticker_sets import canonical_tickers, ticker_signature
+from web.db.commons.writes import (
+    portfolio_company_ids,
+    register_model,
+    save_portfolio,
+    save_weights,
+)
+from web.pages.commons.query_cache import cached_query, invalidate
+
+# TTL (segundos) de las consultas de catálogo cacheadas
+CATALOG_TTL = 3600
+MODELS_TTL = 600
+PORTFOLIOS_TTL = 120
+
+# Consultas compartidas con las versiones asíncronas (async_connectors.py)
+FAVORITE_PORTFOLIOS_QUERY = """
+    SELECT f.favorite_id, p.name, ARRAY_AGG(c.ticker)
+    FROM favorites f
+    JOIN portfolios p ON f.reference_id = p.portfolio_id
+    JOIN portfolio_companies pc ON p.portfolio_id = pc.portfolio_id
+    JOIN companies c ON pc.company_id = c.company_id
+    WHERE f.type = 'portfolio' AND f.user_id = %s
+    GROUP BY f.favorite_id, p.name;
+"""
+
+MODEL_INFORMATION_QUERY = """
+    SELECT file_path, normalization, algorithm, feature_extractor, ncompanies
+    FROM models
+    WHERE model_id = %s;
+"""
+
+MODELS_QUERY = """
+    SELECT m.model_id, m.name
+    FROM models m;
+"""
+
+MODEL_COMPANIES_QUERY = """
+    SELECT c.name AS company_name, c.ticker AS company_abv
+    FROM model_companies mc
+    JOIN companies c ON mc.company_id = c.company_id
+    WHERE mc.model_id = %s;
+"""
+
+# Búsqueda exacta por la firma del conjunto de tickers (índice sobre ticker_signature)
+MODELS_BY_SIGNATURE_QUERY = """
+    SELECT m.model_id, m.name, m.algorithm, m.feature_extractor, m.normalization
+    FROM models m
+    WHERE m.ticker_signature = %s;
+"""
+
+FAVORITE_MODELS_QUERY = """
+    SELECT f.name AS favorite_name, m.name AS name, m.model_id AS model_id
+    FROM favorites f
+    JOIN models m ON f.reference_id = m.model_id
+    WHERE f.user_id = %s AND f.type = 'model';
+"""
 
 
 # INFORMACION FINANCIERA
+@cached_query(ttl=CATALOG_TTL, tags=("companies",))
 def fetch_companies():
     """Fetch companies from the PostgreSQL database."""
     conn = connect_db()
@@ -21,128 +79,63 @@ def fetch_companies():
     return companies  # Returns a dictionary { 'Company Name': 'Ticker' }
 
 
+@cached_query(ttl=PORTFOLIOS_TTL, tags=("portfolios",))
 def fetch_favorite_portfolios(user_id):
     """Fetch favorite portfolios for the user from the database."""
     conn = connect_db()
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT f.favorite_id, p.name, ARRAY_AGG(c.ticker) 
-        FROM favorites f 
-        JOIN portfolios p ON f.reference_id = p.portfolio_id 
-        JOIN portfolio_companies pc ON p.portfolio_id = pc.portfolio_id
-        JOIN companies c ON pc.company_id = c.company_id
-        WHERE f.type = 'portfolio' AND f.user_id = %s
-        GROUP BY f.favorite_id, p.name;
-    """,
-        (user_id,),
-    )  # Replace with real user_id
+    cursor.execute(FAVORITE_PORTFOLIOS_QUERY, (user_id,))
     portfolios = cursor.fetchall()
     conn.close()
 
     return {p[1]: p[2] for p in portfolios}
 
 
-def save_favorite_portfolio(portfolio_name, selected_tickers):
-    """Save the selected portfolio as a favorite."""
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    try:
-        # Insert portfolio
-        cursor.execute(
-            "INSERT INTO portfolios (user_id, name) VALUES (%s, %s) RETURNING portfolio_id;",
-            (st.session_state.get("user_id", 1), portfolio_name),
-        )
-        portfolio_id = cursor.fetchone()[0]
-
-        # Insert companies into portfolio
-        for ticker in selected_tickers:
-            cursor.execute(
-                "INSERT INTO portfolio_companies (portfolio_id, company_id) VALUES (%s, (SELECT company_id FROM companies WHERE ticker = %s));",
-                (portfolio_id, ticker),
-            )
-
-        # Mark as favorite
-        cursor.execute(
-            "INSERT INTO favorites (user_id, type, reference_id, name) VALUES (%s, 'portfolio', %s, %s);",
-            (st.session_state.get("user_id", 1), portfolio_id, portfolio_name),
-        )
-
-        conn.commit()
-        st.success(f"Portafolio '{portfolio_name}' guardado como favorito.")
-    except Exception as e:
-        conn.rollback()
-        st.error(f"Error al guardar el portafolio: {e}")
-    finally:
-        conn.close()
-
-
 # EVALUACION DE MODELOS
 def get_model_information(model_id: str) -> str:
-    query = """
-        SELECT file_path, normalization, algorithm, feature_extractor, ncompanies
-        FROM models
-        WHERE model_id = %s;
-        """
     try:
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute(query, (model_id,))
-        file_path, normalization, algorithm, feature_extractor, num_assets = (
-            cursor.fetchone()
-        )
-        cursor.close()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(MODEL_INFORMATION_QUERY, (model_id,))
+            file_path, normalization, algorithm, feature_extractor, num_assets = (
+                cursor.fetchone()
+            )
         return file_path, normalization, algorithm, feature_extractor, num_assets
     except Exception as e:
         print(f"Error conectando a la base de datos: {e}")
         return ""
 
 
+@cached_query(ttl=MODELS_TTL, tags=("models",))
 def get_models() -> dict:
     """Función que obtiene todos los modelos de la base de datos y sus compañías asociadas."""
-    query = """
-        SELECT m.model_id, m.name
-        FROM models m
-        """
     try:
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute(query)
-        modelos = pd.DataFrame(
-            cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
-        )
-        cursor.close()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(MODELS_QUERY)
+            modelos = pd.DataFrame(
+                cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
+            )
         return dict(zip(modelos["name"], modelos["model_id"]))
     except Exception as e:
         print(f"Error conectando a la base de datos: {e}")
         return {}
 
 
+@cached_query(ttl=CATALOG_TTL, tags=("models", "companies"))
 def get_companies_from_model(model_id: str) -> dict:
     """Función que obtiene las compañías asociadas a un modelo."""
-    query = """
-        SELECT c.name AS company_name, c.ticker AS company_abv
-        FROM model_companies mc
-        JOIN companies c ON mc.company_id = c.company_id
-        JOIN models m ON mc.model_id = m.model_id
-        WHERE m.model_id = %s;
-        """
-
     try:
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute(query, (model_id,))
-        companies = pd.DataFrame(
-            cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
-        )
-        cursor.close()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(MODEL_COMPANIES_QUERY, (model_id,))
+            companies = pd.DataFrame(
+                cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
+            )
         return dict(zip(companies["company_name"], companies["company_abv"]))
     except Exception as e:
         print(f"Error conectando a la base de datos: {e}")
         return {}
 
 
+@cached_query(ttl=MODELS_TTL, tags=("models", "companies"))
 def get_models_by_companies(companies_abv: list, add_extras: bool = False):
     """
     Obtiene los modelos que tienen exactamente las compañías especificadas.
@@ -153,34 +146,14 @@ def get_models_by_companies(companies_abv: list, add_extras: bool = False):
     if not companies_abv:
         return {}
 
-    placeholders = ",".join(["%s"] * len(companies_abv))
-    query = f"""
-        SELECT m.model_id, m.name, m.algorithm, m.feature_extractor, m.normalization
-        FROM model_companies mc
-        JOIN models m ON mc.model_id = m.model_id
-        JOIN companies c ON mc.company_id = c.company_id
-        WHERE c.ticker IN ({placeholders}) AND m.ncompanies = %s
-        GROUP BY m.model_id, m.name
-        HAVING 
-            COUNT(DISTINCT c.ticker) = %s
-            AND COUNT(*) = %s;
-    """
-
-    params = (
-        *companies_abv,
-        len(companies_abv) - 1,
-        len(companies_abv),
-        len(companies_abv),
-    )
-
     try:
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        modelos = pd.DataFrame(
-            cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
-        )
-        cursor.close()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                MODELS_BY_SIGNATURE_QUERY, (ticker_signature(companies_abv),)
+            )
+            modelos = pd.DataFrame(
+                cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
+            )
         if add_extras:
             return modelos
         return dict(zip(modelos["name"], modelos["model_id"]))
@@ -189,22 +162,64 @@ def get_models_by_companies(companies_abv: list, add_extras: bool = False):
         return {}
 
 
+# Condición sobre ticker_set (índice GIN) de cada modo de search_models_by_companies
+TICKER_SET_MODES = {
+    "superset": "m.ticker_set @> %(tickers)s::text[]",
+    "subset": "m.ticker_set <@ %(tickers)s::text[]",
+    "jaccard": "m.ticker_set && %(tickers)s::text[]",
+}
+
+
+@cached_query(ttl=MODELS_TTL, tags=("models", "companies"))
+def search_models_by_companies(
+    companies_abv: list, mode: str = "jaccard", limit: int = 20
+) -> pd.DataFrame:
+    """
+    Busca modelos por solapamiento con una cartera.
+
+    :param mode: "superset" (el modelo contiene todas las compañías), "subset"
+        (el modelo solo usa compañías de la cartera) o "jaccard" (cualquier
+        solapamiento, ordenado por similitud de Jaccard).
+    :return: DataFrame con los modelos, las compañías en común y su similitud.
+    """
+    if not companies_abv or mode not in TICKER_SET_MODES:
+        return pd.DataFrame()
+
+    query = f"""
+        SELECT model_id, name, algorithm, feature_extractor, normalization,
+               common, common::float / (cardinality(ticker_set) + %(n)s - common) AS jaccard
+        FROM (
+            SELECT m.*,
+                   cardinality(ARRAY(
+                       SELECT unnest(m.ticker_set) INTERSECT SELECT unnest(%(tickers)s::text[])
+                   )) AS common
+            FROM models m
+            WHERE {TICKER_SET_MODES[mode]}
+        ) matches
+        ORDER BY jaccard DESC, model_id
+        LIMIT %(limit)s;
+    """
+    tickers = canonical_tickers(companies_abv)
+
+    try:
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(query, {"tickers": tickers, "n": len(tickers), "limit": limit})
+            return pd.DataFrame(
+                cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
+            )
+    except Exception as e:
+        print(f"Error conectando a la base de datos: {e}")
+        return pd.DataFrame()
+
+
 def get_favorite_models(user_id: int) -> list:
     """Obtener los modelos favoritos de un usuario."""
-    query = """
-        SELECT m.model_id AS model_id, m.name AS name, f.name AS favorite_name
-        FROM favorites f
-        JOIN models m ON f.reference_id = m.model_id
-        WHERE f.user_id = %s AND f.type = 'model';
-        """
     try:
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute(query, (user_id,))
-        modelos = pd.DataFrame(
-            cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
-        )
-        cursor.close()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(FAVORITE_MODELS_QUERY, (user_id,))
+            modelos = pd.DataFrame(
+                cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
+            )
         return list(
             tuple(zip(modelos["favorite_name"], modelos["name"], modelos["model_id"]))
         )
@@ -215,15 +230,12 @@ def get_favorite_models(user_id: int) -> list:
 
 def save_favorite_model(user_id: int, model_id: int, favorite_name: str = None) -> bool:
     """Save the selected model as a favorite for the user."""
-    conn = connect_db()
-    cursor = conn.cursor()
-
     try:
-        cursor.execute(
-            "INSERT INTO favorites (user_id, type, reference_id, name) VALUES (%s, 'model', %s, %s);",
-            (user_id, model_id, favorite_name),
-        )
-        conn.commit()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO favorites (user_id, type, reference_id, name) VALUES (%s, 'model', %s, %s);",
+                (user_id, model_id, favorite_name),
+            )
         return True
     except Exception as e:
         st.error(f"Error al guardar el modelo favorito: {e}")
@@ -231,6 +243,24 @@ def save_favorite_model(user_id: int, model_id: int, favorite_name: str = None)
 
 
 # ANALISIS METRICAS MODELOS
+# Tipos compactos de las evaluaciones en formato largo (una fila por métrica)
+EVALUATION_DTYPES = {
+    "evaluation_id": "int32",
+    "model_id": "int32",
+    "num_evaluations": "int32",
+    "model_name": "category",
+    "algorithm": "category",
+    "feature_extractor": "category",
+    "normalization": "category",
+    "phase": "category",
+    "metric_name": "category",
+    "start_date": "datetime64[ns]",
+    "end_date": "datetime64[ns]",
+    "value": "float32",
+}
+
+
+@cached_query(ttl=MODELS_TTL, tags=("evaluations", "models"))
 def get_evaluations():
     """Returns evaluation metrics for each model in the database."""
     query = """
@@ -243,14 +273,39 @@ def get_evaluations():
     """
 
     try:
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute(query)
-        model_information = pd.DataFrame(
-            cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
+        return read_frame(query, dtypes=EVALUATION_DTYPES)
+    except Exception as e:
+        st.error(f"Error fetching model information: {e}")
+        return pd.DataFrame()
+
+
+# Tipos compactos de la vista ancha; las columnas de métricas (variables) van a float32
+EVALUATION_WIDE_DTYPES = {
+    "evaluation_id": "int32",
+    "model_id": "int32",
+    "num_evaluations": "int32",
+    "model_name": "category",
+    "algorithm": "category",
+    "feature_extractor": "category",
+    "normalization": "category",
+    "phase": "category",
+    "start_date": "datetime64[ns]",
+    "end_date": "datetime64[ns]",
+    # Salen del nombre del modelo y pueden ser NULL
+    "learning_rate": "float32",
+    "number_of_companies": "float32",
+}
+
+
+@cached_query(ttl=MODELS_TTL, tags=("evaluations", "models"))
+def get_evaluations_wide():
+    """Una fila por evaluación con sus métricas en columnas (vista evaluation_wide)."""
+    try:
+        return read_frame(
+            "SELECT * FROM evaluation_wide;",
+            dtypes=EVALUATION_WIDE_DTYPES,
+            default_dtype="float32",
         )
-        conn.close()
-        return model_information
     except Exception as e:
         st.error(f"Error fetching model information: {e}")
         return pd.DataFrame()
@@ -267,14 +322,7 @@ def get_evaluation_by_model(model_id):
     """
 
     try:
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute(query, (model_id,))
-        model_evaluation = pd.DataFrame(
-            cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
-        )
-        conn.close()
-        return model_evaluation
+        return read_frame(query, (model_id,), dtypes=EVALUATION_DTYPES)
     except Exception as e:
         st.error(f"Error fetching evaluation for model {model_id}: {e}")
         return pd.DataFrame()
@@ -282,10 +330,9 @@ def get_evaluation_by_model(model_id):
 
 #
 def get_portfolios_from_user(user_id: str):
-    db = connect_db()
-    cursor = db.cursor()
-    cursor.execute(f"SELECT * FROM portfolios WHERE user_id = {user_id}")
-    portfolios = cursor.fetchall()
+    with db_connection() as db, db.cursor() as cursor:
+        cursor.execute("SELECT * FROM portfolios WHERE user_id = %s", (user_id,))
+        portfolios = cursor.fetchall()
     return portfolios
 
 
@@ -307,116 +354,144 @@ def get_companies_from_portfolio(portfolio_id):
     return companies
 
 
-def check_if_portfolio_has_assets_weights(portfolio_id):
-    db = connect_db()
-    cursor = db.cursor()
-    cursor.execute(
-        "SELECT COUNT(*) FROM portfolio_weights WHERE portfolio_id = %s",
-        (portfolio_id,),
-    )
-    has_weights = cursor.fetchone()[0] > 0
-    cursor.close()
-    db.close()
-    return has_weights
+@cached_query(ttl=PORTFOLIOS_TTL, tags=("portfolios",))
+def get_latest_weights_for_user(user_id=None) -> pd.DataFrame:
+    """
+    Pesos de la última fecha registrada de cada cartera de un usuario (de todos con None).
+
+    Una sola consulta: la última fecha de cada cartera sale del índice
+    (portfolio_id, recorded_at DESC) con un LATERAL ... LIMIT 1.
+    """
+    with db_connection() as db, db.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT p.portfolio_id, p.name AS portfolio_name, p.portfolio_value,
+                   latest.recorded_at, c.ticker, c.name, pw.weight
+            FROM portfolios AS p
+            JOIN LATERAL (
+                SELECT recorded_at FROM portfolio_weights
+                WHERE portfolio_id = p.portfolio_id
+                ORDER BY recorded_at DESC
+                LIMIT 1
+            ) AS latest ON TRUE
+            JOIN portfolio_weights AS pw
+              ON pw.portfolio_id = p.portfolio_id AND pw.recorded_at = latest.recorded_at
+            JOIN companies AS c ON pw.company_id = c.company_id
+            WHERE %(user_id)s::int IS NULL OR p.user_id = %(user_id)s
+            ORDER BY p.portfolio_id, c.ticker;
+            """,
+            {"user_id": user_id},
+        )
+        return pd.DataFrame(
+            cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
+        )
 
 
-def get_weights_for_portfolio(portfolio_id):
-    db = connect_db()
-    cursor = db.cursor()
-    cursor.execute(
-        """
-        SELECT c.name, c.ticker, pw.weight, pw.recorded_at, p.portfolio_value, pw.weight * p.portfolio_value as invested
-        FROM portfolio_weights as pw
-        JOIN companies as c ON pw.company_id = c.company_id
-        JOIN portfolios as p ON pw.portfolio_id = p.portfolio_id
-        WHERE pw.portfolio_id = %s ORDER BY pw.recorded_at DESC;
-        """,
-        (portfolio_id,),
+@cached_query(ttl=PORTFOLIOS_TTL, tags=("portfolios", "portfolio_values"))
+def get_portfolio_values(portfolio_id) -> pd.Series:
+    """Serie diaria precalculada del valor de una cartera (ver web/data/portfolio_series.py)."""
+    with db_connection() as db, db.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT date, value FROM portfolio_values
+            WHERE portfolio_id = %s
+            ORDER BY date;
+            """,
+            (portfolio_id,),
+        )
+        rows = cursor.fetchall()
+    return pd.Series(
+        [value for _, value in rows],
+        index=pd.DatetimeIndex([day for day, _ in rows], name="date"),
+        name="value",
+        dtype="float64",
     )
-    weights = cursor.fetchall()
-    db.close()
-    print("Weights:", weights)
-    return weights
-
 
-def save_weights_for_portfolio(portfolio_id, companies_weights):
-    db = connect_db()
-    cursor = db.cursor()
-    date = timestamp.now().date()
 
-    # Verificar si las empresas están registradas en portfolio_companies
-    cursor.execute(
-        "SELECT company_id FROM portfolio_companies WHERE portfolio_id = %s",
-        (portfolio_id,),
-    )
-    registered_companies = {row[0] for row in cursor.fetchall()}
-    input_companies = set(companies_weights.keys())
-
-    print("Registered companies:", registered_companies)
-    print("Input companies:", input_companies)
-
-    if input_companies != registered_companies:
-        missing = registered_companies - input_companies
-        extra = input_companies - registered_companies
-        error_msg = []
-        if missing:
-            error_msg.append(f"Faltan empresas: {missing}")
-        if extra:
-            error_msg.append(f"Empresas no registradas: {extra}")
-        st.error(" | ".join(error_msg))
-        return False
+def get_weights_history(portfolio_id, before=None, limit=10):
+    """
+    Historial de pesos paginado por fecha (keyset), de la más reciente a la más antigua.
 
-    # Guardar pesos
-    for company_id, weight in companies_weights.items():
+    :param before: solo fechas anteriores a esta (None para empezar por la última).
+    :param limit: número de fechas por página.
+    :return: (DataFrame con recorded_at, ticker, name y weight; valor de `before`
+        para la página siguiente, o None si no hay más).
+    """
+    with db_connection() as db, db.cursor() as cursor:
         cursor.execute(
-            "INSERT INTO portfolio_weights (portfolio_id, company_id, weight, recorded_at) VALUES (%s, %s, %s, %s)",
-            (portfolio_id, company_id, weight, date),
+            """
+            WITH page AS (
+                SELECT DISTINCT recorded_at
+                FROM portfolio_weights
+                WHERE portfolio_id = %(portfolio_id)s
+                  AND (%(before)s::date IS NULL OR recorded_at < %(before)s::date)
+                ORDER BY recorded_at DESC
+                LIMIT %(limit)s + 1
+            )
+            SELECT pw.recorded_at, c.ticker, c.name, pw.weight
+            FROM page
+            JOIN portfolio_weights pw
+              ON pw.portfolio_id = %(portfolio_id)s AND pw.recorded_at = page.recorded_at
+            JOIN companies c ON pw.company_id = c.company_id
+            ORDER BY pw.recorded_at DESC, c.ticker;
+            """,
+            {"portfolio_id": portfolio_id, "before": before, "limit": limit},
+        )
+        history = pd.DataFrame(
+            cursor.fetchall(), columns=[desc[0] for desc in cursor.description]
         )
 
-    db.commit()
-    cursor.close()
-    db.close()
+    # Se pide una fecha de más solo para saber si existe una página anterior
+    dates = history["recorded_at"].unique() if not history.empty else []
+    if len(dates) <= limit:
+        return history, None
+    history = history[history["recorded_at"].isin(dates[:limit])]
+    return history.reset_index(drop=True), dates[limit - 1]
+
+
+def save_weights_for_portfolio(portfolio_id, companies_weights):
+    with db_connection() as db, db.cursor() as cursor:
+        # Verificar si las empresas están registradas en portfolio_companies
+        registered_companies = portfolio_company_ids(cursor, portfolio_id)
+        input_companies = set(companies_weights.keys())
+
+        if input_companies != registered_companies:
+            missing = registered_companies - input_companies
+            extra = input_companies - registered_companies
+            error_msg = []
+            if missing:
+                error_msg.append(f"Faltan empresas: {missing}")
+            if extra:
+                error_msg.append(f"Empresas no registradas: {extra}")
+            st.error(" | ".join(error_msg))
+            return False
+
+        # Guardar pesos (si ya había pesos de hoy se sustituyen)
+        save_weights(cursor, portfolio_id, companies_weights, timestamp.now().date())
+
+    invalidate("portfolios")
     st.success("Pesos actualizados correctamente.")
     return True
 
 
 def save_favorite_portfolio(portfolio_name, selected_tickers, portfolio_value=0.0):
-    """Save the selected portfolio as a favorite."""
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    selected_tickers.append("CASH")
-
+    """Save the selected portfolio (plus CASH) as a favorite."""
     try:
-        # Insert portfolio
-        cursor.execute(
-            "INSERT INTO portfolios (user_id, name, portfolio_value) VALUES (%s, %s, %s) RETURNING portfolio_id;",
-            (st.session_state.get("user_id", 1), portfolio_name, portfolio_value),
-        )
-        portfolio_id = cursor.fetchone()[0]
-
-        # Insert companies into portfolio
-        for ticker in selected_tickers:
-            cursor.execute(
-                "INSERT INTO portfolio_companies (portfolio_id, company_id) VALUES (%s, (SELECT company_id FROM companies WHERE ticker = %s));",
-                (portfolio_id, ticker),
+        with db_connection() as conn, conn.cursor() as cursor:
+            portfolio_id = save_portfolio(
+                cursor,
+                st.session_state.get("user_id", 1),
+                portfolio_name,
+                [*selected_tickers, "CASH"],
+                portfolio_value,
             )
 
-        # Mark as favorite
-        cursor.execute(
-            "INSERT INTO favorites (user_id, type, reference_id, name) VALUES (%s, 'portfolio', %s, %s);",
-            (st.session_state.get("user_id", 1), portfolio_id, portfolio_name),
-        )
-
-        conn.commit()
+        invalidate("portfolios")
         st.success(f"Portafolio '{portfolio_name}' guardado como favorito.")
 
         return portfolio_id
     except Exception as e:
-        conn.rollback()
         st.error(f"Error al guardar el portafolio: {e}")
-    finally:
-        conn.close()
 
 
 def delete_portfolio(portfolio_id):
@@ -426,6 +501,7 @@ def delete_portfolio(portfolio_id):
     db.commit()
     cursor.close()
     db.close()
+    invalidate("portfolios")
     st.warning("Portafolio eliminado.")
 
 
@@ -448,51 +524,24 @@ def insert_model(
     created_at,
     normalization,
 ):
-    db = connect_db()
-    cursor = db.cursor()
     try:
-        cursor.execute(
-            """
-            INSERT INTO models (algorithm, feature_extractor, ncompanies, file_path, created_at, name, normalization)
-            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING model_id;
-            """,
-            (
-                algorithm,
-                feature_extractor,
-                len(companies_abv),
-                file_path,
-                created_at,
-                name,
-                normalization,
-            ),
-        )
-        model_id = cursor.fetchone()[0]
-
-        if model_id:
-            # companies_abv.append("CASH")
-            for ticker in companies_abv:
-                company_id = search_company(cursor, ticker)
-                if company_id:
-                    cursor.execute(
-                        "INSERT INTO model_companies (model_id, company_id) VALUES (%s, %s);",
-                        (model_id, company_id),
-                    )
-                else:
-                    raise ValueError(
-                        f"Error: Company with ticker '{ticker}' not found in the database."
-                    )
-
-        db.commit()
-        cursor.close()
-        db.close()
+        with db_connection() as db, db.cursor() as cursor:
+            model_id = register_model(
+                cursor,
+                name=name,
+                algorithm=algorithm,
+                feature_extractor=feature_extractor,
+                companies_abv=companies_abv,
+                file_path=file_path,
+                created_at=created_at,
+                normalization=normalization,
+            )
+        invalidate("models")
         return model_id
     except Exception as e:
-        db.rollback()
+        # Quien llama (el worker de entrenamiento) registra el error en el trabajo
         st.error(f"Error al insertar modelo: {e}")
-        return None
-    finally:
-        cursor.close()
-        db.close()
+        raise
 
 
 def search_company(cursor, ticker):
@@ -0,0 +1,198 @@
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from quant_drl.tester.tester import max_drawdown
+
+from web.data.stock_data import StoredTester
+from web.pages.commons.model_cache import load_model_cached
+
+# Máximo de procesos para la evaluación en lote
+EVAL_MAX_WORKERS = int(os.getenv("EVAL_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+EPISODE_SEQUENCES = ["rewards", "sharpes", "pvs", "actions", "episode_rewards"]
+
+# Semillas base admitidas (np.random.seed solo acepta enteros de 32 bits)
+MAX_SEED = 2**32 - 1
+
+# Parada anticipada: intervalo de confianza del 95 % y un mínimo de episodios
+CONFIDENCE_Z = 1.96
+EARLY_STOP_MIN_EPISODES = 10
+
+
+def build_tester(spec) -> StoredTester:
+    """
+    Crea el Tester y carga el modelo descritos en `spec`:
+
+        configuration, start_eval, end_eval, random_initialization y
+        model (file_path, base_path, model_name, steps, algorithm,
+        feature_extractor, num_assets).
+    """
+    tester = StoredTester(spec["configuration"], setup=False)
+    tester.reset_data_env(
+        start_eval_date=spec["start_eval"],
+        end_eval_date=spec["end_eval"],
+        random_initialization=spec["random_initialization"],
+    )
+    load_model_cached(tester, **spec["model"])
+    return tester
+
+
+def seed_everything(seed: int):
+    """Fija las semillas que usan el entorno (np.random) y la política."""
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        import torch
+
+        torch.manual_seed(seed)
+    except ImportError:
+        pass
+
+
+def iter_steps(model, env):
+    """Ejecuta un episodio igual que Tester.evaluate, generando un dict por paso."""
+    obs = env.reset()
+    done, episode_reward = False, 0.0
+    while not done:
+        action, _ = model.predict(obs, deterministic=True)
+        softmax_action = np.exp(action) / np.sum(np.exp(action))
+        obs, reward, done, info = env.step(action)
+
+        episode_reward += float(reward)
+        yield {
+            "reward": float(reward),
+            "sharpe": info[0]["sharpe_ratio"],
+            "pv": info[0]["valor_portafolio"],
+            "action": softmax_action,
+            "episode_reward": episode_reward,
+        }
+
+
+def summarize_episode(steps) -> dict:
+    """Métricas de un episodio a partir de sus pasos (los dicts de iter_steps)."""
+    rewards = [step["reward"] for step in steps]
+    sharpes = [step["sharpe"] for step in steps]
+    pvs = [step["pv"] for step in steps]
+    return {
+        "final_reward": steps[-1]["episode_reward"],
+        "final_pv": pvs[-1],
+        "final_drawdown": max_drawdown(pvs),
+        "mean_reward": float(np.mean(rewards)),
+        "mean_sharpe": float(np.mean(sharpes)),
+        "mean_pv": float(np.mean(pvs)),
+        "std_reward": float(np.std(rewards)),
+        "std_sharpe": float(np.std(sharpes)),
+        "std_pv": float(np.std(pvs)),
+        "rewards": rewards,
+        "sharpes": sharpes,
+        "pvs": pvs,
+        "actions": [step["action"] for step in steps],
+        "episode_rewards": [step["episode_reward"] for step in steps],
+    }
+
+
+def run_episode(model, env) -> dict:
+    """Ejecuta un episodio igual que Tester.evaluate y devuelve sus métricas."""
+    return summarize_episode(list(iter_steps(model, env)))
+
+
+def merge_episodes(episodes) -> dict:
+    """Agrupa episodios (en orden) en el mismo formato que devuelve Tester.evaluate."""
+    return {
+        "final_rewards": [e["final_reward"] for e in episodes],
+        "final_pvs": [e["final_pv"] for e in episodes],
+        "final_drawdowns": [e["final_drawdown"] for e in episodes],
+        "mean_rewards": [e["mean_reward"] for e in episodes],
+        "mean_sharpes": [e["mean_sharpe"] for e in episodes],
+        "mean_pvs": [e["mean_pv"] for e in episodes],
+        "std_rewards": [e["std_reward"] for e in episodes],
+        "std_sharpes": [e["std_sharpe"] for e in episodes],
+        "std_pvs": [e["std_pv"] for e in episodes],
+        "all_rewards": [e["rewards"] for e in episodes],
+        "all_sharpes": [e["sharpes"] for e in episodes],
+        "all_pvs": [e["pvs"] for e in episodes],
+        "all_actions": [e["actions"] for e in episodes],
+        "all_episode_rewards": [e["episode_rewards"] for e in episodes],
+    }
+
+
+def episode_seed(base_seed: int, episode: int) -> int:
+    """
+    Semilla del episodio `episode`: el hijo `episode` de SeedSequence(base_seed),
+    igual que SeedSequence(base_seed).spawn(n)[episode]. Siempre cabe en 32 bits,
+    que es lo que admite np.random.seed.
+    """
+    sequence = np.random.SeedSequence(base_seed, spawn_key=(episode,))
+    return int(sequence.generate_state(1)[0])
+
+
+# Estado de cada proceso del pool: su propio Tester con el modelo cargado
+_worker_tester = None
+
+
+def _init_worker(spec):
+    global _worker_tester
+    _worker_tester = build_tester(spec)
+
+
+def _run_seeded_episode(episode: int, seed: int, tester=None):
+    tester = tester or _worker_tester
+    seed_everything(seed)
+    return episode, run_episode(tester.model, tester.port_eval_env)
+
+
+def iter_episodes(spec, num_episodes, base_seed=0, max_workers=None):
+    """
+    Evalúa `num_episodes` episodios repartidos en un pool de procesos y genera
+    (i, episodio) según van terminando, no en orden.
+
+    Cada episodio usa la semilla episode_seed(base_seed, i), así que el resultado
+    no depende del número de procesos ni del orden en que terminen. Cerrar el
+    generador (o salir del bucle que lo consume) cancela los que no han empezado.
+    """
+    max_workers = min(max_workers or EVAL_MAX_WORKERS, num_episodes)
+
+    if max_workers <= 1:
+        tester = build_tester(spec)
+        for i in range(num_episodes):
+            yield _run_seeded_episode(i, episode_seed(base_seed, i), tester)
+        return
+
+    # spawn: torch y los hilos de Streamlit no son seguros tras un fork
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(spec,),
+    ) as executor:
+        futures = [
+            executor.submit(_run_seeded_episode, i, episode_seed(base_seed, i))
+            for i in range(num_episodes)
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def confidence_halfwidth(values, z=CONFIDENCE_Z) -> float:
+    """Semiancho del intervalo de confianza (aproximación normal) de la media."""
+    if len(values) < 2:
+        return float("inf")
+    return z * float(np.std(values, ddof=1)) / np.sqrt(len(values))
+
+
+def ci_converged(values, max_relative_halfwidth, min_episodes=EARLY_STOP_MIN_EPISODES):
+    """
+    True si, con al menos `min_episodes`, el intervalo de confianza de la media
+    es más estrecho que `max_relative_halfwidth` veces la media.
+    """
+    if len(values) < max(min_episodes, 2):
+        return False
+    mean = abs(float(np.mean(values)))
+    return confidence_halfwidth(values) <= max_relative_halfwidth * mean
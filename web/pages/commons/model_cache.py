@@ -0,0 +1,115 @@
+import itertools
+import os
+import threading
+from collections import OrderedDict
+
+from web.commons.logging import logger
+
+# Memoria máxima ocupada por los modelos cargados (compartida por todas las sesiones)
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+
+def model_size_bytes(model) -> int:
+    """Bytes ocupados por los parámetros y buffers de la política."""
+    policy = getattr(model, "policy", None)
+    if policy is None:
+        return 0
+    return sum(
+        t.numel() * t.element_size()
+        for t in itertools.chain(policy.parameters(), policy.buffers())
+    )
+
+
+def _strip_for_inference(model):
+    """Suelta lo que solo hace falta para entrenar: el replay buffer y el entorno."""
+    if getattr(model, "replay_buffer", None) is not None:
+        model.replay_buffer = None
+    model.env = None
+    return model
+
+
+class ModelCache:
+    """Caché LRU de políticas ya deserializadas, limitada por memoria en bytes."""
+
+    def __init__(self, max_bytes=MODEL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()  # key -> (size, model)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_load(self, key, loader):
+        """Devuelve (modelo, acierto). Si no está en caché lo carga con `loader()`."""
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1], True
+            self._stats["misses"] += 1
+
+        model = loader()
+        size = model_size_bytes(model)
+
+        with self._lock:
+            if key in self._models:
+                self._bytes -= self._models.pop(key)[0]
+            if size <= self.max_bytes:
+                self._models[key] = (size, model)
+                self._bytes += size
+            while self._bytes > self.max_bytes and self._models:
+                evicted_key, (evicted_size, _) = self._models.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+                logger.info(f"Modelo expulsado de la caché: {evicted_key}")
+        return model, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._models)
+            stats["bytes"] = self._bytes
+            stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._bytes = 0
+
+
+model_cache = ModelCache()
+
+
+def load_model_cached(
+    tester,
+    file_path,
+    base_path,
+    model_name,
+    steps=None,
+    algorithm=None,
+    feature_extractor=None,
+    num_assets=6,
+) -> bool:
+    """
+    Carga el modelo en `tester.model`, reutilizando la política si ya se cargó
+    con los mismos (file_path, steps, algorithm, feature_extractor).
+
+    Returns:
+        bool: True si el modelo salió de la caché.
+    """
+
+    def loader():
+        tester.load_model(
+            base_path,
+            model_name,
+            algorithm=algorithm,
+            steps=steps,
+            feature_extractor=feature_extractor,
+            num_assets=num_assets,
+        )
+        return _strip_for_inference(tester.model)
+
+    key = (file_path, steps, algorithm, feature_extractor)
+    tester.model, hit = model_cache.get_or_load(key, loader)
+    return hit
@@ -0,0 +1,157 @@
+import copy
+import functools
+import inspect
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Límites de memoria de la caché de consultas (compartida por todas las sesiones)
+MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+
+def _estimate_size(value) -> int:
+    """Tamaño aproximado en bytes de un resultado cacheado."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+def _freeze(value):
+    """Convierte los argumentos en algo hashable para usarlos como clave."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _is_empty(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, pd.DataFrame):
+        return value.empty
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
+
+
+class QueryCache:
+    """Caché LRU con TTL por entrada, límite de memoria e invalidación por etiquetas."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, tags, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        """Devuelve (encontrado, valor) y marca la entrada como usada recientemente."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry[3]
+
+    def set(self, key, value, ttl, tags=()):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, frozenset(tags), size, value)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, *tags):
+        """Elimina las entradas con alguna de las etiquetas indicadas (o todas si no hay)."""
+        with self._lock:
+            keys = [
+                key
+                for key, (_, entry_tags, _, _) in self._entries.items()
+                if not tags or entry_tags.intersection(tags)
+            ]
+            for key in keys:
+                self._remove(key)
+            self._stats["invalidations"] += len(keys)
+
+    def _remove(self, key):
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
+
+
+query_cache = QueryCache()
+
+
+def cached_query(ttl: float, tags=()):
+    """
+    Cachea el resultado de un conector de solo lectura durante `ttl` segundos.
+
+    Los resultados vacíos no se cachean (los conectores devuelven vacío ante errores
+    de conexión) y cada llamada recibe una copia, ya que las páginas mutan los resultados.
+    Admite también conectores asíncronos (async def).
+    """
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = (func.__module__, func.__qualname__, _freeze(args), _freeze(kwargs))
+                found, value = query_cache.get(key)
+                if not found:
+                    value = await func(*args, **kwargs)
+                    if not _is_empty(value):
+                        query_cache.set(key, value, ttl, tags)
+                return copy.deepcopy(value)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__module__, func.__qualname__, _freeze(args), _freeze(kwargs))
+            found, value = query_cache.get(key)
+            if not found:
+                value = func(*args, **kwargs)
+                if not _is_empty(value):
+                    query_cache.set(key, value, ttl, tags)
+            return copy.deepcopy(value)
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate(*tags):
+    """Invalida las consultas cacheadas con las etiquetas dadas tras una escritura."""
+    query_cache.invalidate(*tags)
@@ -0,0 +1,49 @@
+import os
+
+import streamlit as st
+
+from web.data.stock_data import StoredStockData
+
+# Combinaciones (empresas, fechas) que se mantienen en memoria entre reruns
+STOCK_CACHE_ENTRIES = int(os.getenv("STOCK_CACHE_ENTRIES", "8"))
+
+RETURN_VIEWS = {
+    "gross": {"return_type": "gross"},
+    "winsorized": {"return_type": "gross", "normalized": "winsorized"},
+    "standard": {"return_type": "gross", "normalized": "standard"},
+}
+
+
+@st.cache_resource(max_entries=STOCK_CACHE_ENTRIES, show_spinner=False)
+def load_stock_data(comp_abv: tuple, comp_names: tuple, start_date, end_date):
+    """
+    StoredStockData memoizado por (empresas, fechas).
+
+    Se comparte entre reruns y sesiones, así que cambiar un widget que no toca
+    la selección no vuelve a leer precios ni a calcular indicadores. El objeto
+    devuelto no debe modificarse.
+    """
+    return StoredStockData(
+        comp_abv=list(comp_abv),
+        comp_names=list(comp_names),
+        start_date=start_date,
+        end_date=end_date,
+        winsorize=True,
+        percentile=0.001,
+    )
+
+
+@st.cache_resource(
+    max_entries=STOCK_CACHE_ENTRIES * len(RETURN_VIEWS), show_spinner=False
+)
+def load_return_frames(
+    comp_abv: tuple, comp_names: tuple, start_date, end_date, view: str
+) -> dict:
+    """
+    Rentabilidades de una vista de RETURN_VIEWS agrupadas por activo: {ticker: DataFrame}.
+
+    Cada vista se calcula la primera vez que se pide y se memoiza por
+    (empresas, fechas, vista); las que nunca se abren no se calculan.
+    """
+    stockdata = load_stock_data(comp_abv, comp_names, start_date, end_date)
+    return stockdata.extract_return_data_by_ticker(**RETURN_VIEWS[view])